@@ -0,0 +1,63 @@
+"""
+Benchmark of the JSON backends.
+Encodes and decodes a small and a large payload with every installed library
+(orjson, ujson, json), through JSONBackend as the router does.
+
+Usage : python benchmarks/json_backends.py [seconds]
+"""
+
+from pathlib import Path
+from sys     import argv, path as sys_path
+from time    import perf_counter
+
+sys_path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pyn import JSONBackend
+
+
+SMALL = {"id": 42, "name": "Ada Lovelace", "active": True, "tags": ["admin", "dev"]}
+LARGE = {
+    "users": [
+        {
+            "id": i,
+            "name": f"User {i}",
+            "email": f"user{i}@example.com",
+            "score": i * 1.5,
+            "active": i % 2 == 0,
+            "roles": ["reader", "writer"] if i % 3 else ["reader"],
+            "address": {"city": "Paris", "zip": f"{75000 + i % 20}", "lines": ["1 rue de la Paix"]},
+        }
+        for i in range(2000)
+    ]
+}
+
+
+def rate(function: callable, data, seconds: float) -> float:
+    # Calls per second of a function, measured for about "seconds" seconds
+    count = 0
+    start = perf_counter()
+    end = start + seconds
+    while perf_counter() < end:
+        for _ in range(10):
+            function(data)
+        count += 10
+    return count / (perf_counter() - start)
+
+
+if __name__ == "__main__":
+    seconds = float(argv[1]) if len(argv) > 1 else 1.0
+
+    for payload, data in (("small", SMALL), ("large", LARGE)):
+        encoded = JSONBackend("json").dumps(data)
+        print(f"{payload} payload ({len(encoded)} bytes)")
+
+        base = None
+        for name in reversed(JSONBackend.BACKENDS):
+            backend = JSONBackend(name)
+            dumps = rate(backend.dumps, data, seconds)
+            loads = rate(backend.loads, encoded, seconds)
+            base = base or (dumps, loads)
+            print(
+                f"  {name:<7} │ dumps {dumps:>10.0f}/s x{dumps / base[0]:>5.2f}"
+                f" │ loads {loads:>10.0f}/s x{loads / base[1]:>5.2f}"
+            )
@@ -0,0 +1,102 @@
+"""
+Benchmark of the two HTTP servers of the router.
+Compares StreamReader/StreamWriter with the asyncio.Protocol fast path,
+on the asyncio event loop and on uvloop when it's installed.
+
+Usage : python benchmarks/protocol.py [seconds] [connections]
+"""
+
+from asyncio         import open_connection, gather, run as run_async
+from multiprocessing import Pool, Process
+from os              import cpu_count, kill
+from pathlib         import Path
+from signal          import SIGTERM
+from socket          import create_connection
+from sys             import argv, path as sys_path
+from time            import monotonic, sleep
+
+sys_path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pyn        import Router, Server, Logger
+from pyn.server import UVLoopPolicy
+
+
+HOST = "127.0.0.1"
+PORT = 8098
+REQUEST = b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n"
+
+
+def serve(fast: bool, uvloop: bool) -> None:
+    router = Router()
+    router.logger = Logger(filename="/dev/null", console=False)
+
+    async def index(request, response):
+        await response.send("Hello, World!")
+
+    router.get("/", index)
+    Server(router, uvloop=uvloop).run(port=PORT, host=HOST, fast=fast, max_requests=10 ** 9)
+
+
+async def client(seconds: float) -> int:
+    # One keep-alive connection sending requests one after another
+    reader, writer = await open_connection(HOST, PORT)
+    count = 0
+    end = monotonic() + seconds
+    while monotonic() < end:
+        writer.write(REQUEST)
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = int(head.lower().split(b"content-length:", 1)[1].split(b"\r\n", 1)[0])
+        await reader.readexactly(length)
+        count += 1
+    writer.close()
+    return count
+
+
+def load(args: tuple[float, int]) -> int:
+    # Process of the load generator, running "connections" clients
+    seconds, connections = args
+
+    async def main():
+        return sum(await gather(*(client(seconds) for _ in range(connections))))
+
+    return run_async(main())
+
+
+def wait_port() -> None:
+    for _ in range(100):
+        try:
+            create_connection((HOST, PORT)).close()
+            return
+        except OSError:
+            sleep(0.05)
+    raise RuntimeError("The server didn't start")
+
+
+def bench(fast: bool, uvloop: bool, seconds: float, connections: int, clients: int) -> float:
+    server = Process(target=serve, args=(fast, uvloop))
+    server.start()
+    try:
+        wait_port()
+        sleep(0.5)
+        with Pool(clients) as pool:
+            total = sum(pool.map(load, [(seconds, connections)] * clients))
+    finally:
+        kill(server.pid, SIGTERM)
+        server.join()
+    return total / seconds
+
+
+if __name__ == "__main__":
+    seconds = float(argv[1]) if len(argv) > 1 else 5.0
+    connections = int(argv[2]) if len(argv) > 2 else 32
+    clients = max(1, (cpu_count() or 1) - 1)
+
+    cases = [("streams", False, False), ("protocol", True, False)]
+    if UVLoopPolicy is not None:
+        cases += [("streams + uvloop", False, True), ("protocol + uvloop", True, True)]
+
+    base = None
+    for name, fast, uvloop in cases:
+        rate = bench(fast, uvloop, seconds, connections, clients)
+        base = base or rate
+        print(f"{name:<18} │ {rate:>10.0f} req/s │ x{rate / base:>5.2f}")
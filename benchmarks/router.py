@@ -0,0 +1,71 @@
+"""
+Benchmark of the route lookup.
+Compares the old linear regex scan with the RouteTree, with 10, 100 and 1000 routes.
+
+Usage : python benchmarks/router.py
+"""
+
+from re      import sub, compile
+from timeit  import repeat
+from pathlib import Path
+from sys     import path as sys_path
+
+sys_path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pyn.tree import RouteTree
+
+
+def regex_routes(paths: list[str]) -> dict:
+    # The routes as the router stored them before the RouteTree
+    return {compile("^" + sub(r"<(\w+)>", r"(?P<\1>[^/]+)", path) + "$"): path for path in paths}
+
+
+def regex_match(routes: dict, path: str) -> tuple:
+    # The lookup as the router did it before the RouteTree
+    for pattern, handler in routes.items():
+        match = pattern.match(path)
+        if match:
+            return handler, match.groupdict()
+    return None, {}
+
+
+def make_paths(count: int) -> list[str]:
+    # Half static routes, half routes with parameters, like a real application
+    paths = []
+    for i in range(count):
+        if i % 2:
+            paths.append(f"/api/v1/resource{i}/<id>/items/<item>")
+        else:
+            paths.append(f"/pages/section{i}/index")
+    return paths
+
+
+def bench(count: int) -> None:
+    paths = make_paths(count)
+    regex = regex_routes(paths)
+    tree = RouteTree()
+    for path in paths:
+        tree.insert(path, path)
+
+    last = count - 1 if (count - 1) % 2 else count - 2
+    cases = {
+        "first static": "/pages/section0/index",
+        "last dynamic": f"/api/v1/resource{last}/42/items/7",
+        "404": "/does/not/exist",
+    }
+
+    for name, path in cases.items():
+        assert regex_match(regex, path)[0] == tree.match(path)[0]
+
+        number = 2000
+        old = min(repeat(lambda: regex_match(regex, path), number=number, repeat=5)) / number
+        new = min(repeat(lambda: tree.match(path), number=number, repeat=5)) / number
+        print(
+            f"{count:>5} routes │ {name:<13} │ regex {old * 1e6:>9.2f} µs │ "
+            f"tree {new * 1e6:>7.2f} µs │ x{old / new:>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    for routes in (10, 100, 1000):
+        bench(routes)
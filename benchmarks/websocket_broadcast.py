@@ -0,0 +1,182 @@
+"""
+Benchmark of the WebSocket broadcasts.
+Connects thousands of local clients and compares "send_all" (one encoding, written to every
+client without waiting for any of them) with the previous way, encoding and awaiting drain()
+for each client one after another.
+The time the server spends broadcasting is printed by the server, the time until every client
+has received everything by the clients. The last runs publish in a room of 100 clients,
+one of them having stopped reading: "publish" only fills its queue, the previous way waits for it.
+
+Usage : python benchmarks/websocket_broadcast.py [clients] [messages] [size]
+"""
+
+from asyncio         import (
+    Event, Protocol, TimeoutError, gather, get_running_loop, run as run_async, sleep as async_sleep, wait_for
+)
+from base64          import b64encode
+from multiprocessing import Process
+from os              import urandom
+from pathlib         import Path
+from socket          import create_connection
+from sys             import argv, path as sys_path
+from time            import perf_counter, sleep
+
+sys_path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pyn           import WebSocket, Logger
+from pyn.websocket import TEXT, encode_frame, unmask
+
+
+HOST = "127.0.0.1"
+PORT = 8097
+BATCH = 100
+ROOM = 100
+
+
+def serve() -> None:
+    websocket = WebSocket(ping_interval=None)
+    websocket.logger = Logger(filename="/dev/null", console=False)
+
+    @websocket.define("message")
+    async def on_message(client, message: str) -> None:
+        if message == "subscribe":
+            client.subscribe("room")
+            return
+
+        mode, count, size = message.split()
+        payload = "x" * int(size)
+        start = perf_counter()
+        for _ in range(int(count)):
+            if mode == "send_all":
+                await websocket.send_all(payload)
+            elif mode == "publish":
+                await websocket.publish("room", payload)
+            else:
+                clients = websocket.clients if mode == "sequential" else websocket.rooms["room"]
+                for other in list(clients):
+                    other.writer.write(encode_frame(TEXT, payload.encode("utf-8")))
+                    await other.writer.drain()
+        print(f"  {mode:<15} │ server  {(perf_counter() - start) * 1000:>8.1f} ms", flush=True)
+
+    run_async(websocket.serve(port=PORT, host=HOST))
+
+
+class Client(Protocol):
+    """
+    Client counting the bytes of the frames it receives.
+    """
+
+    def __init__(self):
+        self.transport = None
+        self.handshake = Event()
+        self.done = Event()
+        self.buffer = b""
+        self.received = 0
+        self.expected = 0
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+        key = b64encode(urandom(16))
+        transport.write(
+            b"GET / HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Key: " + key + b"\r\nSec-WebSocket-Version: 13\r\n\r\n"
+        )
+
+    def data_received(self, data: bytes) -> None:
+        if not self.handshake.is_set():
+            self.buffer += data
+            head, found, rest = self.buffer.partition(b"\r\n\r\n")
+            if not found:
+                return
+            self.handshake.set()
+            data = rest
+        self.received += len(data)
+        if self.expected and self.received >= self.expected:
+            self.done.set()
+
+    def expect(self, size: int) -> None:
+        self.expected += size
+        self.done.clear()
+        if self.received >= self.expected:
+            self.done.set()
+
+    def send(self, message: str) -> None:
+        payload = message.encode("utf-8")
+        mask = urandom(4)
+        self.transport.write(bytes((0x81, 0x80 | len(payload))) + mask + unmask(payload, mask))
+
+
+async def bench(clients: int, messages: int, size: int) -> None:
+    loop = get_running_loop()
+    connected = []
+    for start in range(0, clients, BATCH):
+        batch = [
+            loop.create_connection(Client, HOST, PORT) for _ in range(min(BATCH, clients - start))
+        ]
+        for _, client in await gather(*batch):
+            await client.handshake.wait()
+            connected.append(client)
+    print(f"{len(connected)} clients, {messages} messages of {size} bytes", flush=True)
+
+    frame = len(encode_frame(TEXT, b"x" * size))
+    for mode in ("sequential", "send_all", "sequential", "send_all"):
+        await broadcast(connected, mode, messages, size, frame * messages)
+
+    # One client of the room stops reading, the big messages fill its socket buffers
+    room = connected[:ROOM]
+    for client in room:
+        client.send("subscribe")
+    print(f"Room of {len(room)} clients, one not reading, {messages} messages of 1048576 bytes", flush=True)
+    room[-1].transport.pause_reading()
+    frame = len(encode_frame(TEXT, b"x" * 1048576))
+    for mode in ("publish", "sequential_room"):
+        await broadcast(room[:-1], mode, messages, 1048576, frame * messages)
+
+    for client in connected:
+        client.transport.close()
+
+
+async def broadcast(
+    clients: list, mode: str, messages: int, size: int, expected: int
+) -> None:
+    # Ask the server for a broadcast, and wait until every client received it
+    for client in clients:
+        client.expect(expected)
+
+    start = perf_counter()
+    clients[0].send(f"{mode} {messages} {size}")
+    try:
+        await wait_for(gather(*(client.done.wait() for client in clients)), 10)
+    except TimeoutError:
+        print(f"  {mode:<15} │ clients still waiting after 10 s", flush=True)
+        return
+    elapsed = perf_counter() - start
+    await async_sleep(0.1)  # The server prints its line first
+
+    delivered = len(clients) * messages
+    print(f"  {mode:<15} │ clients {elapsed * 1000:>8.1f} ms │ {delivered / elapsed:>10.0f} messages/s", flush=True)
+
+
+def wait_port() -> None:
+    for _ in range(100):
+        try:
+            create_connection((HOST, PORT)).close()
+            return
+        except OSError:
+            sleep(0.05)
+    raise RuntimeError("The server didn't start")
+
+
+if __name__ == "__main__":
+    clients = int(argv[1]) if len(argv) > 1 else 10000
+    messages = int(argv[2]) if len(argv) > 2 else 10
+    size = int(argv[3]) if len(argv) > 3 else 100
+
+    server = Process(target=serve)
+    server.start()
+    try:
+        wait_port()
+        run_async(bench(clients, messages, size))
+    finally:
+        server.terminate()
+        server.join()
@@ -0,0 +1,75 @@
+"""
+Benchmark of the unmasking of the WebSocket frames sent by the clients.
+Compares the byte by byte loop with "pyn.websocket.unmask" (integer XOR for small payloads,
+bytes.translate or NumPy for the bigger ones) on 125 B, 64 KiB and 16 MiB payloads.
+
+Usage : python benchmarks/websocket_unmask.py [seconds]
+"""
+
+from os      import urandom
+from pathlib import Path
+from sys     import argv, path as sys_path
+from time    import perf_counter
+
+sys_path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pyn import websocket
+
+
+SIZES = {"125 B": 125, "64 KiB": 65536, "16 MiB": 16777216}
+
+
+def loop(payload: bytes, mask: bytes) -> bytes:
+    # The previous unmasking, one byte at a time
+    data = bytearray(payload)
+    for i in range(len(data)):
+        data[i] ^= mask[i % 4]
+    return bytes(data)
+
+
+def integer(payload: bytes, mask: bytes) -> bytes:
+    # The whole payload XORed as one big integer
+    length = len(payload)
+    key = int.from_bytes((mask * (length // 4 + 1))[:length], "little")
+    return (int.from_bytes(payload, "little") ^ key).to_bytes(length, "little")
+
+
+def translate(payload: bytes, mask: bytes) -> bytes:
+    # "unmask" without NumPy
+    numpy, websocket.numpy = websocket.numpy, None
+    try:
+        return websocket.unmask(payload, mask)
+    finally:
+        websocket.numpy = numpy
+
+
+def rate(function: callable, payload: bytes, mask: bytes, seconds: float) -> float:
+    # MiB unmasked per second, measured for about "seconds" seconds (at least one call)
+    count = 0
+    start = perf_counter()
+    while True:
+        function(payload, mask)
+        count += 1
+        if perf_counter() - start >= seconds:
+            break
+    return count * len(payload) / (perf_counter() - start) / 1048576
+
+
+if __name__ == "__main__":
+    seconds = float(argv[1]) if len(argv) > 1 else 1.0
+
+    functions = {"loop": loop, "integer": integer, "translate": translate}
+    if websocket.numpy is not None:
+        functions["numpy"] = websocket.unmask
+
+    for name, size in SIZES.items():
+        payload, mask = urandom(size), urandom(4)
+        expected = integer(payload, mask)
+        print(f"{name} payload")
+
+        base = None
+        for function_name, function in functions.items():
+            assert function(payload, mask) == expected
+            speed = rate(function, payload, mask, seconds)
+            base = base or speed
+            print(f"  {function_name:<9} │ {speed:>10.1f} MiB/s │ x{speed / base:>8.1f}")
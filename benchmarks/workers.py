@@ -0,0 +1,105 @@
+"""
+Benchmark of the worker processes.
+Serves a small response with 1, 2, 4... workers (up to the number of cores)
+and measures the requests per second, with keep-alive clients in other processes.
+
+Usage : python benchmarks/workers.py [seconds] [connections]
+"""
+
+from asyncio         import open_connection, gather, run as run_async
+from multiprocessing import Pool, Process
+from os              import cpu_count, kill
+from pathlib         import Path
+from signal          import SIGTERM
+from socket          import create_connection
+from sys             import argv, path as sys_path
+from time            import monotonic, sleep
+
+sys_path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pyn import Router, Server, Logger
+
+
+HOST = "127.0.0.1"
+PORT = 8099
+REQUEST = b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n"
+
+
+def serve(workers: int) -> None:
+    router = Router()
+    router.logger = Logger(filename="/dev/null", console=False)
+
+    async def index(request, response):
+        await response.send("Hello, World!")
+
+    router.get("/", index)
+    Server(router, workers=workers).run(port=PORT, host=HOST, max_requests=10 ** 9)
+
+
+async def client(seconds: float) -> int:
+    # One keep-alive connection sending requests one after another
+    reader, writer = await open_connection(HOST, PORT)
+    count = 0
+    end = monotonic() + seconds
+    while monotonic() < end:
+        writer.write(REQUEST)
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = int(head.lower().split(b"content-length:", 1)[1].split(b"\r\n", 1)[0])
+        await reader.readexactly(length)
+        count += 1
+    writer.close()
+    return count
+
+
+def load(args: tuple[float, int]) -> int:
+    # Process of the load generator, running "connections" clients
+    seconds, connections = args
+
+    async def main():
+        return sum(await gather(*(client(seconds) for _ in range(connections))))
+
+    return run_async(main())
+
+
+def wait_port() -> None:
+    for _ in range(100):
+        try:
+            create_connection((HOST, PORT)).close()
+            return
+        except OSError:
+            sleep(0.05)
+    raise RuntimeError("The server didn't start")
+
+
+def bench(workers: int, seconds: float, connections: int, clients: int) -> float:
+    server = Process(target=serve, args=(workers,))
+    server.start()
+    try:
+        wait_port()
+        sleep(0.5)
+        with Pool(clients) as pool:
+            total = sum(pool.map(load, [(seconds, connections)] * clients))
+    finally:
+        kill(server.pid, SIGTERM)
+        server.join()
+    return total / seconds
+
+
+if __name__ == "__main__":
+    seconds = float(argv[1]) if len(argv) > 1 else 5.0
+    connections = int(argv[2]) if len(argv) > 2 else 32
+    cores = cpu_count() or 1
+
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+
+    # Half of the cores generate the load, the other half serves it
+    clients = max(1, cores // 2)
+    base = None
+    for workers in counts:
+        rate = bench(workers, seconds, connections, clients)
+        base = base or rate
+        print(f"{workers:>3} workers │ {rate:>10.0f} req/s │ x{rate / base:>5.2f}")
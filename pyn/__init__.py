@@ -3,23 +3,67 @@ File for defining the module.
 Imports every important classes and define the version.
 """
 
+VERSION = "0.0.5"
+
 from .router import Router
 from .logger import Logger
-from .request import Request
+from .request import Request, Headers
 from .response import Response
 from .components import Components
 from .server import Server
-from .websocket import WebSocket
+from .websocket import WebSocket, WebSocketConnection, WebSocketError
+from .parser import Parser, HTTPError, BodyDecoder, BodyStream
+from .tree import RouteTree
+from .cache import FileCache, ResponseCache
+from .compression import Compression
+from .deflate import PerMessageDeflate, DeflateSession
+from .serializer import JSONBackend
+from .forms import UploadFile, Form, FormParser
+from .metrics import Histogram, Metrics
+from .workers import Supervisor
+from .protocol import HTTPProtocol, TransportWriter
+from .middleware import Pipeline
+from .limits import TokenBuckets, Limiter
+from .formatters import AccessRecord, Formatter, PrettyFormatter, JSONFormatter, CombinedFormatter
 
 
-VERSION = "0.0.5"
 __all__ = [
     "VERSION",
     "Router",
     "Logger",
     "Request",
+    "Headers",
     "Response",
     "Components",
     "Server",
     "WebSocket",
+    "WebSocketConnection",
+    "WebSocketError",
+    "Parser",
+    "HTTPError",
+    "BodyDecoder",
+    "BodyStream",
+    "RouteTree",
+    "FileCache",
+    "ResponseCache",
+    "Compression",
+    "PerMessageDeflate",
+    "DeflateSession",
+    "JSONBackend",
+    "UploadFile",
+    "Form",
+    "FormParser",
+    "Histogram",
+    "Metrics",
+    "AccessRecord",
+    "Formatter",
+    "PrettyFormatter",
+    "JSONFormatter",
+    "CombinedFormatter",
+    "Supervisor",
+    "HTTPProtocol",
+    "TransportWriter",
+    "Pipeline",
+    "TokenBuckets",
+    "Limiter",
 ]
@@ -0,0 +1,302 @@
+"""
+File to define the caches used by the router.
+"""
+
+from asyncio     import get_running_loop, shield
+from collections import OrderedDict
+from os          import stat_result
+from time        import monotonic
+
+
+class FileCache:
+    """
+    LRU cache of the hot static files, kept in memory.
+    A file is found by its path and is reloaded as soon as its mtime or its size changed.
+    The oldest files are removed when the cache holds more than "max_size" bytes.
+    "hits" and "misses" count the lookups, to help sizing it.
+    """
+
+    def __init__(self, max_size: int = 67108864, max_file_size: int = 1048576):
+        self.max_size = max_size
+        self.max_file_size = max_file_size
+
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self):
+        return f"FileCache with {len(self.entries)} files ({self.size}/{self.max_size} bytes)"
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, path: str, stat: stat_result) -> bytes | None:
+        """
+        Get the content of a cached file.
+        Returns None when the file isn't cached or changed since it was.
+
+        Args:
+        path (str): The path of the file.
+        stat (os.stat_result): The current stat of the file.
+        """
+        entry = self.entries.get(path)
+
+        if entry is None or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(path)
+        return entry[2]
+
+    def put(self, path: str, stat: stat_result, data: bytes) -> None:
+        """
+        Add a file to the cache, removing the least recently used ones if needed.
+        Files bigger than "max_file_size" are ignored.
+
+        Args:
+        path (str): The path of the file.
+        stat (os.stat_result): The stat of the file when it was read.
+        data (bytes): The content of the file.
+        """
+        if len(data) > self.max_file_size or len(data) > self.max_size:
+            return
+
+        self.remove(path)
+        self.entries[path] = (stat.st_mtime_ns, stat.st_size, data)
+        self.size += len(data)
+
+        while self.size > self.max_size:
+            _, (_, _, old) = self.entries.popitem(last=False)
+            self.size -= len(old)
+
+    def remove(self, path: str) -> None:
+        """
+        Remove a file from the cache.
+
+        Args:
+        path (str): The path of the file.
+        """
+        entry = self.entries.pop(path, None)
+        if entry is not None:
+            self.size -= len(entry[2])
+
+    def clear(self) -> None:
+        """
+        Remove every file from the cache.
+        """
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        """
+        Get the counters of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "files":    len(self.entries),
+            "size":     self.size,
+            "max_size": self.max_size,
+            "hits":     self.hits,
+            "misses":   self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class ResponseCache:
+    """
+    LRU cache of the responses of GET handlers, kept in memory for "ttl" seconds.
+    A response is found by the method, the path, the query string, the route parameters
+    and the headers listed in "vary" ("Accept-Language"...), and is only kept when it's a
+    200 without "Cache-Control: no-store" or "private".
+
+    Concurrent misses on the same response run the handler once, the other
+    requests wait for it. The oldest responses are removed above "max_size" bytes.
+
+    Usage : @router.cached(ttl=60, vary=("Accept-Language",)) on a handler,
+    or router.cache("/path", ttl=60) on a registered route.
+    """
+
+    def __init__(self, max_size: int = 33554432, max_entry_size: int = 1048576):
+        self.max_size = max_size
+        self.max_entry_size = max_entry_size
+
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self):
+        return f"ResponseCache with {len(self.entries)} responses ({self.size}/{self.max_size} bytes)"
+
+    def __len__(self):
+        return len(self.entries)
+
+    def cached(self, ttl: float = 60.0, vary: tuple[str] = ()) -> callable:
+        """
+        Decorator to cache the responses of a handler.
+
+        Args:
+        ttl (float): Seconds a response is kept.
+        vary (tuple[str]): Request headers that change the response.
+        """
+        def decorator(handler: callable) -> callable:
+            async def wrapper(request, response):
+                await self.handle(handler, request, response, ttl, vary)
+            return wrapper
+        return decorator
+
+    async def handle(self, handler: callable, request, response, ttl: float, vary: tuple[str] = ()) -> None:
+        """
+        Answer a request from the cache, or with the handler, keeping its response.
+
+        Args:
+        handler (callable): The handler of the route.
+        request (Request): The request.
+        response (Response): The response to send.
+        ttl (float): Seconds a response is kept.
+        vary (tuple[str]): Request headers that change the response.
+        """
+        key = (
+            request.method,
+            request.path,
+            request.query_string,
+            tuple(sorted(request.params.items())),
+            tuple(request.header(name) for name in vary),
+        )
+
+        # Another request is already running the handler for this response
+        entry = self.get(key)
+        if entry is None and key in self.pending:
+            await shield(self.pending[key])
+            entry = self.get(key)
+
+        if entry is not None:
+            await response.send_raw(*self._replay(entry))
+            return
+
+        waiter = None
+        if key not in self.pending:
+            waiter = self.pending[key] = get_running_loop().create_future()
+
+        response.on_write = lambda built, body: self._store(key, built, body, ttl, vary)
+        try:
+            await handler(request, response)
+        finally:
+            if waiter is not None:
+                del self.pending[key]
+                waiter.set_result(None)
+
+    def get(self, key: tuple) -> tuple | None:
+        """
+        Get a cached response, None when it isn't cached or expired.
+
+        Args:
+        key (tuple): The key of the response.
+        """
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] <= monotonic():
+            self.remove(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple, entry: tuple) -> None:
+        """
+        Add a response, removing the least recently used ones if needed.
+        Responses bigger than "max_entry_size" are ignored.
+
+        Args:
+        key (tuple): The key of the response.
+        entry (tuple): (expires, created, status, headers, body, size, own max-age).
+        """
+        size = entry[5]
+        if size > self.max_entry_size or size > self.max_size:
+            return
+
+        self.remove(key)
+        self.entries[key] = entry
+        self.size += size
+
+        while self.size > self.max_size:
+            _, old = self.entries.popitem(last=False)
+            self.size -= old[5]
+
+    def remove(self, key: tuple) -> None:
+        """
+        Remove a response from the cache.
+
+        Args:
+        key (tuple): The key of the response.
+        """
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[5]
+
+    def clear(self) -> None:
+        """
+        Remove every response from the cache.
+        """
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        """
+        Get the counters of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "responses": len(self.entries),
+            "size":      self.size,
+            "max_size":  self.max_size,
+            "hits":      self.hits,
+            "misses":    self.misses,
+            "hit_rate":  self.hits / lookups if lookups else 0.0,
+        }
+
+    def _store(self, key: tuple, response: dict, body: bytes, ttl: float, vary: tuple[str]) -> None:
+        # Keep a response built by the handler, adding its cache headers first
+        headers = response["headers"]
+        names = {name.lower(): name for name in headers}
+
+        control = str(headers.get(names.get("cache-control"), "")).lower()
+        if response["status"] != 200 or "no-store" in control or "private" in control:
+            return
+
+        own_max_age = "cache-control" not in names
+        if own_max_age:
+            headers["Cache-Control"] = f"max-age={int(ttl)}"
+
+        if vary:
+            current = headers.pop(names["vary"]) if "vary" in names else ""
+            listed = [name.strip() for name in str(current).split(",") if name.strip()]
+            listed += [name for name in vary if name.lower() not in {item.lower() for item in listed}]
+            headers["Vary"] = ", ".join(listed)
+
+        kept = {
+            name: value for name, value in headers.items()
+            if name.lower() not in ("connection", "content-length")
+        }
+        size = len(body) + sum(len(name) + len(str(value)) for name, value in kept.items())
+        now = monotonic()
+        self.put(key, (now + ttl, now, response["status"], kept, body, size, own_max_age))
+
+    @staticmethod
+    def _replay(entry: tuple) -> tuple[int, dict, bytes]:
+        # Status, headers and body of a cached response, with its age
+        expires, created, status, headers, body, _, own_max_age = entry
+        now = monotonic()
+
+        headers = dict(headers)
+        headers["Age"] = str(int(now - created))
+        if own_max_age:
+            headers["Cache-Control"] = f"max-age={max(int(expires - now), 0)}"
+        return status, headers, body
@@ -0,0 +1,153 @@
+"""
+File to define the Compression class.
+Compresses the responses with gzip, brotli or zstd, depending on what the client accepts.
+brotli and zstd are only used when their package ("brotli", "zstandard") is installed.
+"""
+
+from asyncio import get_running_loop
+from gzip    import compress as gzip_compress
+from os      import stat as os_stat
+from stat    import S_ISREG
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class Compression:
+    """
+    Opt-in compression of the responses, negotiated with "Accept-Encoding" on each request.
+    Only bodies of at least "min_size" bytes with a content type in "content_types" are compressed.
+    Bodies bigger than "executor_size" are compressed in a thread, away from the event loop.
+    Static files are never compressed on the fly: their ".br", ".zst" or ".gz" sibling is sent if it exists.
+
+    Usage : router.compression = Compression()
+    """
+
+    # Extension of the precompressed files, for each encoding
+    EXTENSIONS = {"br": ".br", "zstd": ".zst", "gzip": ".gz"}
+
+    def __init__(
+        self,
+        min_size: int = 1024,
+        content_types: tuple[str] = (
+            "text/html",
+            "text/css",
+            "text/plain",
+            "text/markdown",
+            "text/xml",
+            "text/javascript",
+            "application/javascript",
+            "application/json",
+            "application/xml",
+            "image/svg+xml",
+        ),
+        encodings: tuple[str] = ("br", "zstd", "gzip"),
+        executor_size: int = 65536,
+        precompressed: bool = True,
+    ):
+        self.min_size = min_size
+        self.content_types = frozenset(content_types)
+        self.executor_size = executor_size
+        self.precompressed = precompressed
+
+        available = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+        self.encodings = tuple(encoding for encoding in encodings if available.get(encoding))
+
+    def __str__(self):
+        return f"Compression with {', '.join(self.encodings)} from {self.min_size} bytes"
+
+    def negotiate(self, accept_encoding: str | None) -> str | None:
+        """
+        Choose the encoding to use from the "Accept-Encoding" header of the request.
+        The first encoding of "encodings" accepted by the client wins.
+        Returns None when the body must not be compressed.
+
+        Args:
+        accept_encoding (str): The "Accept-Encoding" header of the request.
+        """
+        accepted = self._parse_accept(accept_encoding)
+        for encoding in self.encodings:
+            if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+                return encoding
+        return None
+
+    def should_compress(self, content_type: str, length: int) -> bool:
+        """
+        Know if a body is worth compressing.
+
+        Args:
+        content_type (str): The "Content-Type" of the response.
+        length (int): The size of the body in bytes.
+        """
+        return (
+            length >= self.min_size
+            and content_type.split(";", 1)[0].strip().lower() in self.content_types
+        )
+
+    async def compress(self, data: bytes, encoding: str) -> bytes:
+        """
+        Compress a body, in a thread when it's big.
+
+        Args:
+        data (bytes): The body to compress.
+        encoding (str): One of "gzip", "br" or "zstd", as given by "negotiate".
+        """
+        if len(data) < self.executor_size:
+            return self._compress(data, encoding)
+        return await get_running_loop().run_in_executor(None, self._compress, data, encoding)
+
+    def find_precompressed(self, path: str, accept_encoding: str | None) -> tuple[str, str] | None:
+        """
+        Find a precompressed sibling of a static file ("app.js.br" for "app.js").
+        Returns its path and its encoding, or None.
+
+        Args:
+        path (str): The path of the file to send.
+        accept_encoding (str): The "Accept-Encoding" header of the request.
+        """
+        if not self.precompressed or not accept_encoding:
+            return None
+
+        # The files are already compressed, no need for the packages to send them
+        accepted = self._parse_accept(accept_encoding)
+        for encoding, extension in self.EXTENSIONS.items():
+            if accepted.get(encoding, 0.0) <= 0:
+                continue
+            try:
+                if S_ISREG(os_stat(path + extension).st_mode):
+                    return path + extension, encoding
+            except OSError:
+                continue
+        return None
+
+    @staticmethod
+    def _parse_accept(accept_encoding: str | None) -> dict:
+        # Helper method to read "gzip, br;q=0.8, *;q=0" as {"gzip": 1.0, "br": 0.8, "*": 0.0}
+        accepted = {}
+        for item in (accept_encoding or "").split(","):
+            name, _, params = item.partition(";")
+            quality = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            accepted[name.strip().lower()] = quality
+        return accepted
+
+    @staticmethod
+    def _compress(data: bytes, encoding: str) -> bytes:
+        # Compress with a level made for on the fly compression
+        if encoding == "br":
+            return brotli.compress(bytes(data), quality=4)
+        if encoding == "zstd":
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        return gzip_compress(data, compresslevel=5, mtime=0)
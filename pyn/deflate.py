@@ -0,0 +1,208 @@
+"""
+File to define the PerMessageDeflate class.
+Compresses the WebSocket messages with the "permessage-deflate" extension (RFC 7692),
+negotiated with each client in its handshake.
+"""
+
+from zlib import DEFLATED, Z_SYNC_FLUSH, compressobj, decompressobj, error as ZlibError
+
+# End of a sync flush, removed from the compressed messages and added back before decompressing them
+TAIL = b"\x00\x00\xff\xff"
+
+# Parameters of the extension, with or without value
+PARAMETERS = {
+    "server_no_context_takeover",
+    "client_no_context_takeover",
+    "server_max_window_bits",
+    "client_max_window_bits",
+}
+
+
+class DeflateSession:
+    """
+    permessage-deflate as negotiated with one client.
+    With context takeover, a message is compressed with the ones sent before it, for a better ratio,
+    but each client keeps its compressor (up to 256 KiB with 15 window bits).
+    Without it, each message is compressed alone: the compressed message is the same for every
+    client with the same "key", and a broadcast compresses it once for all of them.
+    """
+
+    def __init__(
+        self,
+        server_max_window_bits: int,
+        client_max_window_bits: int,
+        server_context_takeover: bool,
+        client_context_takeover: bool,
+        level: int,
+        min_size: int,
+    ):
+        self.server_max_window_bits = server_max_window_bits
+        self.client_max_window_bits = client_max_window_bits
+        self.level = level
+        self.min_size = min_size
+        self.shared = not server_context_takeover
+        self.key = (server_max_window_bits, level)
+
+        self._compressor = None if self.shared else self._new_compressor()
+        self._decompressor = decompressobj(-client_max_window_bits) if client_context_takeover else None
+
+    def __str__(self):
+        return f"DeflateSession with {self.server_max_window_bits} window bits{', shared' if self.shared else ''}"
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compress the payload of a message.
+
+        Args:
+        data (bytes): The payload.
+        """
+        compressor = self._compressor or self._new_compressor()
+        compressed = compressor.compress(data) + compressor.flush(Z_SYNC_FLUSH)
+        return compressed[:-4] if compressed.endswith(TAIL) else compressed
+
+    def decompress(self, data: bytes, max_size: int) -> bytes:
+        """
+        Decompress the payload of a message sent by the client.
+        Raises OverflowError above "max_size" bytes, ValueError when it's not valid deflate data.
+
+        Args:
+        data (bytes): The compressed payload, fragments joined.
+        max_size (int): Max size in bytes of the message once decompressed.
+        """
+        decompressor = self._decompressor or decompressobj(-self.client_max_window_bits)
+        try:
+            result = decompressor.decompress(data + TAIL, max_size + 1)
+        except ZlibError as e:
+            raise ValueError(f"Invalid compressed message: {e}") from None
+        if len(result) > max_size:
+            raise OverflowError("Message too big")
+        return result
+
+    def _new_compressor(self):
+        # Helper method to create a raw deflate compressor (no zlib header)
+        return compressobj(self.level, DEFLATED, -self.server_max_window_bits)
+
+
+class PerMessageDeflate:
+    """
+    Opt-in compression of the WebSocket messages, negotiated in the handshake of each client.
+    Only messages of at least "min_size" bytes are compressed, control frames never are.
+
+    - "server_max_window_bits" (9 to 15) and "client_max_window_bits" (8 to 15) set the window
+      of the compressors, less memory for a lower ratio.
+    - "server_no_context_takeover" compresses each message alone: the broadcasts are compressed
+      once for every client and the clients don't keep a compressor, at the cost of the ratio.
+    - "client_no_context_takeover" asks the clients to do the same, the server doesn't keep
+      a decompressor for them.
+
+    Usage : ws.compression = PerMessageDeflate()
+    """
+
+    def __init__(
+        self,
+        min_size: int = 256,
+        server_max_window_bits: int = 15,
+        client_max_window_bits: int = 15,
+        server_no_context_takeover: bool = True,
+        client_no_context_takeover: bool = False,
+        level: int = 6,
+    ):
+        # zlib can't compress with a window of 8 bits, but decompresses with it
+        if not 9 <= server_max_window_bits <= 15:
+            raise ValueError(f"server_max_window_bits must be between 9 and 15, not {server_max_window_bits}")
+        if not 8 <= client_max_window_bits <= 15:
+            raise ValueError(f"client_max_window_bits must be between 8 and 15, not {client_max_window_bits}")
+
+        self.min_size = min_size
+        self.server_max_window_bits = server_max_window_bits
+        self.client_max_window_bits = client_max_window_bits
+        self.server_no_context_takeover = server_no_context_takeover
+        self.client_no_context_takeover = client_no_context_takeover
+        self.level = level
+
+    def __str__(self):
+        return f"PerMessageDeflate from {self.min_size} bytes, {self.server_max_window_bits} window bits"
+
+    def negotiate(self, extensions: str | None) -> tuple[str, DeflateSession] | None:
+        """
+        Accept the first valid "permessage-deflate" offer of the "Sec-WebSocket-Extensions" header.
+        Returns the value of the header to answer with and the session of the client,
+        or None when the client offered nothing usable.
+
+        Args:
+        extensions (str): The "Sec-WebSocket-Extensions" header of the handshake.
+        """
+        for offer in (extensions or "").split(","):
+            name, *items = offer.split(";")
+            if name.strip().lower() != "permessage-deflate":
+                continue
+
+            parameters = self._parse_parameters(items)
+            if parameters is None:
+                continue
+            accepted = self._accept(parameters)
+            if accepted is not None:
+                return accepted
+        return None
+
+    @staticmethod
+    def _parse_parameters(items: list[str]) -> dict | None:
+        # Helper method to read the parameters of an offer, None when one is unknown or repeated
+        parameters = {}
+        for item in items:
+            key, _, value = item.partition("=")
+            key, value = key.strip().lower(), value.strip().strip('"')
+            if key not in PARAMETERS or key in parameters:
+                return None
+            parameters[key] = value
+        return parameters
+
+    def _accept(self, parameters: dict) -> tuple[str, DeflateSession] | None:
+        # Helper method to answer an offer, None when its values can't be accepted
+        response = ["permessage-deflate"]
+
+        # The server's side: what the client asks for, or less
+        server_bits = self.server_max_window_bits
+        if "server_max_window_bits" in parameters:
+            offered = self._window_bits(parameters["server_max_window_bits"], 9)
+            if offered is None:
+                return None
+            server_bits = min(server_bits, offered)
+        if server_bits < 15 or "server_max_window_bits" in parameters:
+            response.append(f"server_max_window_bits={server_bits}")
+
+        server_takeover = not (
+            self.server_no_context_takeover or "server_no_context_takeover" in parameters
+        )
+        if not server_takeover:
+            response.append("server_no_context_takeover")
+
+        # The client's side: a smaller window can only be asked for if the client offered it
+        client_bits = 15
+        if "client_max_window_bits" in parameters:
+            offered = parameters["client_max_window_bits"]
+            client_bits = self.client_max_window_bits
+            if offered:
+                offered = self._window_bits(offered, 8)
+                if offered is None:
+                    return None
+                client_bits = min(client_bits, offered)
+            response.append(f"client_max_window_bits={client_bits}")
+
+        client_takeover = not (
+            self.client_no_context_takeover or "client_no_context_takeover" in parameters
+        )
+        if not client_takeover:
+            response.append("client_no_context_takeover")
+
+        session = DeflateSession(
+            server_bits, client_bits, server_takeover, client_takeover, self.level, self.min_size
+        )
+        return "; ".join(response), session
+
+    @staticmethod
+    def _window_bits(value: str, minimum: int) -> int | None:
+        # Helper method to read a window size, None when it's not between "minimum" and 15
+        if not value.isdigit() or not minimum <= int(value) <= 15:
+            return None
+        return int(value)
@@ -0,0 +1,133 @@
+"""
+File to define the access log formatters.
+A formatter turns an AccessRecord into the line written in the log file.
+"""
+
+from datetime import datetime
+from json     import dumps
+
+
+class AccessRecord:
+    """
+    Everything known about one request, given to the formatters.
+    The logger fills the same record again and again instead of creating one per request.
+    """
+
+    __slots__ = (
+        "time", "status", "protocol", "src_ip", "dst_ip", "method", "path",
+        "duration", "size", "user_agent", "referer", "extra",
+    )
+
+    def __init__(self):
+        self.time = 0.0
+        self.status = 0
+        self.protocol = ""
+        self.src_ip = ""
+        self.dst_ip = ""
+        self.method = ""
+        self.path = ""
+        self.duration = 0
+        self.size = None
+        self.user_agent = None
+        self.referer = None
+        self.extra = {}
+
+    def __str__(self):
+        return f"AccessRecord {self.method} {self.path} {self.status}"
+
+
+class Formatter:
+    """
+    Base class of the formatters.
+    "format" must return the line to write, "\\n" included.
+    """
+
+    def __init__(self):
+        self._second = None
+        self._date = ""
+
+    def __str__(self):
+        return type(self).__name__
+
+    def format(self, record: AccessRecord) -> str:
+        """
+        Build the log line of a record.
+
+        Args:
+        record (AccessRecord): The request to log.
+        """
+        raise NotImplementedError
+
+    def _get_date(self, timestamp: float, pattern: str) -> str:
+        # Helper method to format a date, only once per second
+        second = int(timestamp)
+        if self._second != second:
+            self._second = second
+            self._date = datetime.fromtimestamp(second).astimezone().strftime(pattern)
+        return self._date
+
+
+class PrettyFormatter(Formatter):
+    """
+    The human readable format of pyn, aligned in columns.
+    """
+
+    def format(self, record: AccessRecord) -> str:
+        date = datetime.fromtimestamp(record.time).strftime("%d/%m/%Y %H:%M:%S.%f")
+        level = "INFO" if record.status < 400 else "WARNING" if record.status < 500 else "ERROR"
+
+        msg = f' │ PATH="{record.path}"'.ljust(28) if record.path else ""
+        for key, value in record.extra.items():
+            if value is not None:
+                msg += f" │ {key.upper()}={value}".ljust(28)
+
+        return f"[PYN] {date} │ {level.ljust(7)} │ SRC_IP={record.src_ip.ljust(15)} -> DST_IP={record.dst_ip.ljust(15)} │ DURATION={(str(record.duration)+'ms').ljust(10)} │ PROTO={record.protocol.ljust(7)} │ STATUS={record.status}{msg}\n"
+
+
+class JSONFormatter(Formatter):
+    """
+    One JSON object per line (JSON lines), easy to parse for log shippers.
+    """
+
+    def format(self, record: AccessRecord) -> str:
+        data = {
+            "time":        self._get_date(record.time, "%Y-%m-%dT%H:%M:%S%z"),
+            "status":      record.status,
+            "method":      record.method,
+            "path":        record.path,
+            "protocol":    record.protocol,
+            "src_ip":      record.src_ip,
+            "dst_ip":      record.dst_ip,
+            "duration_ms": record.duration,
+            "size":        record.size,
+            "user_agent":  record.user_agent,
+            "referer":     record.referer,
+        }
+        for key, value in record.extra.items():
+            if value is not None:
+                data[key] = value
+
+        return dumps(data, default=str) + "\n"
+
+
+class CombinedFormatter(Formatter):
+    """
+    The Apache combined log format, understood by most log tools.
+    127.0.0.1 - - [10/Oct/2000:13:55:36 +0200] "GET /index.html HTTP/1.1" 200 2326 "-" "curl/8.0"
+    """
+
+    def format(self, record: AccessRecord) -> str:
+        date = self._get_date(record.time, "%d/%b/%Y:%H:%M:%S %z")
+        size = "-" if record.size is None else record.size
+        referer = (record.referer or "-").replace('"', '\\"')
+        user_agent = (record.user_agent or "-").replace('"', '\\"')
+        path = record.path.replace('"', '\\"')
+
+        return f'{record.dst_ip or "-"} - - [{date}] "{record.method} {path} {record.protocol}" {record.status} {size} "{referer}" "{user_agent}"\n'
+
+
+FORMATTERS = {
+    "pretty":   PrettyFormatter,
+    "json":     JSONFormatter,
+    "combined": CombinedFormatter,
+}
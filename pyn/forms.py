@@ -0,0 +1,393 @@
+"""
+File to define the form parser of the requests.
+Reads "application/x-www-form-urlencoded" and "multipart/form-data" bodies as they arrive:
+the uploaded files stay in memory up to "spool_size" bytes, and go to temporary files above.
+"""
+
+from asyncio      import get_running_loop
+from re           import compile as re_compile
+from shutil       import copyfileobj
+from tempfile     import SpooledTemporaryFile
+from typing       import AsyncIterator
+from urllib.parse import unquote, unquote_plus
+from .parser      import HTTPError
+
+# One "name=value" option of a header, the value quoted or not
+OPTION = re_compile(r';\s*([^\s=;]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^;]*)')
+QUOTED_PAIR = re_compile(r'\\(.)')
+
+
+class UploadFile:
+    """
+    A file of a multipart form.
+    "filename" is the name sent by the client, never use it as a path as is.
+    The content is in "file", a tempfile.SpooledTemporaryFile: in memory while it's small, on disk above.
+    """
+
+    def __init__(self, name: str, filename: str, content_type: str, headers: dict, spool_size: int):
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.headers = headers
+        self.size = 0
+        self.spool_size = spool_size
+        self.file = SpooledTemporaryFile(max_size=spool_size)
+
+    def __str__(self):
+        return f"UploadFile {self.filename} ({self.size} bytes, {self.content_type})"
+
+    async def write(self, data: bytes | bytearray) -> None:
+        """
+        Add bytes at the end of the file, used while the form is read.
+        Once the file goes to disk, the writes are done in a thread so the event loop isn't blocked.
+
+        Args:
+        data (bytes | bytearray): The bytes to add.
+        """
+        if self.size + len(data) > self.spool_size:
+            await get_running_loop().run_in_executor(None, self.file.write, data)
+        else:
+            self.file.write(data)
+        self.size += len(data)
+
+    def read(self) -> bytes:
+        """
+        Get the whole content of the file, in memory.
+        """
+        self.file.seek(0)
+        return self.file.read()
+
+    async def save(self, path: str) -> None:
+        """
+        Copy the file to a path, in a thread so the event loop isn't blocked.
+
+        Args:
+        path (str): Where to write the file.
+        """
+        await get_running_loop().run_in_executor(None, self._copy, path)
+
+    def close(self) -> None:
+        """
+        Close the file, a temporary file on disk is removed.
+        """
+        self.file.close()
+
+    def _copy(self, path: str) -> None:
+        # Helper method to copy the content to a path
+        self.file.seek(0)
+        with open(path, "wb") as destination:
+            copyfileobj(self.file, destination)
+
+
+class Form:
+    """
+    Fields and files of a form.
+    "fields" and "files" have the list of the values of each name, in the order they came,
+    "count" is the number of values of both.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.files = {}
+        self.count = 0
+
+    def __str__(self):
+        return f"Form with {len(self.fields)} fields and {len(self.files)} files"
+
+    def get(self, name: str, default: str = None) -> str | None:
+        """
+        Get the first value of a field.
+
+        Args:
+        name (str): The name of the field.
+        default (str): Value returned when the field is missing.
+        """
+        values = self.fields.get(name)
+        return values[0] if values else default
+
+    def file(self, name: str) -> UploadFile | None:
+        """
+        Get the first file sent with a name, None when there is none.
+
+        Args:
+        name (str): The name of the field of the file.
+        """
+        files = self.files.get(name)
+        return files[0] if files else None
+
+    def close(self) -> None:
+        """
+        Close every file of the form.
+        """
+        for files in self.files.values():
+            for upload in files:
+                upload.close()
+
+
+class FormParser:
+    """
+    Parser of the forms sent in a request body, read chunk by chunk:
+    whatever the size of the body, only the current chunk and the fields are in memory.
+
+    Limits (413 above them):
+    - "max_size" bytes for the whole body.
+    - "max_part_size" bytes for each file, "max_field_size" bytes for each other field.
+    - "max_parts" fields and files.
+    Files are kept in memory up to "spool_size" bytes, in temporary files above.
+
+    Usage : form = await request.form(FormParser(max_part_size=10485760))
+    """
+
+    def __init__(
+        self,
+        spool_size: int = 1048576,
+        max_size: int = 268435456,
+        max_part_size: int = 268435456,
+        max_field_size: int = 1048576,
+        max_parts: int = 1000,
+        max_header_size: int = 16384,
+    ):
+        self.spool_size = spool_size
+        self.max_size = max_size
+        self.max_part_size = max_part_size
+        self.max_field_size = max_field_size
+        self.max_parts = max_parts
+        self.max_header_size = max_header_size
+
+    def __str__(self):
+        return f"FormParser (body <= {self.max_size} bytes, files in memory <= {self.spool_size} bytes)"
+
+    async def parse(self, content_type: str | None, chunks: AsyncIterator[bytes]) -> Form:
+        """
+        Read a form from the chunks of a body.
+        Raises an HTTPError: 400 when it's malformed, 413 over a limit, 415 when it's not a form.
+
+        Args:
+        content_type (str): The "Content-Type" header of the request.
+        chunks (AsyncIterator[bytes]): The body, "request.stream()".
+        """
+        media, options = self.parse_options(content_type or "")
+
+        if media == "application/x-www-form-urlencoded":
+            return await self._parse_urlencoded(chunks)
+
+        if media == "multipart/form-data":
+            boundary = options.get("boundary")
+            if not boundary or len(boundary) > 70:
+                raise HTTPError(400, "Invalid multipart boundary")
+            return await self._parse_multipart(chunks, boundary.encode("latin-1"))
+
+        raise HTTPError(415, "Unsupported Media Type")
+
+    @staticmethod
+    def parse_options(value: str) -> tuple[str, dict]:
+        """
+        Split a header like "Content-Type" or "Content-Disposition" into its value, lowercased,
+        and its options ('form-data; name="file"' gives "form-data" and {"name": "file"}).
+        "filename*" options (RFC 5987) are decoded into "filename".
+
+        Args:
+        value (str): The header value.
+        """
+        main, _, rest = value.partition(";")
+        options = {}
+
+        for match in OPTION.finditer(";" + rest):
+            name, option = match.group(1).lower(), match.group(2).strip()
+            if option.startswith('"') and option.endswith('"') and len(option) > 1:
+                option = QUOTED_PAIR.sub(r"\1", option[1:-1])
+
+            if name.endswith("*"):
+                charset, _, encoded = option.partition("'")
+                _, _, encoded = encoded.partition("'")
+                try:
+                    option = unquote(encoded, encoding=charset or "utf-8", errors="replace")
+                except LookupError:
+                    continue
+                name = name[:-1]
+                options[name] = option
+            else:
+                options.setdefault(name, option)
+
+        return main.strip().lower(), options
+
+    async def _parse_urlencoded(self, chunks: AsyncIterator[bytes]) -> Form:
+        # Read "a=1&b=2" pairs, each one as soon as it's complete
+        form = Form()
+        buffer = bytearray()
+        total = 0
+
+        async for chunk in chunks:
+            total += len(chunk)
+            if total > self.max_size:
+                raise HTTPError(413, "Payload Too Large")
+
+            buffer += chunk
+            end = buffer.rfind(b"&")
+            if end != -1:
+                self._add_pairs(form, bytes(buffer[:end]))
+                del buffer[:end + 1]
+            if len(buffer) > self.max_field_size:
+                raise HTTPError(413, "Payload Too Large")
+
+        self._add_pairs(form, bytes(buffer))
+        return form
+
+    def _add_pairs(self, form: Form, data: bytes) -> None:
+        # Add the fields of complete "a=1&b=2" pairs to the form
+        for pair in data.split(b"&"):
+            if not pair:
+                continue
+            if len(pair) > self.max_field_size:
+                raise HTTPError(413, "Payload Too Large")
+            name, _, value = pair.decode("latin-1").partition("=")
+            self._add_field(form, unquote_plus(name), unquote_plus(value))
+
+    async def _parse_multipart(self, chunks: AsyncIterator[bytes], boundary: bytes) -> Form:
+        # Read the parts of a multipart body, the data of each part going to its field or file.
+        # The delimiter can be cut between two chunks, so the bytes that could be
+        # its start stay in the buffer until the next chunk.
+        form = Form()
+        delimiter = b"\r\n--" + boundary
+        keep = len(delimiter) - 1
+        buffer = bytearray(b"\r\n")  # The first delimiter has no CRLF before it
+        state = "preamble"
+        part = None
+        total = 0
+
+        try:
+            async for chunk in chunks:
+                total += len(chunk)
+                if total > self.max_size:
+                    raise HTTPError(413, "Payload Too Large")
+                buffer += chunk
+
+                while state != "end":
+                    if state == "data":
+                        found = buffer.find(delimiter)
+                        if found == -1:
+                            if len(buffer) > keep:
+                                await self._write_part(part, buffer[:len(buffer) - keep])
+                                del buffer[:len(buffer) - keep]
+                            break
+                        await self._write_part(part, buffer[:found])
+                        del buffer[:found + len(delimiter)]
+                        self._end_part(form, part)
+                        part = None
+                        state = "delimiter"
+
+                    elif state == "preamble":
+                        found = buffer.find(delimiter)
+                        if found == -1:
+                            del buffer[:max(0, len(buffer) - keep)]
+                            break
+                        del buffer[:found + len(delimiter)]
+                        state = "delimiter"
+
+                    elif state == "delimiter":
+                        # "--" after the delimiter ends the body, a line break starts the next part
+                        if buffer[:2] == b"--":
+                            state = "end"
+                            break
+                        end = buffer.find(b"\r\n")
+                        if end == -1:
+                            if len(buffer) > 1024:
+                                raise HTTPError(400, "Malformed multipart body")
+                            break
+                        if buffer[:end].strip(b" \t"):
+                            raise HTTPError(400, "Malformed multipart body")
+                        del buffer[:end + 2]
+                        state = "headers"
+
+                    else:
+                        # The headers of the next part
+                        part = self._read_part_headers(form, buffer)
+                        if part is None:
+                            break
+                        state = "data"
+
+                # The epilogue is ignored
+                if state == "end":
+                    buffer.clear()
+
+            if state != "end":
+                raise HTTPError(400, "Incomplete multipart body")
+        except BaseException:
+            if isinstance(part, UploadFile):
+                part.close()
+            form.close()
+            raise
+
+        return form
+
+    def _read_part_headers(self, form: Form, buffer: bytearray) -> UploadFile | list | None:
+        # Read the headers of a part from the buffer and start the part,
+        # a file for the parts with a filename, a [name, bytearray] list for the fields.
+        if buffer[:2] == b"\r\n":
+            end = 0
+        else:
+            end = buffer.find(b"\r\n\r\n")
+            if end == -1:
+                if len(buffer) > self.max_header_size:
+                    raise HTTPError(431, "Request Header Fields Too Large")
+                return None
+            end += 2
+        if end > self.max_header_size:
+            raise HTTPError(431, "Request Header Fields Too Large")
+
+        headers = {}
+        for line in bytes(buffer[:end]).split(b"\r\n"):
+            if not line:
+                continue
+            name, separator, value = line.partition(b":")
+            if not separator:
+                raise HTTPError(400, "Malformed multipart body")
+            headers[name.strip().decode("latin-1").lower()] = value.strip().decode("utf-8", "replace")
+        del buffer[:end + 2]
+
+        disposition, options = self.parse_options(headers.get("content-disposition", ""))
+        if disposition != "form-data" or "name" not in options:
+            raise HTTPError(400, "Malformed multipart body")
+
+        if form.count >= self.max_parts:
+            raise HTTPError(413, "Payload Too Large")
+
+        if "filename" not in options:
+            return [options["name"], bytearray()]
+        return UploadFile(
+            options["name"],
+            options["filename"],
+            headers.get("content-type", "application/octet-stream"),
+            headers,
+            self.spool_size,
+        )
+
+    async def _write_part(self, part: UploadFile | list, data: bytearray) -> None:
+        # Add data to the current part, within its limit
+        if not data:
+            return
+        if isinstance(part, UploadFile):
+            if part.size + len(data) > self.max_part_size:
+                raise HTTPError(413, "Payload Too Large")
+            await part.write(data)
+            return
+
+        if len(part[1]) + len(data) > self.max_field_size:
+            raise HTTPError(413, "Payload Too Large")
+        part[1] += data
+
+    def _end_part(self, form: Form, part: UploadFile | list) -> None:
+        # Add a complete part to the form
+        if isinstance(part, UploadFile):
+            part.file.seek(0)
+            form.files.setdefault(part.name, []).append(part)
+            form.count += 1
+        else:
+            self._add_field(form, part[0], part[1].decode("utf-8", "replace"))
+
+    def _add_field(self, form: Form, name: str, value: str) -> None:
+        # Add a field to the form, within the number of parts
+        if form.count >= self.max_parts:
+            raise HTTPError(413, "Payload Too Large")
+        form.fields.setdefault(name, []).append(value)
+        form.count += 1
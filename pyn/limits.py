@@ -0,0 +1,167 @@
+"""
+File to define the rate and concurrency limits of the router.
+Requests over the limits are refused before their body is read.
+"""
+
+from asyncio     import Semaphore, TimeoutError, wait_for
+from collections import OrderedDict
+from time        import monotonic
+from .parser     import HTTPError
+
+
+class TokenBuckets:
+    """
+    One token bucket per key (a client IP, a route), refilled with "rate" tokens per second
+    up to "burst" tokens. A request takes one token, or is refused when the bucket is empty.
+
+    A bucket is a (tokens, time) tuple in an LRU dict of at most "max_keys" buckets.
+    Full buckets are the same as new ones, so they are removed as soon as they are full again:
+    the memory follows the number of recently active keys.
+    """
+
+    def __init__(self, rate: float, burst: float = None, max_keys: int = 65536):
+        self.rate = rate
+        self.burst = rate if burst is None else burst
+        self.max_keys = max_keys
+        self.refill = self.burst / rate
+
+        self.buckets = OrderedDict()
+
+    def __str__(self):
+        return f"TokenBuckets of {self.rate}/s (burst {self.burst}) for {len(self.buckets)} keys"
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def take(self, key, now: float = None) -> float:
+        """
+        Take a token from the bucket of a key.
+        Returns 0 when the request is allowed, else the seconds before the next token.
+
+        Args:
+        key: The key of the bucket.
+        now (float): The current time.monotonic(), to take several buckets at the same time.
+        """
+        now = monotonic() if now is None else now
+        bucket = self.buckets.get(key)
+
+        if bucket is None:
+            tokens = self.burst
+            self._expire(now)
+        else:
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            self.buckets.move_to_end(key)
+
+        if tokens >= 1:
+            self.buckets[key] = (tokens - 1, now)
+            return 0.0
+
+        self.buckets[key] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+    def _expire(self, now: float) -> None:
+        # Remove the buckets full again, and the least recently used ones above "max_keys"
+        buckets = self.buckets
+        while buckets:
+            key, (_, time) = next(iter(buckets.items()))
+            if now - time < self.refill and len(buckets) < self.max_keys:
+                break
+            del buckets[key]
+
+
+class Limiter:
+    """
+    Limits of the router, checked before the body of a request is read.
+    - "rate" requests per second for each client IP, with bursts of "burst" requests.
+    - "routes" limits the requests per second of routes, for all clients together:
+      {"/login": (rate, burst)}, the routes as registered ("/users/<id:int>").
+    - "max_in_flight" requests handled at the same time, the next ones wait
+      "queue_timeout" seconds at most for their turn.
+
+    Refused requests get 429 (rates) or 503 (in flight) with "Retry-After",
+    and are counted in "rejected".
+
+    Usage : router.limiter = Limiter(rate=10, burst=20, max_in_flight=1000)
+    """
+
+    def __init__(
+        self,
+        rate: float = None,
+        burst: float = None,
+        routes: dict = None,
+        max_in_flight: int = None,
+        queue_timeout: float = 1.0,
+        max_clients: int = 65536,
+    ):
+        self.clients = TokenBuckets(rate, burst, max_clients) if rate else None
+        self.routes = {
+            route: TokenBuckets(*limit, max_keys=1) for route, limit in (routes or {}).items()
+        }
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.semaphore = Semaphore(max_in_flight) if max_in_flight else None
+
+        self.in_flight = 0
+        self.rejected = {"client": 0, "route": 0, "in_flight": 0}
+
+    def __str__(self):
+        return f"Limiter with {self.in_flight} requests in flight, {sum(self.rejected.values())} rejected"
+
+    def check(self, client: str, route: str | None) -> None:
+        """
+        Take a token for the client and for the route.
+        Raises an HTTPError (429) when one of them is over its rate.
+
+        Args:
+        client (str): The IP of the client.
+        route (str): The registered path of the route, None when unknown.
+        """
+        now = monotonic()
+
+        if self.clients is not None:
+            wait = self.clients.take(client, now)
+            if wait:
+                self.rejected["client"] += 1
+                raise HTTPError(429, "Too Many Requests", retry_after=wait)
+
+        buckets = self.routes.get(route)
+        if buckets is not None:
+            wait = buckets.take(route, now)
+            if wait:
+                self.rejected["route"] += 1
+                raise HTTPError(429, "Too Many Requests", retry_after=wait)
+
+    async def acquire(self) -> None:
+        """
+        Wait for a place among the requests in flight.
+        Raises an HTTPError (503) after "queue_timeout" seconds of waiting.
+        Every successful call must be followed by "release".
+        """
+        if self.semaphore is None:
+            return
+
+        try:
+            await wait_for(self.semaphore.acquire(), self.queue_timeout)
+        except TimeoutError as e:
+            self.rejected["in_flight"] += 1
+            raise HTTPError(503, "Service Unavailable", retry_after=self.queue_timeout) from e
+        self.in_flight += 1
+
+    def release(self) -> None:
+        """
+        Give back the place of a request in flight.
+        """
+        if self.semaphore is None:
+            return
+        self.in_flight -= 1
+        self.semaphore.release()
+
+    def stats(self) -> dict:
+        """
+        Get the counters of the limiter.
+        """
+        return {
+            "in_flight": self.in_flight,
+            "clients":   len(self.clients) if self.clients is not None else 0,
+            "rejected":  dict(self.rejected),
+        }
@@ -2,9 +2,20 @@
 File to define the Logger class.
 """
 
-from datetime import datetime
-from re       import sub
-from aiofiles import open as aio_open
+from datetime  import datetime
+from re        import compile
+from queue     import Queue, Full, Empty
+from threading import Thread, Event, Lock
+from time      import monotonic, time
+from sys       import stderr, stdout
+from atexit    import register
+from os        import register_at_fork
+from asyncio   import get_running_loop
+from random    import random
+from .formatters import AccessRecord, Formatter, FORMATTERS
+
+
+ANSI = compile(r"\033\[[0-9;]*[mK]")
 
 
 class Logger:
@@ -13,14 +24,77 @@ class Logger:
     Log in both console and file.
     The output file is defined by the user.
     Default file: pyn.log.
+
+    Logging never waits for the disk: lines go in a queue, and a background thread
+    writes them in batches, with one file handle kept open.
+    When the queue is full, "policy" decides: "drop" the new line, "drop_oldest"
+    line of the queue, or "block" until there is room.
+    The console output can be disabled with console=False (recommended in production).
+
+    The access log lines ("all_log") use the "access_format" formatter:
+    "pretty" (default), "json" (JSON lines), "combined" (Apache) or a Formatter instance.
+    "sampling" keeps only a part of them, by status code or class of status code:
+    {2: 0.01, 5: 1.0} logs 1% of the 2xx and every 5xx (missing ones are always logged).
     """
 
-    def __init__(self, filename: str = "pyn.log") -> None:
+    def __init__(
+        self,
+        filename: str = "pyn.log",
+        console: bool = True,
+        queue_size: int = 10000,
+        batch_size: int = 512,
+        flush_interval: float = 1.0,
+        policy: str = "drop",
+        access_format: str | Formatter = "pretty",
+        sampling: dict[int, float] = None
+    ) -> None:
+        if policy not in ("drop", "drop_oldest", "block"):
+            raise ValueError(f"Unknown policy {policy}, use 'drop', 'drop_oldest' or 'block'")
+
         self.filename = filename
+        self.console = console
+        self.policy = policy
+        self.formatter = (
+            FORMATTERS[access_format]() if isinstance(access_format, str) else access_format
+        )
+        self.sampling = {} if sampling is None else sampling
+
+        self._record = AccessRecord()
+
+        # Every logger of the same file shares the same writer
+        self._writer = _Writer.get(filename, queue_size, batch_size, flush_interval)
 
     def __str__(self):
         return f"Logger writing to {self.filename}"
 
+    @property
+    def dropped(self) -> int:
+        """
+        Number of lines dropped because the queue was full.
+        """
+        return self._writer.dropped
+
+    async def flush(self) -> None:
+        """
+        Wait until every line logged before is written.
+        """
+        await get_running_loop().run_in_executor(None, self._writer.flush)
+
+    async def close(self) -> None:
+        """
+        Write every waiting line, then stop the background writer and close the file.
+        Called by the router when it shuts down.
+        """
+        await get_running_loop().run_in_executor(None, self._writer.close)
+
+    @staticmethod
+    def close_all() -> None:
+        """
+        Write the waiting lines of every logger, then stop their writers and close the files.
+        Called when the program exits, and by the workers before they leave.
+        """
+        _Writer.close_all()
+
     async def all_log(
         self,
         status: int = 0,
@@ -29,21 +103,25 @@ class Logger:
         dst_ip: str = "",
         method: str = "",
         path: str = "",
-        start_time: datetime = datetime.now(),
+        start_time: datetime = None,
+        duration: float = None,
         **kwargs,
     ) -> None:
         """
         Log all the data to the console and to the log file. 
         Recommand to use "info", "warn", "error" or "debug" instead if possible. 
         Used by the router.
+        The duration is in milliseconds, computed from "start_time" if not given.
         """
 
-        end = datetime.now()
-        duration = (end - start_time).microseconds
+        if not self._is_sampled(status):
+            return
 
-        kwargs["path"] = f'"{path}"'
+        if duration is None:
+            duration = (datetime.now() - start_time).total_seconds() * 1000 if start_time else 0.0
+        duration = round(duration, 3)
 
-        await self.file_log(status, protocol, src_ip, dst_ip, duration, **kwargs)
+        await self.file_log(status, protocol, src_ip, dst_ip, duration, method=method, path=path, **kwargs)
         await self.console_log(status, dst_ip, method, duration, path)
 
     async def file_log(
@@ -52,38 +130,46 @@ class Logger:
         protocol: str = "HTTP/1.1",
         src_ip: str = "",
         dst_ip: str = "",
-        duration: int = 0,
+        duration: float = 0,
         **kwargs,
     ) -> None:
         """
-        Write the data to the log file. 
-        Used by the router. 
-
-        TODO Make it easier to understand
+        Write the data to the log file, with the formatter of the logger.
+        Used by the router.
+        "method", "path", "size", "user_agent" and "referer" go in their field
+        of the record, the other kwargs (if not None) are extra fields.
         """
 
         try:
-            date = datetime.now().strftime("%d/%m/%Y %H:%M:%S.%f")
-            level = "INFO" if status < 400 else "WARNING" if status < 500 else "ERROR"
-            msg = ""
-
-            for key, value in kwargs.items():
-                msg += f" │ {key.upper()}={value}".ljust(28) if value is None else ""
-            try :
-                data = f"[PYN] {date} │ {level.ljust(7)} │ SRC_IP={src_ip.ljust(15)} -> DST_IP={dst_ip.ljust(15)} │ DURATION={(str(duration)+'ms').ljust(10)} │ PROTO={protocol.ljust(7)} │ STATUS={status}{msg}\n"
-                async with aio_open(self.filename, "a", encoding="utf-8") as file:
-                    await file.write(data)
-            except SyntaxError :
-                pass
+            # Nothing is awaited while the record is used, so one record is enough
+            record = self._record
+            record.time = time()
+            record.status = status
+            record.protocol = protocol
+            record.src_ip = src_ip
+            record.dst_ip = dst_ip
+            record.duration = duration
+            record.method = kwargs.pop("method", "")
+            record.path = kwargs.pop("path", "")
+            record.size = kwargs.pop("size", None)
+            record.user_agent = kwargs.pop("user_agent", None)
+            record.referer = kwargs.pop("referer", None)
+            record.extra = kwargs
+
+            data = self.formatter.format(record)
+            record.extra = None
         except Exception as e:
-            print("Failed to write to file:", e)
+            print("Failed to format the log line:", e, file=stderr)
+            return
+
+        await self._put(data, None)
 
     async def console_log(
         self,
         status: int = 0,
         ip: str = "",
         method: str = "",
-        duration: int = 0,
+        duration: float = 0,
         path: str = ""
     ) -> None:
         """
@@ -91,16 +177,26 @@ class Logger:
         Used by the router. 
         Easier than "file_log" to understand.
         """
+        if not self.console:
+            return
 
         date = f" \033[1m{datetime.now().strftime('%d/%m/%Y %H:%M:%S.%f')}\033[0m "
 
         status = f"{self._get_ansi_status(status)} {str(status).rjust(5).ljust(7)} \033[0m"
         method = f" {self._get_ansi_method(method)}{method.ljust(7)}\033[0m "
 
-        print(
-            f'[PYN]{date}│{status}│ {ip.rjust(15)} │ {str(duration).rjust(10)}ms │{method}│ "{path}"'
+        await self._put(
+            None, f'[PYN]{date}│{status}│ {ip.rjust(15)} │ {str(duration).rjust(10)}ms │{method}│ "{path}"\n'
         )
 
+    def _is_sampled(self, status: int) -> bool:
+        # Helper method to know if this access must be logged
+        if not self.sampling:
+            return True
+
+        rate = self.sampling.get(status, self.sampling.get(status // 100, 1.0))
+        return rate >= 1.0 or random() < rate
+
     def _get_ansi_status(self, status: int = 0) -> str:
         # Helper method to get the ANSI color code for a given status code
         if 200 <= status < 300:
@@ -131,28 +227,15 @@ class Logger:
         Used by the router. 
         Recommend to use "info", "warn", "error" or "debug" instead if possible.
         """
-        try :
-            date = f"\033[1m{datetime.now().strftime('%d/%m/%Y %H:%M:%S.%f')}\033[0m"
-            status = f"""\033[4{
-                '1' if level == 'error'
-                else '3' if level == 'warning'
-                else '4' if level == 'debug'
-                else '2'}m {level.upper().ljust(7)} \033[0m"""
-
-            print(f"[PYN] {date} │{status}│ {message}")
+        date = f"\033[1m{datetime.now().strftime('%d/%m/%Y %H:%M:%S.%f')}\033[0m"
+        status = f"""\033[4{
+            '1' if level == 'error'
+            else '3' if level == 'warning'
+            else '4' if level == 'debug'
+            else '2'}m {level.upper().ljust(7)} \033[0m"""
 
-            try:
-                async with aio_open(self.filename, "a", encoding="utf-8") as file :
-                    message = f"[PYN] {date} │{status}│ {message}\n"
-                    regex = compile(r"\033\[[0-9;]*[mK]")
-
-                    message = sub(regex, '', message)
-
-                    await file.write(message)
-            except Exception as e:
-                print(f"Error while writing in the file : {e}")
-        except SyntaxError :
-            pass
+        line = f"[PYN] {date} │{status}│ {message}\n"
+        await self._put(ANSI.sub("", line), line if self.console else None)
 
     async def info(self, message: str = "") -> None:
         """
@@ -177,3 +260,167 @@ class Logger:
         Log a debug message. Used by the
         """
         await self.write(message, "debug")
+
+    async def _put(self, file_line: str | None, console_line: str | None) -> None:
+        # Give the lines to the background writer, following the queue policy.
+        item = (file_line, console_line)
+        queue = self._writer.start()
+
+        try:
+            queue.put_nowait(item)
+            return
+        except Full:
+            pass
+
+        if self.policy == "block":
+            await get_running_loop().run_in_executor(None, queue.put, item)
+            return
+
+        if self.policy == "drop_oldest":
+            # Only a line is dropped, never a flush or close request: the caller waits for it
+            controls = []
+            evicted = False
+            try:
+                while not evicted:
+                    oldest = queue.get_nowait()
+                    if oldest is None or isinstance(oldest, Event):
+                        controls.append(oldest)
+                    else:
+                        evicted = True
+            except Empty:
+                pass
+
+            # Their room was just made, "put" can only wait for the writer thread
+            for control in controls:
+                queue.put(control)
+
+            try:
+                queue.put_nowait(item)
+                if not evicted:
+                    return
+            except Full:
+                pass
+
+        self._writer.dropped += 1
+
+
+class _Writer:
+    # Background thread writing the lines of one log file.
+    # The file stays open, lines are written in batches and flushed
+    # when the queue is empty or every "flush_interval" seconds.
+
+    writers = {}
+    lock = Lock()
+
+    def __init__(self, filename: str, queue_size: int, batch_size: int, flush_interval: float):
+        self.filename = filename
+        self.queue = Queue(queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.thread = None
+
+    @classmethod
+    def get(cls, filename: str, queue_size: int, batch_size: int, flush_interval: float):
+        # Get the writer of a file, creating it the first time
+        with cls.lock:
+            writer = cls.writers.get(filename)
+            if writer is None:
+                writer = cls.writers[filename] = cls(filename, queue_size, batch_size, flush_interval)
+            return writer
+
+    def start(self) -> Queue:
+        # Start the thread on the first line logged
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = Thread(target=self.run, name=f"pyn-logger {self.filename}", daemon=True)
+                    self.thread.start()
+        return self.queue
+
+    def flush(self) -> None:
+        # Wait until every line in the queue is written
+        if self.thread is not None and self.thread.is_alive():
+            done = Event()
+            self.queue.put(done)
+            done.wait()
+
+    def close(self) -> None:
+        # Write what is left and stop the thread
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self.thread = None
+
+    def run(self) -> None:
+        try:
+            file = open(self.filename, "a", encoding="utf-8", buffering=1048576)
+        except OSError as e:
+            print(f"Failed to open the log file {self.filename} : {e}", file=stderr)
+            file = None
+
+        last_flush = monotonic()
+        running = True
+
+        while running:
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except Empty:
+                batch = []
+
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+
+            lines, console, events = [], [], []
+            for item in batch:
+                if item is None:
+                    running = False
+                elif isinstance(item, Event):
+                    events.append(item)
+                else:
+                    if item[0] is not None:
+                        lines.append(item[0])
+                    if item[1] is not None:
+                        console.append(item[1])
+
+            try:
+                if console:
+                    stdout.write("".join(console))
+                if lines and file is not None:
+                    file.write("".join(lines))
+
+                if events or not running or self.queue.empty() or monotonic() - last_flush >= self.flush_interval:
+                    stdout.flush()
+                    if file is not None:
+                        file.flush()
+                    last_flush = monotonic()
+            except Exception as e:
+                print("Failed to write to file:", e, file=stderr)
+
+            for event in events:
+                event.set()
+
+        if file is not None:
+            file.close()
+
+    @classmethod
+    def close_all(cls) -> None:
+        # Write every waiting line when the program exits
+        for writer in list(cls.writers.values()):
+            writer.close()
+
+    @classmethod
+    def after_fork(cls) -> None:
+        # Threads don't survive a fork: the child starts its own writers,
+        # the lines queued before the fork are written by the parent
+        cls.lock = Lock()
+        for writer in cls.writers.values():
+            writer.queue = Queue(writer.queue.maxsize)
+            writer.thread = None
+
+
+register(Logger.close_all)
+register_at_fork(after_in_child=_Writer.after_fork)
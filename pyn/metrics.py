@@ -0,0 +1,212 @@
+"""
+File to define the request metrics.
+Latencies are kept in HDR-style histograms, one per route, method and status.
+"""
+
+
+class Histogram:
+    """
+    HDR-style histogram of durations in microseconds.
+    Values are counted in log-linear buckets: every power of two is split in
+    2 ** (precision - 1) buckets, so a value is known within 2 ** (1 - precision)
+    (0.8% with the default precision), whatever its size, in a few KB of memory.
+    """
+
+    def __init__(self, precision: int = 8):
+        self.precision = precision
+        self.sub_buckets = 1 << precision
+        self.half = self.sub_buckets >> 1
+
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def __str__(self):
+        return f"Histogram of {self.count} values, p50={self.percentile(50)}µs p99={self.percentile(99)}µs"
+
+    def __len__(self):
+        return self.count
+
+    def record(self, value: int) -> None:
+        """
+        Add a value to the histogram.
+
+        Args:
+        value (int): The duration in microseconds.
+        """
+        value = max(int(value), 0)
+
+        if value < self.sub_buckets:
+            index = value
+        else:
+            shift = value.bit_length() - self.precision
+            index = (shift << (self.precision - 1)) + (value >> shift)
+
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram") -> None:
+        """
+        Add the values of another histogram (with the same precision) to this one.
+
+        Args:
+        other (Histogram): The histogram to add.
+        """
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def percentile(self, percent: float) -> int:
+        """
+        Get the value under which "percent" % of the values are.
+        Returns 0 for an empty histogram.
+
+        Args:
+        percent (float): Between 0 and 100 (50 for the median, 99 for p99).
+        """
+        if not self.count:
+            return 0
+
+        target = max(1, round(self.count * percent / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self.upper(index), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        """
+        Get the mean of the values, in microseconds.
+        """
+        return self.total / self.count if self.count else 0.0
+
+    def upper(self, index: int) -> int:
+        """
+        Get the highest value counted in a bucket.
+
+        Args:
+        index (int): The bucket index.
+        """
+        if index < self.sub_buckets:
+            return index
+        shift = index // self.half - 1
+        sub_bucket = index - shift * self.half
+        return ((sub_bucket + 1) << shift) - 1
+
+    def cumulative(self, bounds: tuple[int]) -> list[int]:
+        """
+        Count the values under each bound, for Prometheus buckets.
+
+        Args:
+        bounds (tuple[int]): Sorted bounds, in microseconds.
+        """
+        counts = [0] * len(bounds)
+        for index, count in self.counts.items():
+            value = self.upper(index)
+            for position, bound in enumerate(bounds):
+                if value <= bound:
+                    counts[position] += count
+                    break
+
+        for position in range(1, len(counts)):
+            counts[position] += counts[position - 1]
+        return counts
+
+
+class Metrics:
+    """
+    Latency histograms of the router, one per route, method and status.
+    The route is the registered path ("/users/<id>"), not the requested one,
+    to keep the number of histograms small.
+    Can be served in the Prometheus text format with "router.enable_metrics()".
+    """
+
+    # Bounds of the Prometheus buckets, in seconds
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, precision: int = 8):
+        self.precision = precision
+        self.histograms = {}
+
+    def __str__(self):
+        return f"Metrics with {len(self.histograms)} histograms"
+
+    def observe(self, route: str, method: str, status: int, duration: int) -> None:
+        """
+        Record the duration of a request.
+
+        Args:
+        route (str): The registered path of the route.
+        method (str): The HTTP method.
+        status (int): The status code of the response.
+        duration (int): The duration in nanoseconds.
+        """
+        key = (route, method, status)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(self.precision)
+        histogram.record(duration // 1000)
+
+    def histogram(self, route: str = None, method: str = None, status: int = None) -> Histogram:
+        """
+        Get the histogram of the requests matching the filters, all of them by default.
+
+        Args:
+        route (str): Only this route.
+        method (str): Only this method.
+        status (int): Only this status code.
+        """
+        merged = Histogram(self.precision)
+        for (key_route, key_method, key_status), histogram in self.histograms.items():
+            if (
+                (route is None or route == key_route)
+                and (method is None or method == key_method)
+                and (status is None or status == key_status)
+            ):
+                merged.merge(histogram)
+        return merged
+
+    def reset(self) -> None:
+        """
+        Forget every recorded value.
+        """
+        self.histograms.clear()
+
+    def render(self) -> str:
+        """
+        Get every histogram in the Prometheus text format.
+        """
+        bounds = tuple(int(bound * 1000000) for bound in self.BUCKETS)
+        name = "pyn_request_duration_seconds"
+        lines = [
+            f"# HELP {name} Time between the end of the request reading and the end of the response writing.",
+            f"# TYPE {name} histogram",
+        ]
+
+        for (route, method, status), histogram in sorted(self.histograms.items(), key=lambda item: str(item[0])):
+            labels = f'route="{self._escape(route)}",method="{self._escape(method)}",status="{status}"'
+            for bound, count in zip(self.BUCKETS, histogram.cumulative(bounds)):
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.total / 1000000}")
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        # Helper method to escape a Prometheus label value
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,102 @@
+"""
+File to define the Pipeline class.
+Composes the middlewares of each route once, into a single call chain.
+"""
+
+
+class Pipeline:
+    """
+    Middlewares of the router, in two phases:
+    - "before" middlewares run before the handler, and stop the chain by sending a response
+      (the handler and the next middlewares are skipped), to reject a request early.
+    - "after" middlewares run when the response is sent, just before it's written,
+      and can rewrite "res.response" (headers and body).
+
+    A middleware applies to every route, to one route (its registered path, "/users/<id:int>")
+    or to the routes under a prefix ("/api"). The chain of a route is built on its first
+    request and reused, so a middleware costs nothing on the routes it doesn't apply to.
+    """
+
+    def __init__(self):
+        self.before = []
+        self.after = []
+        self.chains = {}
+
+    def __str__(self):
+        return f"Pipeline with {len(self.before)} before and {len(self.after)} after middlewares"
+
+    def add(self, phase: str, middleware: callable, route: str = None, prefix: str = None) -> None:
+        """
+        Add a middleware, the chains are built again on the next requests.
+
+        Args:
+        phase (str): "before" or "after".
+        middleware (callable): Async function taking the request and the response.
+        route (str): Only for this route, as registered.
+        prefix (str): Only for the routes under this path.
+        """
+        if phase not in ("before", "after"):
+            raise ValueError(f"Unknown middleware phase : {phase}")
+
+        if prefix is not None:
+            prefix = prefix.rstrip("/")
+        getattr(self, phase).append((middleware, route, prefix))
+        self.chains.clear()
+
+    def get(self, method: str, route: str | None, handler: callable) -> tuple[callable, tuple]:
+        """
+        Get the chain of a route: the handler behind its "before" middlewares,
+        and the "after" middlewares to give to the response.
+
+        Args:
+        method (str): The HTTP method.
+        route (str): The registered path of the route, None when no route matched.
+        handler (callable): The handler of the route.
+        """
+        chain = self.chains.get((method, route))
+
+        # A route registered again has a new handler
+        if chain is None or chain[0] is not handler:
+            chain = self.chains[(method, route)] = self._compose(route, handler)
+        return chain[1], chain[2]
+
+    def compile(self, routes: dict) -> None:
+        """
+        Build the chains of every registered route at once, before serving.
+
+        Args:
+        routes (dict): The route trees of the router, by method.
+        """
+        for method, tree in routes.items():
+            for route, handler in tree.routes():
+                self.get(method, route, handler)
+
+    def _compose(self, route: str | None, handler: callable) -> tuple[callable, callable, tuple]:
+        # Build the chain of a route, with only the middlewares applying to it
+        call = handler
+        for middleware in reversed(self._select(self.before, route)):
+            call = self._link(middleware, call)
+        return handler, call, self._select(self.after, route)
+
+    @staticmethod
+    def _select(middlewares: list, route: str | None) -> tuple:
+        # Keep the middlewares of a route, in the order they were added
+        selected = []
+        for middleware, only, prefix in middlewares:
+            if only is not None and only != route:
+                continue
+            if prefix is not None and (
+                route is None or (route != prefix and not route.startswith(prefix + "/"))
+            ):
+                continue
+            selected.append(middleware)
+        return tuple(selected)
+
+    @staticmethod
+    def _link(middleware: callable, following: callable) -> callable:
+        # One link of the chain: the middleware, then the rest unless it answered
+        async def link(request, response):
+            await middleware(request, response)
+            if not response.sent:
+                await following(request, response)
+        return link
@@ -0,0 +1,482 @@
+"""
+File to define the HTTP request parser.
+Requests are read from the stream piece by piece and never above the configured limits.
+The "feed" methods parse the same way from a buffer, for the asyncio.Protocol fast path.
+"""
+
+from asyncio import StreamReader, IncompleteReadError, LimitOverrunError
+from typing  import AsyncIterator
+
+
+# Max size of the pieces of a streamed body
+CHUNK_SIZE = 65536
+
+
+class HTTPError(Exception):
+    """
+    Error raised when a request can't be read, or is refused.
+    Holds the HTTP status code the client must receive,
+    the seconds it should wait before trying again ("Retry-After")
+    and the other headers of the error response, if any.
+    """
+
+    def __init__(
+        self, status: int = 400, message: str = "Bad Request", retry_after: float = None, headers: dict = None
+    ):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+        self.headers = headers
+
+
+class Parser:
+    """
+    Incremental HTTP/1.x request parser.
+    Reads the request line and headers up to the blank line, then the body
+    by Content-Length or chunked transfer encoding.
+    Too big headers give a 431 error, too big bodies a 413 error.
+    """
+
+    def __init__(self, max_header_size: int = 65536, max_body_size: int = 16777216):
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+
+    def __str__(self):
+        return f"Parser (headers <= {self.max_header_size} bytes, body <= {self.max_body_size} bytes)"
+
+    async def read_head(self, reader: StreamReader) -> dict | None:
+        """
+        Read the request line and the headers of the next request.
+        Returns None when the client closed the connection.
+
+        Args:
+        reader (asyncio.StreamReader): Stream to read the request from.
+        """
+        head = b""
+
+        # Empty lines are allowed between pipelined requests
+        while not head:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except IncompleteReadError as e:
+                if e.partial.strip():
+                    raise HTTPError(400, "Incomplete request") from e
+                return None
+            except LimitOverrunError as e:
+                raise HTTPError(431, "Request Header Fields Too Large") from e
+
+            head = head.lstrip(b"\r\n")
+
+        if len(head) > self.max_header_size:
+            raise HTTPError(431, "Request Header Fields Too Large")
+
+        return self.parse_head(head)
+
+    def feed_head(self, buffer: bytearray) -> tuple[dict, int] | None:
+        """
+        Parse the request line and the headers at the start of a buffer.
+        Returns the head and the offset of its end in the buffer,
+        or None while the blank line is not received.
+
+        Args:
+        buffer (bytearray): The bytes received on the connection.
+        """
+        # Empty lines are allowed between pipelined requests
+        start = 0
+        while buffer.startswith(b"\r\n", start):
+            start += 2
+
+        end = buffer.find(b"\r\n\r\n", start)
+        if end == -1:
+            if len(buffer) - start > self.max_header_size:
+                raise HTTPError(431, "Request Header Fields Too Large")
+            return None
+
+        end += 4
+        if end - start > self.max_header_size:
+            raise HTTPError(431, "Request Header Fields Too Large")
+
+        return self.parse_head(bytes(buffer[start:end])), end
+
+    def feed_body(self, buffer: bytearray, head: dict, start: int) -> tuple[bytes, int] | None:
+        """
+        Get the body of the request described by head from a buffer.
+        Returns the body and the offset of its end in the buffer, or None while it's incomplete.
+
+        Args:
+        buffer (bytearray): The bytes received on the connection.
+        head (dict): The head of the request, as given by "feed_head".
+        start (int): The offset of the body in the buffer.
+        """
+        if head["chunked"]:
+            return self._feed_chunked(buffer, start)
+
+        if head["length"] > self.max_body_size:
+            raise HTTPError(413, "Payload Too Large")
+
+        end = start + head["length"]
+        if len(buffer) < end:
+            return None
+        return bytes(buffer[start:end]), end
+
+    def parse_head(self, head: bytes) -> dict:
+        """
+        Parse the request line and check the headers in a single pass over the bytes.
+        Only the headers needed to read the request are decoded ("Content-Length",
+        "Transfer-Encoding", "Connection", "Expect"), the others are kept as raw bytes
+        in "headers", for the Request to parse when the handler reads them.
+
+        Args:
+        head (bytes): Everything before the body, blank line included.
+        """
+        lines = head.split(b"\r\n")
+
+        try:
+            method, target, protocol = lines[0].split(b" ")
+        except ValueError as e:
+            raise HTTPError(400, "Malformed request line") from e
+
+        if not protocol.startswith(b"HTTP/1."):
+            raise HTTPError(400, "Unsupported protocol")
+
+        length = None
+        chunked = False
+        connection = b""
+        expect = b""
+
+        for line in lines[1:]:
+            if not line:
+                continue
+
+            name, separator, value = line.partition(b":")
+            if not separator or not name or name != name.strip():
+                raise HTTPError(400, "Malformed header")
+
+            lower = name.lower()
+
+            if lower == b"content-length":
+                value = value.strip()
+                if not value.isdigit() or (length is not None and length != int(value)):
+                    raise HTTPError(400, "Invalid Content-Length")
+                length = int(value)
+            elif lower == b"transfer-encoding":
+                # Only "chunked" alone: a body still encoded once de-chunked would reach the handler as is
+                coding = value.strip().lower()
+                if chunked or b"," in coding:
+                    raise HTTPError(400, "Stacked Transfer-Encoding")
+                if coding != b"chunked":
+                    raise HTTPError(501, "Unsupported Transfer-Encoding")
+                chunked = True
+            elif lower == b"connection":
+                connection += b"," + value
+            elif lower == b"expect":
+                expect += value
+
+        # A request with both can be read two different ways, so it's refused
+        if chunked and length is not None:
+            raise HTTPError(400, "Both Content-Length and Transfer-Encoding")
+
+        return {
+            "method":     method.decode("latin-1"),
+            "target":     target.decode("latin-1"),
+            "protocol":   protocol.decode("latin-1"),
+            "headers":    head[len(lines[0]) + 2:],
+            "connection": connection.decode("latin-1").lower(),
+            "expect":     expect.decode("latin-1").lower(),
+            "length":     length or 0,
+            "chunked":    chunked,
+        }
+
+    async def read_body(self, reader: StreamReader, head: dict) -> bytes:
+        """
+        Read the body of the request described by head.
+
+        Args:
+        reader (asyncio.StreamReader): Stream to read the body from.
+        head (dict): The result of "read_head".
+        """
+        if head["chunked"]:
+            return await self._read_chunked(reader)
+
+        if head["length"] > self.max_body_size:
+            raise HTTPError(413, "Payload Too Large")
+
+        if not head["length"]:
+            return b""
+
+        return await reader.readexactly(head["length"])
+
+    def stream_body(self, reader: StreamReader, head: dict, max_size: int = None) -> "BodyStream":
+        """
+        Get the body of the request described by head as a stream of chunks,
+        read from the connection while the handler iterates on it.
+        Raises an HTTPError (413) at once when the Content-Length is over the limit,
+        or while it's read when a chunked body goes over it.
+
+        Args:
+        reader (asyncio.StreamReader): Stream to read the body from.
+        head (dict): The result of "read_head".
+        max_size (int): Max size in bytes of the body, "max_body_size" by default.
+        """
+        max_size = self.max_body_size if max_size is None else max_size
+        if not head["chunked"] and head["length"] > max_size:
+            raise HTTPError(413, "Payload Too Large")
+        return BodyStream(self._iter_body(reader, head, max_size))
+
+    async def _iter_body(self, reader: StreamReader, head: dict, max_size: int) -> AsyncIterator[bytes]:
+        # Read a body piece by piece, never more than CHUNK_SIZE bytes at once.
+        if not head["chunked"]:
+            remaining = head["length"]
+            while remaining:
+                chunk = await reader.read(min(remaining, CHUNK_SIZE))
+                if not chunk:
+                    raise IncompleteReadError(b"", remaining)
+                remaining -= len(chunk)
+                yield chunk
+            return
+
+        total = 0
+        while True:
+            size = self._chunk_size(await self._read_line(reader))
+            if size == 0:
+                break
+            total += size
+            if total > max_size:
+                raise HTTPError(413, "Payload Too Large")
+
+            while size:
+                chunk = await reader.readexactly(min(size, CHUNK_SIZE))
+                size -= len(chunk)
+                yield chunk
+            if await reader.readexactly(2) != b"\r\n":
+                raise HTTPError(400, "Invalid chunk")
+
+        # Trailers are read and ignored
+        trailers = 0
+        while await self._read_line(reader):
+            trailers += 1
+            if trailers > 100:
+                raise HTTPError(431, "Request Header Fields Too Large")
+
+    async def _read_chunked(self, reader: StreamReader) -> bytes:
+        # Read a body sent with chunked transfer encoding, chunk by chunk.
+        body = bytearray()
+
+        while True:
+            line = await self._read_line(reader)
+            size = self._chunk_size(line)
+
+            if size == 0:
+                break
+            if len(body) + size > self.max_body_size:
+                raise HTTPError(413, "Payload Too Large")
+
+            body += await reader.readexactly(size)
+            if await reader.readexactly(2) != b"\r\n":
+                raise HTTPError(400, "Invalid chunk")
+
+        # Trailers are read and ignored
+        trailers = 0
+        while await self._read_line(reader):
+            trailers += 1
+            if trailers > 100:
+                raise HTTPError(431, "Request Header Fields Too Large")
+
+        return bytes(body)
+
+    def _feed_chunked(self, buffer: bytearray, position: int) -> tuple[bytes, int] | None:
+        # Parse a chunked body from a buffer, from the start each time more bytes came.
+        # Only the positions of the chunks are kept until the body is complete.
+        chunks = []
+        total = 0
+
+        while True:
+            line = self._feed_line(buffer, position)
+            if line is None:
+                return None
+            line, position = line
+
+            size = self._chunk_size(line)
+
+            if size == 0:
+                break
+            total += size
+            if total > self.max_body_size:
+                raise HTTPError(413, "Payload Too Large")
+
+            if len(buffer) < position + size + 2:
+                return None
+            if buffer[position + size:position + size + 2] != b"\r\n":
+                raise HTTPError(400, "Invalid chunk")
+
+            chunks.append((position, size))
+            position += size + 2
+
+        # Trailers are read and ignored
+        trailers = 0
+        while True:
+            line = self._feed_line(buffer, position)
+            if line is None:
+                return None
+            line, position = line
+            if not line:
+                break
+            trailers += 1
+            if trailers > 100:
+                raise HTTPError(431, "Request Header Fields Too Large")
+
+        return b"".join(buffer[offset:offset + size] for offset, size in chunks), position
+
+    def _feed_line(self, buffer: bytearray, position: int) -> tuple[bytes, int] | None:
+        # Get one CRLF ended line of a buffer, without the CRLF, and the offset after it.
+        end = buffer.find(b"\r\n", position)
+        if end == -1:
+            if len(buffer) - position > self.max_header_size:
+                raise HTTPError(400, "Line too long")
+            return None
+
+        if end - position > self.max_header_size:
+            raise HTTPError(400, "Line too long")
+        return bytes(buffer[position:end]), end + 2
+
+    @staticmethod
+    def _chunk_size(line: bytes) -> int:
+        # Get the size of a chunk from its line, extensions ignored.
+        try:
+            size = int(line.split(b";", 1)[0], 16)
+            if size < 0:
+                raise ValueError(size)
+        except ValueError as e:
+            raise HTTPError(400, "Invalid chunk size") from e
+        return size
+
+    async def _read_line(self, reader: StreamReader) -> bytes:
+        # Read one CRLF ended line, without the CRLF.
+        try:
+            line = await reader.readuntil(b"\r\n")
+        except LimitOverrunError as e:
+            raise HTTPError(400, "Line too long") from e
+
+        if len(line) > self.max_header_size:
+            raise HTTPError(400, "Line too long")
+        return line[:-2]
+
+
+class BodyDecoder:
+    """
+    Incremental decoder of a request body, for the bodies streamed by the fast path.
+    Takes the bytes at the start of the buffer as they arrive and gives the pieces of the body,
+    so only what's not handled yet stays in memory.
+    """
+
+    def __init__(self, head: dict, max_size: int, max_line_size: int = 65536):
+        self.chunked = head["chunked"]
+        self.max_size = max_size
+        self.max_line_size = max_line_size
+        self.remaining = 0 if self.chunked else head["length"]
+        self.total = 0
+        self.trailers = 0
+        self.state = "size" if self.chunked else "data"
+        self.done = not self.chunked and not self.remaining
+
+        if not self.chunked and self.remaining > max_size:
+            raise HTTPError(413, "Payload Too Large")
+
+    def __str__(self):
+        return f"BodyDecoder in state {self.state}, {self.total} bytes decoded"
+
+    def feed(self, buffer: bytearray) -> list[bytes]:
+        """
+        Take the bytes of the body from the start of a buffer.
+        Returns the pieces of the body found, "done" is True once the body is complete.
+
+        Args:
+        buffer (bytearray): The bytes received on the connection, consumed in place.
+        """
+        chunks = []
+
+        while not self.done:
+            if self.state == "data":
+                if not buffer:
+                    break
+                size = min(self.remaining, len(buffer))
+                chunks.append(bytes(buffer[:size]))
+                del buffer[:size]
+                self.remaining -= size
+                if not self.remaining:
+                    self.state = "end" if self.chunked else "done"
+                    self.done = not self.chunked
+                continue
+
+            if self.state == "end":
+                if len(buffer) < 2:
+                    break
+                if buffer[:2] != b"\r\n":
+                    raise HTTPError(400, "Invalid chunk")
+                del buffer[:2]
+                self.state = "size"
+                continue
+
+            # The size line of a chunk, or a trailer
+            end = buffer.find(b"\r\n")
+            if end == -1:
+                if len(buffer) > self.max_line_size:
+                    raise HTTPError(400, "Line too long")
+                break
+            if end > self.max_line_size:
+                raise HTTPError(400, "Line too long")
+            line = bytes(buffer[:end])
+            del buffer[:end + 2]
+
+            if self.state == "trailers":
+                self.trailers += 1
+                if not line:
+                    self.state, self.done = "done", True
+                elif self.trailers > 100:
+                    raise HTTPError(431, "Request Header Fields Too Large")
+                continue
+
+            size = Parser._chunk_size(line)
+            if size == 0:
+                self.state = "trailers"
+                continue
+            self.total += size
+            if self.total > self.max_size:
+                raise HTTPError(413, "Payload Too Large")
+            self.remaining = size
+            self.state = "data"
+
+        return chunks
+
+
+class BodyStream:
+    """
+    Body of a request read while the handler runs, as an async iterator of bytes.
+    It can only be read once, "done" is True when it was read entirely:
+    a connection is closed after a request whose body wasn't.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self.chunks = chunks
+        self.started = False
+        self.done = False
+        self.size = 0
+
+    def __str__(self):
+        return f"BodyStream with {self.size} bytes read{', done' if self.done else ''}"
+
+    def __aiter__(self) -> "BodyStream":
+        if self.started:
+            raise RuntimeError("The body of the request was already read")
+        self.started = True
+        return self
+
+    async def __anext__(self) -> bytes:
+        try:
+            chunk = await self.chunks.__anext__()
+        except StopAsyncIteration:
+            self.done = True
+            raise
+        self.size += len(chunk)
+        return chunk
@@ -0,0 +1,378 @@
+"""
+File to define the HTTPProtocol class, fast path of the router.
+Requests are parsed straight from the bytes given to "data_received",
+without StreamReader, and responses are written on the transport.
+"""
+
+from asyncio import (
+    Protocol, Transport, StreamReader, StreamReaderProtocol, StreamWriter, get_running_loop, shield
+)
+from time    import perf_counter_ns
+from typing  import AsyncIterator
+from .parser import HTTPError, BodyDecoder, BodyStream
+
+
+class TransportWriter:
+    """
+    The part of asyncio.StreamWriter used by Response, written on a transport.
+    Lets the responses work the same way on both servers.
+    """
+
+    def __init__(self, transport: Transport, protocol: "HTTPProtocol"):
+        self.transport = transport
+        self.protocol = protocol
+
+    def __str__(self):
+        return f"TransportWriter to {self.get_extra_info('peername')}"
+
+    def write(self, data: bytes) -> None:
+        """
+        Write bytes on the connection, without waiting.
+
+        Args:
+        data (bytes): The bytes to write.
+        """
+        self.transport.write(data)
+
+    def writelines(self, data: list[bytes]) -> None:
+        """
+        Write several pieces of bytes on the connection, without joining them first.
+
+        Args:
+        data (list[bytes]): The bytes to write, in order.
+        """
+        self.transport.writelines(data)
+
+    async def drain(self) -> None:
+        """
+        Wait until the transport can take more bytes.
+        """
+        await self.protocol.drain()
+
+    def close(self) -> None:
+        """
+        Close the connection, once the written bytes are sent.
+        """
+        self.transport.close()
+
+    def is_closing(self) -> bool:
+        """
+        Know if the connection is closed or being closed.
+        """
+        return self.transport.is_closing()
+
+    async def wait_closed(self) -> None:
+        """
+        Wait until the connection is closed.
+        """
+        await shield(self.protocol.closed)
+
+    def get_extra_info(self, name: str, default=None):
+        """
+        Get information about the connection ("peername", "sockname", "socket"...).
+
+        Args:
+        name (str): The name of the information.
+        default: The value when the information doesn't exist.
+        """
+        return self.transport.get_extra_info(name, default)
+
+
+class HTTPProtocol(Protocol):
+    """
+    One connection of the fast path, enabled with "router.serve(fast=True)".
+    The bytes are kept in a buffer until a request is complete, then the router answers it.
+    Pipelined requests are answered one after another, in order, and reading
+    is paused while a request is handled and the next one is already buffered.
+    The bodies of the streamed routes are given to the handler as they arrive.
+    """
+
+    def __init__(self, router):
+        self.router = router
+        self.parser = router.parser
+        self.loop = get_running_loop()
+
+        self.transport = None
+        self.writer = None
+        self.buffer = bytearray()
+        self.head = None
+        self.decoder = None
+        self.body = bytearray()
+        self.task = None
+        self.timer = None
+        self.handled = 0
+        self.accepted = 0
+        self.eof = False
+
+        self.closed = self.loop.create_future()
+        self.reading = True
+        self.writing = True
+        self.drain_waiter = None
+        self.body_waiter = None
+
+    def __str__(self):
+        return f"HTTPProtocol with {len(self.buffer)} bytes buffered, {self.handled} requests handled"
+
+    # asyncio.Protocol methods
+
+    def connection_made(self, transport: Transport) -> None:
+        self.transport = transport
+        self.writer = TransportWriter(transport, self)
+        self.accepted = perf_counter_ns()
+        self.router.connections.add(self.writer)
+        self._set_timer()
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self.router.connections.discard(self.writer)
+        self._cancel_timer()
+        if not self.closed.done():
+            self.closed.set_result(None)
+        self._wake_drain(ConnectionResetError("Connection lost"))
+        self._wake_body()
+
+    def data_received(self, data: bytes) -> None:
+        self.buffer += data
+
+        if self.task is None:
+            self._next()
+            return
+
+        # The handler reading a streamed body waits for these bytes
+        self._wake_body()
+        if self.reading and len(self.buffer) > self.parser.max_header_size:
+            # The client sends faster than we answer, let the kernel hold the bytes
+            self.reading = False
+            self.transport.pause_reading()
+
+    def eof_received(self) -> bool:
+        # Answer the requests already received, then close
+        self.eof = True
+        if self.task is None:
+            self.transport.close()
+        self._wake_body()
+        return True
+
+    def pause_writing(self) -> None:
+        self.writing = False
+
+    def resume_writing(self) -> None:
+        self.writing = True
+        self._wake_drain()
+
+    async def drain(self) -> None:
+        """
+        Wait until the transport can take more bytes.
+        """
+        if self.closed.done():
+            raise ConnectionResetError("Connection lost")
+        if self.writing:
+            return
+
+        self.drain_waiter = self.loop.create_future()
+        await self.drain_waiter
+
+    # Helper methods
+
+    def _next(self) -> None:
+        # Start to answer the next request, if it's entirely in the buffer
+        if self.transport.is_closing():
+            return
+        if self.router.draining:
+            self.transport.close()
+            return
+
+        try:
+            if self.head is None:
+                found = self.parser.feed_head(self.buffer)
+                if found is None:
+                    if self.eof:
+                        self.transport.close()
+                    return
+                self.head = found
+
+                # The idle timer is for the time between requests, not for reading a body
+                self._cancel_timer()
+
+                # Requests over the rates are refused before reading their body
+                if self.router.limiter is not None:
+                    self.router._check_limits(self.writer, found[0])
+
+                # A WebSocket takes the connection over, until its client leaves
+                if self.router.websockets and "upgrade" in found[0]["connection"]:
+                    websocket, params = self.router._find_websocket(found[0])
+                    if websocket is not None:
+                        del self.buffer[:found[1]]
+                        self._upgrade(found[0], websocket, params)
+                        return
+
+                streamed = self.router._streamed_size(found[0]) if self.router.streamed else None
+
+                # The client waits for our approval before sending a big body
+                if self.router._wants_continue(found[0], streamed):
+                    self.transport.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+
+                # The handler reads the body itself, as it arrives
+                if streamed is not None:
+                    decoder = BodyDecoder(found[0], streamed, self.parser.max_header_size)
+                    del self.buffer[:found[1]]
+                    self._start(found[0], BodyStream(self._read_body(decoder)))
+                    return
+
+                # A chunked body is decoded as it arrives, never parsed again from its start
+                if found[0]["chunked"]:
+                    self.decoder = BodyDecoder(found[0], self.parser.max_body_size, self.parser.max_header_size)
+                    del self.buffer[:found[1]]
+
+            head, start = self.head
+            if self.decoder is not None:
+                self.body += b"".join(self.decoder.feed(self.buffer))
+                if not self.decoder.done:
+                    if self.eof:
+                        self.transport.close()
+                    return
+                body, self.body, self.decoder = bytes(self.body), bytearray(), None
+                self._start(head, body)
+                return
+
+            found = self.parser.feed_body(self.buffer, head, start)
+            if found is None:
+                if self.eof:
+                    self.transport.close()
+                return
+        except HTTPError as e:
+            self._cancel_timer()
+            self.task = self.loop.create_task(self._error(e))
+            return
+
+        body, end = found
+        del self.buffer[:end]
+        self._start(head, body)
+
+    def _start(self, head: dict, body: bytes | BodyStream) -> None:
+        # Start the task answering a request
+        self.head = None
+        self.handled += 1
+        self._cancel_timer()
+        self.task = self.loop.create_task(self._handle(head, body, perf_counter_ns()))
+
+    def _upgrade(self, head: dict, websocket, params: dict) -> None:
+        # Give the connection to a WebSocket: from now on, its bytes go to a StreamReader
+        self.head = None
+        self._cancel_timer()
+        self.router.connections.discard(self.writer)
+
+        reader = StreamReader(limit=self.parser.max_header_size)
+        protocol = StreamReaderProtocol(reader)
+        self.transport.set_protocol(protocol)
+        protocol.connection_made(self.transport)
+        if self.buffer:
+            reader.feed_data(bytes(self.buffer))
+            self.buffer.clear()
+        if self.eof:
+            reader.feed_eof()
+        if not self.reading:
+            self.reading = True
+            self.transport.resume_reading()
+
+        writer = StreamWriter(self.transport, protocol, reader, self.loop)
+        self.task = self.loop.create_task(self._handle_upgrade(websocket, reader, writer, head, params))
+
+    async def _handle_upgrade(
+        self, websocket, reader: StreamReader, writer: StreamWriter, head: dict, params: dict
+    ) -> None:
+        # Serve the client of a WebSocket, or refuse its handshake, then close
+        try:
+            await self.router._upgrade(websocket, reader, writer, head, params)
+        except HTTPError as e:
+            await self.router._send_error(writer, e)
+        except ConnectionError:
+            pass
+        except Exception as e:
+            await self.router.logger.error(e)
+        finally:
+            writer.close()
+            if not self.closed.done():
+                self.closed.set_result(None)
+
+    async def _read_body(self, decoder: BodyDecoder) -> AsyncIterator[bytes]:
+        # Give the pieces of a streamed body as they arrive, reading only when asked for more
+        while True:
+            for chunk in decoder.feed(self.buffer):
+                yield chunk
+            if decoder.done:
+                return
+            if self.eof or self.closed.done():
+                raise ConnectionResetError("Connection lost")
+
+            if not self.reading:
+                self.reading = True
+                self.transport.resume_reading()
+            self.body_waiter = self.loop.create_future()
+            await self.body_waiter
+
+    async def _handle(self, head: dict, body: bytes | BodyStream, parsed: int) -> None:
+        # Answer one request, then go on with the next one
+        limiter = self.router.limiter
+        acquired = False
+        try:
+            if limiter is not None:
+                await limiter.acquire()
+                acquired = True
+            keep = await self.router._handle_request(
+                self.writer, head, body, self.handled, self.accepted, parsed
+            )
+        except HTTPError as e:
+            keep = False
+            await self.router._send_error(self.writer, e)
+        except ConnectionError:
+            keep = False
+        finally:
+            if acquired:
+                limiter.release()
+            self.task = None
+
+        if not keep or self.router.draining:
+            self.transport.close()
+            return
+
+        if not self.reading:
+            self.reading = True
+            self.transport.resume_reading()
+
+        self._set_timer()
+        self._next()
+
+    async def _error(self, error: HTTPError) -> None:
+        # Answer a request that couldn't be read, then close
+        try:
+            await self.router._send_error(self.writer, error)
+        except ConnectionError:
+            pass
+        finally:
+            self.transport.close()
+
+    def _set_timer(self) -> None:
+        # Close the connection if it stays idle for too long
+        self._cancel_timer()
+        self.timer = self.loop.call_later(self.router.keep_alive_timeout, self.transport.close)
+
+    def _cancel_timer(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def _wake_drain(self, exc: Exception | None = None) -> None:
+        # Let the response waiting in "drain" write again
+        waiter, self.drain_waiter = self.drain_waiter, None
+        if waiter is None or waiter.done():
+            return
+        if exc is None:
+            waiter.set_result(None)
+        else:
+            waiter.set_exception(exc)
+
+    def _wake_body(self) -> None:
+        # Let the handler waiting for the next piece of a streamed body read again
+        waiter, self.body_waiter = self.body_waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
@@ -2,26 +2,288 @@
 File defining the Request Class.
 """
 
+from typing       import AsyncIterator
+from urllib.parse import parse_qs
+from .parser      import HTTPError, BodyStream
+from .serializer  import JSONBackend
+from .forms       import Form, FormParser
+
+# Default JSON backend, when the request doesn't come from a router
+JSON_BACKEND = JSONBackend()
+
+# Default form parser, when "form()" is called without one
+FORM_PARSER = FormParser()
+
+# Value of the parsed JSON before "json()" is called, None being valid JSON
+_UNPARSED = object()
+
+
+class Headers(dict):
+    """
+    Headers of a request, found whatever the case of their name.
+    The names are kept lowercased, a header sent several times has its values joined.
+    """
+
+    def __init__(self, headers: dict = None):
+        super().__init__()
+        for name, value in (headers or {}).items():
+            self[name] = value
+
+    def __getitem__(self, name: str) -> str:
+        return super().__getitem__(name.lower())
+
+    def __setitem__(self, name: str, value: str) -> None:
+        super().__setitem__(name.lower(), value)
+
+    def __delitem__(self, name: str) -> None:
+        super().__delitem__(name.lower())
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and super().__contains__(name.lower())
+
+    def get(self, name: str, default: str = None) -> str | None:
+        """
+        Get a header value, whatever the case of its name.
+
+        Args:
+        name (str): The header name ("Content-Type", "content-type", ...).
+        default (str): Value returned when the header is missing.
+        """
+        return super().get(name.lower(), default)
+
+    @classmethod
+    def parse(cls, raw: bytes) -> "Headers":
+        """
+        Build the headers from the raw header lines of a request, already checked by the parser.
+
+        Args:
+        raw (bytes): The header lines, separated by CRLF.
+        """
+        headers = cls()
+        for line in raw.split(b"\r\n"):
+            if not line:
+                continue
+            name, _, value = line.partition(b":")
+            name = name.decode("latin-1").lower()
+            value = value.strip().decode("latin-1")
+
+            # Cookies sent on several lines are one list of cookies
+            if dict.__contains__(headers, name):
+                value = f"{dict.__getitem__(headers, name)}{'; ' if name == 'cookie' else ', '}{value}"
+            dict.__setitem__(headers, name, value)
+        return headers
+
+
 class Request:
     """
-    Request class used to handle HTTP requests. 
-    Written with asyncio. 
-    You can use real asyncio with "request.reader" if needed (asyncio.StreamReader).
+    Request class used to handle HTTP requests.
+    Written with asyncio.
+
+    The headers, the query arguments and the cookies are only parsed the first time
+    they're read, so a handler pays for what it uses. "state" is a dict where middlewares
+    can keep data for the handler (the current user...).
+
+    The body is kept as bytes in "raw_body", and decoded in "body" when it's read.
+    On the routes registered with "router.streaming()", the handler reads the body
+    itself with "stream()" or "form()", as it arrives, and "body" isn't available.
     """
 
+    __slots__ = (
+        "method", "path", "query_string", "params", "state", "json_backend",
+        "_raw_headers", "_headers", "_query", "_cookies", "_json",
+        "_raw_body", "_body", "_stream", "_form",
+    )
 
     def __init__(
         self, method: str,
         path: str,
         headers: dict = None,
-        body: str = "",
-        params: dict = None
+        body: str | bytes | BodyStream = b"",
+        params: dict = None,
+        json_backend: JSONBackend = None,
+        query_string: str = "",
+        raw_headers: bytes = b""
     ):
         self.method = method
         self.path = path
-        self.headers = {} if headers is None else headers
-        self.body = body
+        self.query_string = query_string
         self.params = {} if params is None else params
+        self.state = {}
+        self.json_backend = JSON_BACKEND if json_backend is None else json_backend
+
+        self._raw_headers = raw_headers
+        self._headers = None if headers is None and raw_headers else Headers(headers)
+        self._query = None
+        self._cookies = None
+        self._json = _UNPARSED
+
+        self._stream = body if isinstance(body, BodyStream) else None
+        self._raw_body = body.encode("utf-8") if isinstance(body, str) else body
+        self._body = body if isinstance(body, str) else None
+        self._form = None
+
+    @property
+    def raw_body(self) -> bytes:
+        """
+        The body of the request, as bytes.
+        """
+        if self._stream is not None:
+            raise RuntimeError("The body of a streamed request is read with stream() or form()")
+        return self._raw_body
+
+    @property
+    def body(self) -> str:
+        """
+        The body of the request, decoded as UTF-8 on the first access.
+        """
+        if self._body is None:
+            self._body = self.raw_body.decode("utf-8", errors="replace")
+        return self._body
+
+    @body.setter
+    def body(self, body: str) -> None:
+        self._body = body
+        self._raw_body = body.encode("utf-8")
+        self._stream = None
+        self._json = _UNPARSED
+
+    @property
+    def headers(self) -> Headers:
+        """
+        The headers of the request, parsed on the first access.
+        """
+        if self._headers is None:
+            self._headers = Headers.parse(self._raw_headers)
+        return self._headers
+
+    @property
+    def query(self) -> dict[str, list[str]]:
+        """
+        The arguments of the query string, parsed on the first access.
+        Each name has the list of its values, "?tag=a&tag=b" gives {"tag": ["a", "b"]}.
+        """
+        if self._query is None:
+            self._query = parse_qs(self.query_string, keep_blank_values=True)
+        return self._query
+
+    @property
+    def cookies(self) -> dict[str, str]:
+        """
+        The cookies of the request, parsed on the first access.
+        """
+        if self._cookies is None:
+            self._cookies = self._parse_cookies(self.header("Cookie", ""))
+        return self._cookies
+
+    def header(self, name: str, default: str = None) -> str | None:
+        """
+        Get a header value, whatever the case of its name.
+
+        Args:
+        name (str): The header name ("Content-Type", "content-type", ...).
+        default (str): Value returned when the header is missing.
+        """
+        if self._headers is not None:
+            return self._headers.get(name, default)
+
+        # A few lookups are cheaper in the raw bytes than parsing every header
+        raw = self._raw_headers
+        lowered = b"\r\n" + raw.lower()
+        key = b"\r\n" + name.lower().encode("latin-1") + b":"
+
+        start = lowered.find(key)
+        if start == -1:
+            return default
+        if lowered.find(key, start + 1) != -1:
+            return self.headers.get(name, default)
+
+        start += len(key) - 2
+        end = raw.find(b"\r\n", start)
+        return raw[start:end if end != -1 else None].strip().decode("latin-1")
+
+    def arg(self, name: str, default: str = None) -> str | None:
+        """
+        Get the first value of a query argument.
+
+        Args:
+        name (str): The argument name.
+        default (str): Value returned when the argument is missing.
+        """
+        values = self.query.get(name)
+        return values[0] if values else default
+
+    def cookie(self, name: str, default: str = None) -> str | None:
+        """
+        Get the value of a cookie.
+
+        Args:
+        name (str): The cookie name.
+        default (str): Value returned when the cookie is missing.
+        """
+        return self.cookies.get(name, default)
+
+    def json(self):
+        """
+        Get the JSON body of the request.
+        The body is only parsed on the first call, the next ones return the same object.
+        Raises an HTTPError (400) when the body isn't valid JSON.
+        """
+        if self._json is _UNPARSED:
+            try:
+                self._json = self.json_backend.loads(self.raw_body)
+            except ValueError as e:
+                raise HTTPError(400, "Invalid JSON body") from e
+        return self._json
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        """
+        Get the body of the request chunk by chunk, as bytes.
+        On a streamed route, the chunks are read from the connection as the handler asks for them,
+        and the body can only be read once. Raises an HTTPError (413) when it's over the limit.
+        """
+        if self._stream is None:
+            if self._raw_body:
+                yield self._raw_body
+            return
+
+        async for chunk in self._stream:
+            yield chunk
+
+    async def form(self, parser: FormParser = None) -> Form:
+        """
+        Get the form of the request ("application/x-www-form-urlencoded" or "multipart/form-data").
+        The body is parsed as it's read, the files going to temporary files above a size.
+        The form is only parsed on the first call, its files are closed after the response.
+
+        Args:
+        parser (FormParser): The limits of the form, "FormParser()" by default.
+        """
+        if self._form is None:
+            parser = FORM_PARSER if parser is None else parser
+            self._form = await parser.parse(self.header("Content-Type"), self.stream())
+        return self._form
+
+    def close(self) -> None:
+        """
+        Close the files of the form, called by the router once the request is handled.
+        """
+        if self._form is not None:
+            self._form.close()
+
+    @staticmethod
+    def _parse_cookies(header: str) -> dict[str, str]:
+        # Helper method to parse "Cookie: a=1; b=2", the first cookie of a name wins
+        cookies = {}
+        for pair in header.split(";"):
+            name, separator, value = pair.partition("=")
+            name = name.strip()
+            if not separator or not name:
+                continue
+            value = value.strip()
+            if len(value) > 1 and value[0] == value[-1] == '"':
+                value = value[1:-1]
+            cookies.setdefault(name, value)
+        return cookies
 
     def __str__(self):
-        return f"Method : {self.method}\nPath : {self.path}\nHeaders : {self.headers}\nBody : {self.body}\nParams : {self.params}"
+        return f"Method : {self.method}\nPath : {self.path}\nQuery : {self.query_string}\nHeaders : {self.headers}\nBody : {self.body if self._stream is None else '<streamed>'}\nParams : {self.params}"
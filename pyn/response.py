@@ -2,11 +2,55 @@
 File to define Response class.
 """
 
-from asyncio  import StreamWriter
-from json     import load, dumps
-from aiofiles import open as aio_open
-from .request import Request
+from asyncio  import StreamWriter, SendfileNotAvailableError, get_running_loop, ensure_future, wait
+from os       import fstat, stat as os_stat, stat_result
+from stat     import S_ISREG
+from email.utils import formatdate, parsedate_to_datetime
+from time     import perf_counter_ns
+from typing   import AsyncIterable, AsyncIterator
+from .request import Request, JSON_BACKEND
 from .logger  import Logger
+from .cache   import FileCache
+from .compression import Compression
+from .serializer  import JSONBackend
+
+
+# Standard HTTP status messages
+STATUS_MESSAGES = {
+    100: "Continue",
+    200: "OK",
+    204: "No Content",
+    206: "Partial Content",
+    301: "Moved Permanently",
+    302: "Found",
+    304: "Not Modified",
+    400: "Bad Request",
+    401: "Unauthorized",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    415: "Unsupported Media Type",
+    416: "Range Not Satisfiable",
+    426: "Upgrade Required",
+    429: "Too Many Requests",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    501: "Not Implemented",
+    503: "Service Unavailable",
+}
+
+# Encoded status lines, built once per status code
+STATUS_LINES = {
+    status: f"HTTP/1.1 {status} {message}\r\n".encode("latin-1")
+    for status, message in STATUS_MESSAGES.items()
+}
+
+# Headers whose lines are encoded once per value, the others on each response
+CACHED_HEADERS = frozenset((
+    "Content-Type", "Connection", "Cache-Control", "Vary", "Content-Encoding", "Accept-Ranges",
+))
+HEADER_LINES = {}
 
 
 class Response:
@@ -16,18 +60,32 @@ class Response:
     You can use real asyncio with "response.writer" if needed (asyncio.StreamWriter).
     """
 
+    # Size of the chunks when a file can't be sent with sendfile
+    CHUNK_SIZE = 262144
+
     def __init__(
         self, writer: StreamWriter = None,
         info: dict = None,
         middlewares: list[callable] = None,
-        request: Request = None
+        request: Request = None,
+        keep_alive: bool = False,
+        compression: Compression = None,
+        logger: Logger = None,
+        json_backend: JSONBackend = None
     ):
         self.writer = writer
-        self.logger = Logger()
+        self.logger = Logger() if logger is None else logger
         self.info = {} if info is None else info
         self.middlewares = [] if middlewares is None else middlewares
         self.request = request
         self.response = {}
+        self.keep_alive = keep_alive
+        self.compression = compression
+        self.json_backend = JSON_BACKEND if json_backend is None else json_backend
+        self.sent = False
+        self.size = 0
+        self.status = 0
+        self.on_write = None  # Called with self.response just before it's written
 
     def __str__(self):
         try :
@@ -35,50 +93,26 @@ class Response:
         except Exception as e:
             return "Error : " + type(e).__name__
 
-    async def send(self, content: str = "", status: int=200, content_type: str="text/html") -> None:
+    async def send(
+        self,
+        content: str | bytes | memoryview = "",
+        status: int=200,
+        content_type: str="text/html",
+        headers: dict = None
+    ) -> None:
         """
         Send an HTTP response to the client.
 
         Args:
-        content (str): The content to send in the HTTP body.
+        content (str | bytes | memoryview): The content to send in the HTTP body.
         status (int): The HTTP status code.
+        content_type (str): The type of the content, the charset is added (utf-8).
+        headers (dict): More headers to send.
         """
-        try :
-            self.response = {
-                "protocol": "HTTP/1.1",
-                "status": status,
-                "message": self._get_status_message(status),
-                "headers": {
-                    "Content-Type": f"{content_type}; charset=utf-8",
-                    "Connection": "close",
-                },
-                "body": content,
-            }
-
-            await self._run_middlewares()
-
-            headers = "\n".join(
-                [f"{key}: {value}" for key, value in self.response["headers"].items()]
-            )
-
-            response = f"{self.response['protocol']} {self.response['status']} {self.response['message']}\n{headers}\n\n\n{self.response['body']}\n"
-
-            self.writer.write(response.encode("utf-8"))
-            await self.writer.drain()
-            self.writer.close()
-            await self.writer.wait_closed()
-        except Exception as e:
-            print("Error while sending response : ", str(e))
-        finally:
-            await self.logger.all_log(
-                status     = status,
-                protocol   = self.info["protocol"],
-                src_ip     = self.info["src_ip"],
-                dst_ip     = self.writer.transport.get_extra_info('peername')[0],
-                method     = self.info["method"],
-                path       = self.info["path"],
-                start_time = self.info["start"],
-            )
+        response_headers = {"Content-Type": f"{content_type}; charset=utf-8"}
+        if headers:
+            response_headers.update(headers)
+        await self._send(status, response_headers, content)
 
     async def template(
         self,
@@ -92,29 +126,532 @@ class Response:
         html = f"<!DOCTYPE html><html lang='en'><head><meta charset='UTF-8'><meta name='viewport' content='width=device-width, initial-scale=1.0'>{head}</head><body>{body}</body></html>"
         await self.send(html, status)
 
-    async def file(self, path: str = "") -> None:
+    async def file(self, path: str = "", cache: FileCache = None) -> None:
         """
         Send a file to the client.
+        The file is sent as binary, with sendfile when the connection supports it,
+        chunk by chunk otherwise, so it's never fully loaded in memory.
+        Supports the "Range" header (206 Partial Content) for video seeking,
+        and answers "If-None-Match" / "If-Modified-Since" with 304 Not Modified.
 
         Args:
         path (str): The path to the file to send.
+        cache (FileCache): Keep small files in memory instead of reading them every time.
         """
+        loop = get_running_loop()
+        encoding = None
+        content_path = path
+
+        try :
+            # Only metadata, the file itself is opened when the body must be sent
+            stat = os_stat(path)
+            if not S_ISREG(stat.st_mode):
+                raise FileNotFoundError(path)
+
+            # A precompressed sibling ("app.js.br") is sent instead when the client accepts it
+            if self.compression is not None and self.request and not self.request.header("Range"):
+                variant = self.compression.find_precompressed(
+                    path, self.request.header("Accept-Encoding")
+                )
+                if variant is not None:
+                    content_path, encoding = variant
+                    stat = os_stat(content_path)
+        except (FileNotFoundError, NotADirectoryError):
+            await self.send("File not found", 404, "text/plain")
+            return
+        except PermissionError:
+            await self.send("Forbidden", 403, "text/plain")
+            return
+        except Exception as e:
+            await self.send(str(e), 500, "text/plain")
+            return
 
         status = 200
-        problem = "None"
+        problem = None
+        file = None
+
+        try :
+            etag, last_modified = self._get_validators(stat)
+            validators = {"ETag": etag, "Last-Modified": last_modified}
+            if self.compression is not None and self.compression.precompressed:
+                validators["Vary"] = "Accept-Encoding"
+
+            if self._is_not_modified(etag, stat.st_mtime):
+                status = 304
+                self.response = self._build(status, validators, b"")
+                await self._run_middlewares()
+                await self._write_response(compress=False)
+            else:
+                data = cache.get(content_path, stat) if cache is not None else None
+
+                if data is None:
+                    file = await loop.run_in_executor(None, open, content_path, "rb")
+                    stat = fstat(file.fileno())
+                    etag, last_modified = self._get_validators(stat)
+                    validators.update({"ETag": etag, "Last-Modified": last_modified})
+
+                    if cache is not None and stat.st_size <= cache.max_file_size:
+                        data = await loop.run_in_executor(None, file.read)
+                        if len(data) == stat.st_size:
+                            cache.put(content_path, stat, data)
+
+                size = stat.st_size if data is None else len(data)
+                headers = {
+                    "Content-Type": self._get_content_type(path),
+                    "Accept-Ranges": "bytes",
+                    **validators,
+                }
+                if encoding is not None:
+                    headers["Content-Encoding"] = encoding
+
+                byte_range = None
+                if self.request and self._is_range_valid(etag, stat.st_mtime):
+                    byte_range = self._parse_range(self.request.header("Range"), size)
+
+                if byte_range is False:
+                    status = 416
+                    self.response = self._build(status, {"Content-Range": f"bytes */{size}"}, b"")
+                    await self._run_middlewares()
+                    await self._write_response(compress=False)
+                else:
+                    start, end = byte_range or (0, size - 1)
+                    if byte_range:
+                        status = 206
+                        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+                    self.response = self._build(status, headers, None)
+                    await self._run_middlewares()
+
+                    if data is not None:
+                        self.response["body"] = memoryview(data)[start:end + 1]
+                        await self._write_response(compress=False)
+                    else:
+                        await self._write_file(file, start, end - start + 1)
+        except Exception as e:
+            problem = str(e)
+            print("Error while sending file : ", problem)
+        finally:
+            if file is not None:
+                file.close()
+
+        await self._log(status, problem)
+
+    async def json(self, data: dict | str = "", status: int = 200) -> None:
+        """
+        Send JSON data to the client.
+
+        Args:
+        data (dict | str): The JSON data to send (can be a path to a JSON file, kept encoded until it changes).
+        status (int): The HTTP status code.
+        """
+        message = None
 
         try :
-            async with aio_open(path, "r", encoding="utf-8") as file:
-                content = await file.read()
+            if isinstance(data, str):
+                body = await self.json_backend.load_file(data)
+            else:
+                body = self.json_backend.dumps(data)
         except FileNotFoundError:
+            body = self.json_backend.dumps({"error": "File not found"})
             status = 500
-            content = "File not found"
-            problem = "File not found"
+            message = "File not found"
         except Exception as e:
+            body = self.json_backend.dumps({"error": str(e)})
             status = 500
-            content = str(e)
+            message = str(e)
+
+        await self._send(status, {"Content-Type": "application/json; charset=utf-8"}, body, message)
+
+    async def stream(
+        self,
+        chunks: AsyncIterable[str | bytes],
+        status: int = 200,
+        content_type: str = "text/plain",
+        headers: dict = None
+    ) -> None:
+        """
+        Send a body made of chunks as they come, with chunked transfer encoding,
+        without building it in memory. Each chunk is written once the client
+        read enough of the previous ones. HTTP/1.0 clients get the bytes as they are,
+        and the connection is closed at the end.
+        When "chunks" fails, the connection is closed before the end so the client knows.
+
+        Args:
+        chunks (AsyncIterable[str | bytes]): The pieces of the body, str are encoded in UTF-8.
+        status (int): The HTTP status code.
+        content_type (str): The type of the content, the charset is added (utf-8).
+        headers (dict): More headers to send.
+        """
+        problem = None
+        chunked = self.info.get("protocol", "HTTP/1.1") != "HTTP/1.0"
+        if not chunked:
+            self.keep_alive = False
+
+        response_headers = {"Content-Type": f"{content_type}; charset=utf-8"}
+        if headers:
+            response_headers.update(headers)
+
+        try :
+            self.response = self._build(status, response_headers, None)
+            await self._run_middlewares()
+            self.writer.write(self._encode_head(None, chunked))
+            await self.writer.drain()
+
+            async for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                size = chunk.nbytes if isinstance(chunk, memoryview) else len(chunk)
+                if not size:
+                    continue
+
+                if chunked:
+                    self.writer.writelines((b"%x\r\n" % size, chunk, b"\r\n"))
+                else:
+                    self.writer.write(chunk)
+                self.size += size
+                await self.writer.drain()
+
+            if chunked:
+                self.writer.write(b"0\r\n\r\n")
+                await self.writer.drain()
+            await self._finish()
+        except ConnectionError:
+            problem = "Connection lost"
+            self.keep_alive = False
+        except Exception as e:
+            problem = str(e)
+            print("Error while streaming response : ", problem)
+            self.keep_alive = False
+            self.writer.close()
+        finally:
+            if hasattr(chunks, "aclose"):
+                await chunks.aclose()
+            await self._log(status, problem)
+
+    async def sse(
+        self,
+        events: AsyncIterable | callable,
+        heartbeat: float = 15.0,
+        retry: int = None,
+        headers: dict = None
+    ) -> None:
+        """
+        Send Server-Sent Events as they come, until "events" ends or the client leaves.
+        An event is a str (its data) or a dict with "data" (str, or encoded in JSON),
+        and optionally "event", "id" and "retry".
+        A comment is sent when no event came for "heartbeat" seconds, to keep the connection
+        open through the proxies and notice the clients that left.
+
+        Args:
+        events (AsyncIterable | callable): The events, or a function taking the "Last-Event-ID"
+            of a reconnecting client (None at first) and returning them.
+        heartbeat (float): Seconds without event before a comment is sent, None to never send one.
+        retry (int): Milliseconds a client waits before reconnecting, the browser default when None.
+        headers (dict): More headers to send.
+        """
+        if callable(events):
+            events = events(self.request.header("Last-Event-ID") if self.request else None)
+
+        response_headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        if headers:
+            response_headers.update(headers)
+        await self.stream(self._encode_events(events, heartbeat, retry), 200, "text/event-stream", response_headers)
+
+    async def _encode_events(self, events: AsyncIterable, heartbeat: float | None, retry: int | None) -> AsyncIterator[bytes]:
+        # Helper method to encode the events, with a comment when none came for "heartbeat" seconds.
+        # The next event is awaited in a task, so waiting for the heartbeat doesn't cancel it.
+        if retry is not None:
+            yield b"retry: %d\n\n" % retry
+
+        iterator = aiter(events)
+        pending = None
+        try :
+            while True:
+                if pending is None:
+                    pending = ensure_future(anext(iterator))
+
+                done, _ = await wait((pending,), timeout=heartbeat)
+                if not done:
+                    yield b": heartbeat\n\n"
+                    continue
+
+                task, pending = pending, None
+                try :
+                    event = task.result()
+                except StopAsyncIteration:
+                    return
+                yield self._encode_event(event)
+        finally:
+            if pending is not None:
+                pending.cancel()
+                await wait((pending,))
+            if hasattr(iterator, "aclose"):
+                await iterator.aclose()
+
+    def _encode_event(self, event: str | dict) -> bytes:
+        # Helper method to write one event in the text/event-stream format.
+        if not isinstance(event, dict):
+            event = {"data": event}
+
+        lines = []
+        for field in ("id", "event"):
+            if event.get(field) is not None:
+                # A line break would start another field
+                value = str(event[field]).replace("\r", "").replace("\n", "")
+                lines.append(f"{field}: {value}")
+        if event.get("retry") is not None:
+            lines.append(f"retry: {int(event['retry'])}")
+
+        data = event.get("data", "")
+        if not isinstance(data, str):
+            data = self.json_backend.dumps(data).decode("utf-8")
+        for line in data.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+            lines.append(f"data: {line}")
+
+        return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+    async def _send(self, status: int, headers: dict, body: str | bytes | memoryview, problem: str = None) -> None:
+        # Helper method to send a body: build the response, run the middlewares, write and log it.
+        try :
+            self.response = self._build(status, headers, body)
+            await self._run_middlewares()
+            await self._write_response()
+        except Exception as e:
             problem = str(e)
+            print("Error while sending response : ", problem)
+        finally:
+            await self._log(status, problem)
+
+    async def send_raw(self, status: int, headers: dict, body: bytes) -> None:
+        """
+        Send a response already built, as it is, without running the middlewares.
+        Used to send the responses kept by a cache.
+
+        Args:
+        status (int): The HTTP status code.
+        headers (dict): Every header of the response (Content-Length is added).
+        body (bytes): The body of the response.
+        """
+        try :
+            self.response = self._build(status, dict(headers), body)
+            self.response["headers"]["Connection"] = "keep-alive" if self.keep_alive else "close"
+            await self._write_response()
+        except Exception as e:
+            print("Error while sending response : ", str(e))
+        finally:
+            await self._log(status)
+
+    @staticmethod
+    def _get_status_message(status: int = 0) -> str:
+        # Helper method to get standard HTTP status messages.
+        return STATUS_MESSAGES.get(status, "Unknown Status")
+
+    async def _write_response(self, compress: bool = True) -> None:
+        # Helper method to write self.response on the connection.
+        # Closes the connection only when it must not be kept alive.
+        # The head and the body are given apart to the transport, the body is never copied
+        body = self.response["body"]
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        elif body is None:
+            body = b""
+
+        if self.on_write is not None:
+            self.on_write(self.response, body)
+
+        if compress and self.compression is not None and self.request is not None:
+            body = await self._compress(body)
+
+        length = body.nbytes if isinstance(body, memoryview) else len(body)
+        if length:
+            self.writer.writelines((self._encode_head(length), body))
+        else:
+            self.writer.write(self._encode_head(0))
+        await self.writer.drain()
+        self.size = length
+        await self._finish()
+
+    async def _write_file(self, file, offset: int, count: int) -> None:
+        # Helper method to write self.response followed by a part of a file.
+        # Uses sendfile (no copy in Python) and falls back to reading chunks.
+        self.writer.write(self._encode_head(count))
+        await self.writer.drain()
+        self.size = count
+
+        if count > 0:
+            loop = get_running_loop()
+            try:
+                await loop.sendfile(self.writer.transport, file, offset, count, fallback=False)
+                self._pause_reading()
+            except (NotImplementedError, SendfileNotAvailableError):
+                await loop.run_in_executor(None, file.seek, offset)
+                while count > 0:
+                    chunk = await loop.run_in_executor(None, file.read, min(count, self.CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    count -= len(chunk)
+                    self.writer.write(chunk)
+                    await self.writer.drain()
+
+        await self._finish()
+
+    def _pause_reading(self) -> None:
+        # Helper method to pause the reading again after sendfile, which may resume it:
+        # the fast path pauses it while pipelined requests wait (see HTTPProtocol.reading)
+        protocol = getattr(self.writer, "protocol", None)
+        transport = self.writer.transport
+        if protocol is not None and not protocol.reading and transport.is_reading():
+            transport.pause_reading()
+
+    async def _compress(self, body: bytes) -> bytes:
+        # Helper method to compress the body with the encoding the client prefers.
+        headers = self.response["headers"]
+        status = self.response["status"]
+
+        if (
+            "Content-Encoding" in headers
+            or status < 200 or status in (204, 206, 304)
+            or not self.compression.should_compress(headers.get("Content-Type", ""), len(body))
+        ):
+            return body
+
+        vary = headers.get("Vary")
+        headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+
+        encoding = self.compression.negotiate(self.request.header("Accept-Encoding"))
+        if encoding is None:
+            return body
+
+        headers["Content-Encoding"] = encoding
+        return await self.compression.compress(body, encoding)
+
+    def _encode_head(self, length: int | None, chunked: bool = False) -> bytes:
+        # Helper method to build the status line and the headers of self.response.
+        # A None length is a streamed body, chunked or ended by closing the connection.
+        status = self.status = self.response["status"]
+        headers = self.response["headers"]
+
+        # Middlewares may change the connection header
+        if headers.get("Connection", "").lower() == "close":
+            self.keep_alive = False
+
+        line = STATUS_LINES.get(status)
+        if line is None:
+            line = STATUS_LINES[status] = f"HTTP/1.1 {status} {self._get_status_message(status)}\r\n".encode("latin-1")
+
+        lines = [line]
+        for key, value in headers.items():
+            if key == "Content-Length":
+                continue
+            if key in CACHED_HEADERS:
+                line = HEADER_LINES.get((key, value))
+                if line is None:
+                    line = f"{key}: {value}\r\n".encode("utf-8")
+                    if len(HEADER_LINES) < 1024:
+                        HEADER_LINES[(key, value)] = line
+            else:
+                line = f"{key}: {value}\r\n".encode("utf-8")
+            lines.append(line)
+
+        # No body at all for those, not even an empty one
+        if length is None:
+            lines.append(b"Transfer-Encoding: chunked\r\n\r\n" if chunked else b"\r\n")
+        elif status not in (204, 304) and status >= 200:
+            lines.append(b"Content-Length: %d\r\n\r\n" % length)
+        else:
+            lines.append(b"\r\n")
+        return b"".join(lines)
+
+    async def _finish(self) -> None:
+        # Helper method called once everything is written.
+        self.sent = True
+        timings = self.info.get("timings")
+        if timings is not None:
+            timings["written"] = perf_counter_ns()
+
+        if not self.keep_alive:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+    def _build(self, status: int, headers: dict, body: str | bytes | None) -> dict:
+        # Helper method to build self.response.
+        headers.setdefault("Connection", "keep-alive" if self.keep_alive else "close")
+        return {
+            "protocol": "HTTP/1.1",
+            "status": status,
+            "message": self._get_status_message(status),
+            "headers": headers,
+            "body": body,
+        }
+
+    @staticmethod
+    def _get_validators(stat: stat_result) -> tuple[str, str]:
+        # Helper method to get the ETag and the Last-Modified date of a file.
+        # The ETag changes with the mtime (in ns) and the size of the file.
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        return etag, formatdate(stat.st_mtime, usegmt=True)
+
+    def _is_not_modified(self, etag: str, mtime: float) -> bool:
+        # Helper method to know if the client already has this version of the file.
+        if self.request is None or self.request.method not in ("GET", "HEAD"):
+            return False
+
+        none_match = self.request.header("If-None-Match")
+        if none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in none_match.split(",")]
+            return "*" in tags or etag in tags
+
+        return self._is_same_date(self.request.header("If-Modified-Since"), mtime, True)
+
+    def _is_range_valid(self, etag: str, mtime: float) -> bool:
+        # Helper method for "If-Range": a range of an older version of the file
+        # is ignored, and the whole file is sent instead.
+        if_range = self.request.header("If-Range")
+        if if_range is None:
+            return True
+        if if_range.startswith('"'):
+            return if_range == etag
+        return self._is_same_date(if_range, mtime)
+
+    @staticmethod
+    def _is_same_date(header: str | None, mtime: float, or_older: bool = False) -> bool:
+        # Helper method to compare an HTTP date with the mtime of a file.
+        if not header:
+            return False
+        try:
+            date = parsedate_to_datetime(header).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= date if or_older else int(mtime) == date
+
+    @staticmethod
+    def _parse_range(header: str | None, size: int) -> tuple[int, int] | None | bool:
+        # Helper method to read a "Range: bytes=start-end" header.
+        # Returns the first and last byte to send, None to send everything,
+        # or False when the range can't be satisfied.
+        if not header or not header.startswith("bytes=") or "," in header:
+            return None
+
+        first, _, last = header[6:].strip().partition("-")
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else size - 1
+            else:
+                start = size - int(last)
+                end = size - 1
+        except ValueError:
+            return None
+
+        start = max(start, 0)
+        end = min(end, size - 1)
+        if start > end or start >= size:
+            return False
+        return start, end
 
+    @staticmethod
+    def _get_content_type(path: str) -> str:
+        # Helper method to get the content type of a file from its extension.
         content_type = {
             "html": "text/html",
             "css": "text/css",
@@ -144,86 +681,37 @@ class Response:
             "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
             "ppt": "application/vnd.ms-powerpoint",
             "md": "text/markdown",
-        }.get(path.split(".")[-1], "text/plain")
+        }.get(path.rsplit(".", 1)[-1].lower(), "text/plain")
 
-        await self.send(content, status, content_type)
+        # Only text needs a charset
+        if content_type.startswith("text/") or content_type in (
+            "application/javascript", "application/json", "application/xml"
+        ):
+            content_type += "; charset=utf-8"
+        return content_type
 
-        await self.logger.all_log(
-            status     = status,
-            protocol   = self.info["protocol"],
-            src_ip     = self.info["src_ip"],
-            dst_ip     = self.writer.transport.get_extra_info('peername')[0],
-            method     = self.info["method"],
-            path       = self.info["path"],
-            start_time = self.info["start"],
-            problem    = problem
-        )
+    async def _log(self, status: int, problem: str = None) -> None:
+        # Helper method to write the access log of this response.
+        peer = self.writer.transport.get_extra_info("peername") if self.writer else None
 
-    async def json(self, data: dict | str = "", status: int = 200) -> None:
-        """
-        Send JSON data to the client.
-
-        Args:
-        data (dict | str): The JSON data to send (can be a path to a JSON file).
-        status (int): The HTTP status code.
-        """
-        message = "None"
-
-        if isinstance(data, str):
-            try :
-                async with aio_open(data, "r") as file:
-                    data = await load(file.read())
-            except FileNotFoundError:
-                data = {"error": "File not found"}
-                status = 500
-                message = "File not found"
-            except Exception as e:
-                data = {"error": str(e)}
-                status = 500
-                message = str(e)
-
-        self.response = {
-            "protocol": "HTTP/1.1",
-            "status": status,
-            "message": self._get_status_message(status),
-            "headers": {
-                "Content-Type": "application/json; charset=utf-8",
-                "Connection": "close",
-            },
-            "body": dumps(data),
-        }
-
-        await self._run_middlewares()
-
-        headers = "\n".join([f"{key}: {value}" for key, value in self.response["headers"].items()])
-
-        response = f"""{self.response["protocol"]} {self.response["status"]} {self.response["message"]}\n{headers} \r\n\n{self.response["body"]}\n"""
-
-        self.writer.write(response.encode("utf-8"))
-        await self.writer.drain()
-        self.writer.close()
-        await self.writer.wait_closed()
+        # Time spent between the end of the request reading and the end of the writing
+        timings = self.info.get("timings", {})
+        duration = None
+        if "parsed" in timings:
+            duration = (timings.get("written", perf_counter_ns()) - timings["parsed"]) / 1000000
 
         await self.logger.all_log(
-            status      = status,
-            protocol    = self.info["protocol"],
-            src_ip      = self.info["src_ip"],
-            dst_ip      = self.writer.transport.get_extra_info("peername")[0],
-            method      = self.info["method"],
-            path        = self.info["path"],
-            start_time  = self.info["start"],
-            problem     = message
-        )
-
-    @staticmethod
-    def _get_status_message(status: int = 0) -> str:
-        # Helper method to get standard HTTP status messages.
-        return {
-            200: "OK",
-            404: "Not Found",
-            500: "Internal Server Error"
-        }.get(
-            status, "Unknown Status"
+            status     = status,
+            protocol   = self.info.get("protocol", ""),
+            src_ip     = self.info.get("src_ip", ""),
+            dst_ip     = peer[0] if peer else "",
+            method     = self.info.get("method", ""),
+            path       = self.info.get("path", ""),
+            duration   = duration,
+            size       = self.size,
+            user_agent = self.request.header("User-Agent") if self.request else None,
+            referer    = self.request.header("Referer") if self.request else None,
+            problem    = problem
         )
 
     async def _run_middlewares(self) -> None:
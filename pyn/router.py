@@ -2,14 +2,29 @@
 File where is defined the Router class.
 """
 
-from asyncio   import StreamReader, StreamWriter, CancelledError, start_server
+from asyncio   import (
+    StreamReader, StreamWriter, CancelledError, IncompleteReadError,
+    TimeoutError, Event, start_server, wait_for, get_running_loop, shield, gather
+)
 from sys       import version_info
-from re        import sub
-from datetime  import datetime
+from os.path   import realpath, join, commonpath
+from urllib.parse import unquote
+from time      import perf_counter_ns
+from math      import ceil
+from socket    import socket
 from .logger   import Logger
+from .parser   import Parser, HTTPError, BodyStream
+from .tree     import RouteTree
+from .cache    import FileCache, ResponseCache
+from .serializer import JSONBackend
+from .metrics  import Metrics
+from .middleware import Pipeline
+from .workers  import on_signals
+from .protocol import HTTPProtocol
 from .         import VERSION
 from .request  import Request
 from .response import Response
+from .websocket import WebSocket
 
 
 
@@ -23,21 +38,44 @@ class Router:
 
     def __init__(self):
         self.routes = {
-            "GET": {},
-            "POST": {},
-            "PUT": {},
-            "DELETE": {},
-            "PATCH": {},
-            "OPTIONS": {},
-        }  # Dictionary to store route handlers
+            "GET": RouteTree(),
+            "POST": RouteTree(),
+            "PUT": RouteTree(),
+            "DELETE": RouteTree(),
+            "PATCH": RouteTree(),
+            "OPTIONS": RouteTree(),
+        }  # Dictionary to store route handlers, one tree per method
         self.logger = Logger()
 
         self.host = ""
         self.port = 0
         self.debug = False
-        self.middlewares = []
+        self.pipeline = Pipeline()
         self.server = None
 
+        self.keep_alive_timeout = 5.0
+        self.max_requests = 100
+        self.reuse_port = False
+        self.sock = None
+        self.fast = False
+        self.shutdown_timeout = 30.0
+        self.draining = False
+        self.connections = set()
+        self.busy = set()
+        self.startup_hooks = []
+        self.shutdown_hooks = []
+        self._idle = Event()
+        self._stopping = None
+        self.parser = Parser()
+        self.file_cache = FileCache()
+        self.response_cache = ResponseCache()
+        self.streamed = {}
+        self.websockets = RouteTree()
+        self.compression = None
+        self.json_backend = JSONBackend()
+        self.limiter = None
+        self.metrics = Metrics()
+
     def __str__(self):
         return f"HTTP Server on {self.host}:{self.port}, logging to {self.logger.filename}, debug mode : {self.debug}"
 
@@ -50,8 +88,7 @@ class Router:
         path (str): The URL path to handle.
         handler (coroutine function): The async function that handles the request.
         """
-        path_pattern = self._path_to_regex(path)
-        self.routes["GET"][path_pattern] = handler
+        self.routes["GET"].insert(path, handler)
 
     def post(self, path: str, handler: callable) -> None:
         """
@@ -61,8 +98,7 @@ class Router:
         path (str): The URL path to handle.
         handler (coroutine function): The async function that handles the request.
         """
-        path_pattern = self._path_to_regex(path)
-        self.routes["POST"][path_pattern] = handler
+        self.routes["POST"].insert(path, handler)
 
     def put(self, path: str, handler: callable) -> None:
         """
@@ -72,8 +108,7 @@ class Router:
         path (str): The URL path to handle.
         handler (coroutine function): The async function that handles the request.
         """
-        path_pattern = self._path_to_regex(path)
-        self.routes["PUT"][path_pattern] = handler
+        self.routes["PUT"].insert(path, handler)
 
     def delete(self, path: str, handler: callable) -> None:
         """
@@ -84,8 +119,7 @@ class Router:
         handler (coroutine function): The async function that handles the request.
         """
 
-        path_pattern = self._path_to_regex(path)
-        self.routes["DELETE"][path_pattern] = handler
+        self.routes["DELETE"].insert(path, handler)
 
     def patch(self, path: str, handler: callable) -> None:
         """
@@ -96,8 +130,7 @@ class Router:
         handler (coroutine function): The async function that handles the request.
         """
 
-        path_pattern = self._path_to_regex(path)
-        self.routes["PATCH"][path_pattern] = handler
+        self.routes["PATCH"].insert(path, handler)
 
     def options(self, path: str, handler: callable) -> None:
         """
@@ -108,8 +141,7 @@ class Router:
         handler (coroutine function): The async function that handles the request.
         """
 
-        path_pattern = self._path_to_regex(path)
-        self.routes["OPTIONS"][path_pattern] = handler
+        self.routes["OPTIONS"].insert(path, handler)
 
     def route(self, method: str, path:str) -> callable:
         """
@@ -121,44 +153,191 @@ class Router:
         """
 
         def wrapper(handler: callable):
-            self.routes[method][self._path_to_regex(path)] = handler
+            self.routes.setdefault(method, RouteTree()).insert(path, handler)
             return handler
         return wrapper
 
-    def static(self, path: str, directory: str) -> None:
+    def static(self, path: str, directory: str, cache: bool = True) -> None:
         """
         Serve static files from the given directory.
 
         Args:
         path (str): The URL path to handle.
         directory (str): The directory to serve static files from.
+        cache (bool): Keep the hot files in memory, in "router.file_cache".
+        """
+
+        root = realpath(directory)
+
+        async def handler(req: Request, res: Response) -> None:
+            file = self._resolve_static(root, req.params["name"])
+            if file is None:
+                await res.send("404 Not Found\nPath : " + req.path + " unknown\n", status=404)
+            else:
+                await res.file(file, self.file_cache if cache else None)
+
+        self.routes["GET"].insert(path + "<name:path>", handler)
+
+    def cached(self, ttl: float = 60.0, vary: tuple[str] = ()) -> callable:
+        """
+        Decorator to keep the responses of a GET handler in "router.response_cache".
+        Put it under the route decorator.
+
+        Args:
+        ttl (float): Seconds a response is kept.
+        vary (tuple[str]): Request headers that change the response ("Accept-Language"...).
+        """
+        return self.response_cache.cached(ttl, vary)
+
+    def cache(self, path: str, ttl: float = 60.0, vary: tuple[str] = ()) -> None:
+        """
+        Keep the responses of a registered GET route in "router.response_cache".
+
+        Args:
+        path (str): The path of the route, as registered ("/users/<id:int>").
+        ttl (float): Seconds a response is kept.
+        vary (tuple[str]): Request headers that change the response ("Accept-Language"...).
+        """
+        handler = dict(self.routes["GET"].routes()).get(path)
+        if handler is None:
+            raise ValueError(f"No GET route registered for {path}")
+        self.routes["GET"].insert(path, self.response_cache.cached(ttl, vary)(handler))
+
+    def streaming(self, max_size: int = None) -> callable:
+        """
+        Decorator to give the body of the requests to a handler as it arrives,
+        with "request.stream()" or "request.form()", instead of reading it first.
+        Memory stays the same whatever the size of the body (uploads...).
+
+        Args:
+        max_size (int): Max size in bytes of a body (413 above), "max_body_size" by default.
         """
+        def wrapper(handler: callable) -> callable:
+            self.streamed[handler] = max_size
+            return handler
+        return wrapper
 
-        path = self._path_to_regex(path + "<name>")
-        self.routes["GET"][path] = lambda req, res: res.file(directory + "/" + req.params["name"])
+    def websocket(self, path: str, websocket: WebSocket) -> None:
+        """
+        Serve a WebSocket on a path, on the port of the router: the requests of the path
+        asking for "Upgrade: websocket" are handed to it, already parsed, with their connection.
+        Its startup and shutdown handlers run with the router's.
+
+        Args:
+        path (str): The URL path to handle, with parameters if needed ("/rooms/<name>").
+        websocket (WebSocket): The WebSocket, its clients get the request in "client.request".
+        """
+        self.websockets.insert(path, websocket)
+
+    def enable_metrics(self, path: str = "/metrics") -> None:
+        """
+        Serve the latency histograms of "router.metrics" in the Prometheus text format.
+
+        Args:
+        path (str): The URL path of the metrics.
+        """
+        async def handler(req: Request, res: Response) -> None:
+            await res.send(self.metrics.render(), content_type="text/plain; version=0.0.4")
+
+        self.routes["GET"].insert(path, handler)
 
     def add_middleware(self, middleware: callable) -> None:
         """
         Add a middleware to the router.
-        The middleware will be called with the request and response objects.
+        The middleware will be called with the request and response objects,
+        just before the response is written (same as "router.after(middleware)").
         Needs to be async.
         """
-        self.middlewares.append(middleware)
+        self.pipeline.add("after", middleware)
+
+    def before(self, middleware: callable, route: str = None, prefix: str = None) -> callable:
+        """
+        Add a middleware called with the request and response objects before the handler.
+        Sending a response from it stops the request there (authentication, rate limit...).
+        Needs to be async. Returns the middleware, to be used as a decorator (for every route).
+
+        Args:
+        middleware (callable): Async function taking the request and the response.
+        route (str): Only for this route, as registered ("/users/<id:int>").
+        prefix (str): Only for the routes under this path ("/api").
+        """
+        self.pipeline.add("before", middleware, route, prefix)
+        return middleware
 
-    async def serve(self, port: int=8080, host: str="127.0.0.1", debug: bool=False) -> None:
+    def after(self, middleware: callable, route: str = None, prefix: str = None) -> callable:
+        """
+        Add a middleware called with the request and response objects when the response
+        is sent, just before it's written. It can change "res.response" (headers, body).
+        Needs to be async. Returns the middleware, to be used as a decorator (for every route).
+
+        Args:
+        middleware (callable): Async function taking the request and the response.
+        route (str): Only for this route, as registered ("/users/<id:int>").
+        prefix (str): Only for the routes under this path ("/api").
+        """
+        self.pipeline.add("after", middleware, route, prefix)
+        return middleware
+
+    async def serve(
+        self,
+        port: int=8080,
+        host: str="127.0.0.1",
+        debug: bool=False,
+        keep_alive_timeout: float=5.0,
+        max_requests: int=100,
+        max_header_size: int=65536,
+        max_body_size: int=16777216,
+        reuse_port: bool=False,
+        sock: socket=None,
+        fast: bool=False,
+        shutdown_timeout: float=30.0,
+        handle_signals: bool=True
+    ) -> None:
         """
         Start the event loop to handle requests.
+        To serve with several worker processes, use "Server(router, workers=4).run()":
+        they are forked before any event loop exists.
+
+        Args:
+        keep_alive_timeout (float): Seconds an idle connection waits for its next request.
+        max_requests (int): Number of requests served on a connection before closing it.
+        max_header_size (int): Max size in bytes of the request line and headers (431 above).
+        max_body_size (int): Max size in bytes of a request body (413 above).
+        reuse_port (bool): Bind the port with SO_REUSEPORT, to share it with other processes.
+        sock (socket.socket): Already bound socket to serve instead of host and port.
+        fast (bool): Serve with the asyncio.Protocol fast path (see pyn.protocol.HTTPProtocol)
+            instead of StreamReader and StreamWriter.
+        shutdown_timeout (float): Seconds the requests being handled have to finish on shutdown.
+        handle_signals (bool): Shut down gracefully on SIGTERM and SIGINT.
         """
         self.host  = host
         self.port  = port
         self.debug = debug
-
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_requests = max_requests
+        self.reuse_port = reuse_port
+        self.sock = sock
+        self.fast = fast
+        self.shutdown_timeout = shutdown_timeout
+        self.parser = Parser(max_header_size, max_body_size)
+        self.draining = False
+        self._stopping = None
+
+        remove_handlers = on_signals(self._on_signal) if handle_signals else None
         try:
+            for hook in self.startup_hooks:
+                await hook(self)
+            for websocket in self._websockets():
+                for hook in websocket._on_startup:
+                    await hook(websocket)
+            self.pipeline.compile(self.routes)
             await self.run()
-        except KeyboardInterrupt:
-            self.shutdown()
         except Exception as e:
-            self.logger.error(e)
+            await self.logger.error(e)
+        finally:
+            await self.shutdown()
+            if remove_handlers is not None:
+                remove_handlers()
 
     async def run(self):
         """
@@ -166,15 +345,23 @@ class Router:
         """
 
         # Await the coroutine to start the server
-        self.server = await start_server(
-            self.handle_connection, self.host, self.port
-        )
+        if self.sock is not None:
+            address = {"sock": self.sock}
+        else:
+            address = {"host": self.host, "port": self.port, "reuse_port": self.reuse_port}
+
+        if self.fast:
+            self.server = await get_running_loop().create_server(lambda: HTTPProtocol(self), **address)
+        else:
+            self.server = await start_server(
+                self.handle_connection, limit=self.parser.max_header_size, **address
+            )
 
         addr = self.server.sockets[0].getsockname()
         if self.debug:
             await self.logger.debug(f"Serving on {addr[0]}:{addr[1]}, PYN v{VERSION}, Python v{version_info.major}.{version_info.minor}.{version_info.micro}")
 
-        # Serve requests until Ctrl+C is pressed
+        # Serve requests until the server is shut down
         async with self.server:
             try :
                 await self.server.serve_forever()
@@ -186,82 +373,338 @@ class Router:
     async def handle_connection(self, reader: StreamReader, writer: StreamWriter):
         """
         Handle a client connection.
+        The connection is kept open and serves requests one after another,
+        in the order they arrived, until the client or the server closes it.
 
         Args:
         reader (asyncio.StreamReader): Stream reader object to read data from the client.
         writer (asyncio.StreamWriter): Stream writer object to write data to the client.
         """
-        start = datetime.now()
+        handled = 0
+        accepted = perf_counter_ns()
+        self.connections.add(writer)
 
-        request_data = await reader.read(1073741824)
-        request_text = request_data.decode("utf-8")
-
-        if request_text == "" or request_text is None:
-            return
-
-        protocol = request_text.splitlines()[0].split(" ")[0]
-        request_line = request_text.splitlines()[0]
-        method, path, _ = request_line.split()
-
-        headers = {}
-        for line in request_text.splitlines()[1:]:
-            if ":" in line:
-                key, value = line.split(":", 1)
-                headers[key.strip()] = value.strip()
+        try:
+            while not self.draining:
+                acquired = False
+                try:
+                    try:
+                        head = await wait_for(self.parser.read_head(reader), self.keep_alive_timeout)
+                        if head is None:
+                            break
+
+                        handled += 1
+
+                        # Requests over the limits are refused before reading their body
+                        if self.limiter is not None:
+                            self._check_limits(writer, head)
+
+                        # A WebSocket takes the connection over, until its client leaves
+                        if self.websockets and "upgrade" in head["connection"]:
+                            websocket, params = self._find_websocket(head)
+                            if websocket is not None:
+                                await self._upgrade(websocket, reader, writer, head, params)
+                                break
+
+                        if self.limiter is not None:
+                            await self.limiter.acquire()
+                            acquired = True
+
+                        streamed = self._streamed_size(head) if self.streamed else None
+
+                        # The client waits for our approval before sending a big body
+                        if self._wants_continue(head, streamed):
+                            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+
+                        if streamed is None:
+                            body = await self.parser.read_body(reader, head)
+                        else:
+                            body = self.parser.stream_body(reader, head, streamed)
+                        parsed = perf_counter_ns()
+                    except TimeoutError:
+                        break
+                    except HTTPError as e:
+                        await self._send_error(writer, e)
+                        break
+
+                    if not await self._handle_request(writer, head, body, handled, accepted, parsed):
+                        break
+                finally:
+                    if acquired:
+                        self.limiter.release()
+        except (IncompleteReadError, ConnectionError):
+            pass
+        except CancelledError:
+            # The loop stops with requests still running after the shutdown timeout
+            pass
+        except Exception as e:
+            await self.logger.error(e)
+        finally:
+            self.connections.discard(writer)
+            if not writer.is_closing():
+                writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
 
-        body = request_text.split("\r\n\r\n", 1)[1]
+    async def _handle_request(
+        self, writer: StreamWriter, head: dict, body: bytes | BodyStream, handled: int, accepted: int, parsed: int
+    ) -> bool:
+        # Helper method to answer one request, once read by either of the servers.
+        # Returns False when the connection must be closed after it.
+        method, protocol = head["method"], head["protocol"]
 
-        path = path.split("?")[0]
-        path = path.split("#")[0]
+        # The query string is kept for the request, the fragment is never for the server
+        path, _, query_string = head["target"].split("#", 1)[0].partition("?")
 
         info = {
             "protocol": protocol,
-            "start":    start,
+            "timings":  {"accept": accepted, "parsed": parsed},
             "path":     path,
             "method":   method,
             "src_ip":   self.host,
         }
 
-        handler, params = self.get_handler(method, path)
+        handler, params, route = self._find_route(method, path)
+        call, after = self.pipeline.get(method, route, handler or self._not_found)
 
-        request = Request(method, path, headers, body, params)
-        response = Response(writer, info, self.middlewares, request)
+        keep_alive = (
+            handled < self.max_requests
+            and not self.draining
+            and self._wants_keep_alive(protocol, head["connection"])
+        )
 
-        if handler:
-            await handler(request, response)
-        else:
-            await response.send("404 Not Found\nPath : " + path + " unknown\n", status=404)
+        request = Request(
+            method, path, None, body, params, self.json_backend, query_string, head["headers"]
+        )
+        response = Response(
+            writer, info, after, request, keep_alive, self.compression, self.logger, self.json_backend
+        )
 
-    async def shutdown(self):
-        """Shitty way to shutdown this mess"""
+        # Shutdown waits for the busy connections
+        self.busy.add(writer)
+        try:
+            await call(request, response)
+        except HTTPError as e:
+            # The handler refused the request ("request.json()" of an invalid body...)
+            if not response.sent:
+                await response.send(f"{e.status} {e.message}\n", e.status, headers=self._error_headers(e))
+        except Exception as e:
+            # A bug of the handler: the client still gets an answer, and the connection is closed
+            await self.logger.error(e)
+            if not response.sent:
+                await response.send("500 Internal Server Error\n", 500, headers={"Connection": "close"})
+            response.keep_alive = False
+        finally:
+            request.close()
+            self.busy.discard(writer)
+            if not self.busy:
+                self._idle.set()
+
+        timings = info["timings"]
+        timings["handled"] = perf_counter_ns()
+        if "written" in timings:
+            self.metrics.observe(
+                route or "<unknown>", method, response.status, timings["written"] - parsed
+            )
+
+        # A handler that did not answer leaves the client waiting, so we close,
+        # as after a streamed body not read entirely (the rest isn't a request)
+        if isinstance(body, BodyStream) and not body.done:
+            return False
+        return response.sent and response.keep_alive
+
+    async def _send_error(self, writer: StreamWriter, error: HTTPError) -> None:
+        # Answer a request that couldn't be read, the connection is closed after.
+        info = {
+            "protocol": "HTTP/1.1",
+            "timings":  {"parsed": perf_counter_ns()},
+            "path":     "",
+            "method":   "",
+            "src_ip":   self.host,
+        }
+        await Response(writer, info, request=Request("", ""), logger=self.logger).send(
+            f"{error.status} {error.message}\n", status=error.status, headers=self._error_headers(error)
+        )
 
-        if self.server is None:
-            exit(0)
+    @staticmethod
+    def _error_headers(error: HTTPError) -> dict | None:
+        # Helper method to get the headers of an error response
+        if error.retry_after is None:
+            return error.headers
+        return {**(error.headers or {}), "Retry-After": str(ceil(error.retry_after))}
 
-        self.server._serving = False
-        self.server.close()
-        if self.debug:
-            await self.logger.debug("Server stopped by user")
+    async def shutdown(self, timeout: float = None) -> None:
+        """
+        Stop the server gracefully, called on SIGTERM and SIGINT.
+        New connections are refused and idle ones closed, the requests being handled
+        have "timeout" seconds to finish before their connections are closed too,
+        then the shutdown hooks are called and the logs flushed.
+        Calling it again waits for the same shutdown.
+
+        Args:
+        timeout (float): Seconds to wait for the requests, "shutdown_timeout" of serve by default.
+        """
+        if self._stopping is None:
+            self._stopping = get_running_loop().create_task(
+                self._drain(self.shutdown_timeout if timeout is None else timeout)
+            )
+        await shield(self._stopping)
+
+    def on_startup(self, hook: callable) -> callable:
+        """
+        Add a coroutine called with the router before the server accepts connections,
+        to warm caches or open pools. Can be used as a decorator.
+
+        Args:
+        hook (callable): Async function taking the router.
+        """
+        self.startup_hooks.append(hook)
+        return hook
+
+    def on_shutdown(self, hook: callable) -> callable:
+        """
+        Add a coroutine called with the router once the requests are finished on shutdown,
+        to close pools. Can be used as a decorator.
+
+        Args:
+        hook (callable): Async function taking the router.
+        """
+        self.shutdown_hooks.append(hook)
+        return hook
 
     # Helper methods
+    async def _drain(self, timeout: float) -> None:
+        # Helper method doing the shutdown, once
+        self.draining = True
+        if self.server is not None:
+            self.server.close()
+
+        for writer in self.connections - self.busy:
+            writer.close()
+
+        # The WebSocket clients receive their close frame meanwhile
+        websockets = [
+            get_running_loop().create_task(websocket.shutdown(timeout)) for websocket in self._websockets()
+        ]
+
+        if self.busy:
+            self._idle.clear()
+            try:
+                await wait_for(self._idle.wait(), timeout)
+            except TimeoutError:
+                await self.logger.warn(f"{len(self.busy)} requests still running after {timeout}s, closing them")
+                for writer in self.connections:
+                    writer.close()
+
+        if websockets:
+            await gather(*websockets)
+
+        for hook in self.shutdown_hooks:
+            try:
+                await hook(self)
+            except Exception as e:
+                await self.logger.error(e)
+
+        if self.debug:
+            await self.logger.debug("Server stopped")
+        await self.logger.flush()
+
+    def _on_signal(self) -> None:
+        # Helper method called on SIGTERM and SIGINT: shut down, or stop waiting the second time
+        if self.draining:
+            for writer in self.connections:
+                writer.close()
+        for websocket in self._websockets():
+            websocket._on_signal()
+        get_running_loop().create_task(self.shutdown())
+
+    @staticmethod
+    def _resolve_static(root: str, name: str) -> str | None:
+        # Helper method to find a static file, only inside of its directory.
+        # Returns None for paths like "../secret" that would leave it.
+        name = unquote(name)
+        if "\x00" in name:
+            return None
+
+        file = realpath(join(root, name))
+        if commonpath((root, file)) != root:
+            return None
+        return file
+
     def get_handler(self, method, path):
         """Helper method to get the handler for a given method and path, allowing dynamic routing"""
-        for pattern, handler in self.routes[method].items():
-            match = pattern.match(path)
-            if match:
-                return handler, match.groupdict()
-        return None, {}
+        handler, params, _ = self._find_route(method, path)
+        return handler, params
 
     @staticmethod
-    def _path_to_regex(path):
-        """
-        Convert a URL path to a regular expression, allowing dynamic routing.
-        Args:
-        path (str): The URL path to convert.
-        """
-        # Remplacer les paramètres par des groupes de capture dans l'expression régulière
-        try :
-            regex_path = sub(r"<(\w+)>", r"(?P<\1>[^/]+)", path)
-            return compile(f'^{regex_path}$')
-        except Exception as e:
-            Logger().error(e)
+    async def _not_found(req: Request, res: Response) -> None:
+        # Helper method answering the requests without route
+        await res.send("404 Not Found\nPath : " + req.path + " unknown\n", status=404)
+
+    def _find_route(self, method: str, path: str) -> tuple[callable, dict, str]:
+        # Helper method to get the handler, the parameters and the registered path of a route
+        tree = self.routes.get(method)
+        if tree is None:
+            return None, {}, None
+        return tree.find(path)
+
+    def _find_websocket(self, head: dict) -> tuple[WebSocket | None, dict]:
+        # Helper method to get the WebSocket of a handshake and the parameters of its route
+        if head["method"] != "GET":
+            return None, {}
+        websocket, params, _ = self.websockets.find(head["target"].split("?")[0].split("#")[0])
+        return websocket, params
+
+    async def _upgrade(
+        self, websocket: WebSocket, reader: StreamReader, writer: StreamWriter, head: dict, params: dict
+    ) -> None:
+        # Helper method to hand a connection to a WebSocket, the router doesn't close it on shutdown anymore.
+        # Raises an HTTPError when the handshake is refused.
+        path, _, query_string = head["target"].split("#", 1)[0].partition("?")
+        request = Request(
+            head["method"], path, None, b"", params, self.json_backend, query_string, head["headers"]
+        )
+        self.connections.discard(writer)
+        await websocket.upgrade(request, reader, writer)
+
+    def _websockets(self) -> set[WebSocket]:
+        # Helper method to get the WebSockets served by the router, once each
+        return {websocket for _, websocket in self.websockets.routes()}
+
+    def _check_limits(self, writer: StreamWriter, head: dict) -> None:
+        # Helper method to take the tokens of a request, raises an HTTPError over the rates
+        route = None
+        if self.limiter.routes:
+            route = self._find_route(head["method"], head["target"].split("?")[0].split("#")[0])[2]
+
+        peer = writer.get_extra_info("peername")
+        self.limiter.check(peer[0] if peer else "", route)
+
+    def _wants_continue(self, head: dict, max_size: int = None) -> bool:
+        # Helper method to know if the client waits for "100 Continue" before sending the body
+        return (
+            "100-continue" in head["expect"]
+            and head["length"] <= (self.parser.max_body_size if max_size is None else max_size)
+        )
+
+    def _streamed_size(self, head: dict) -> int | None:
+        # Helper method to get the max body size of a request streamed to its handler,
+        # None when the body is read before calling the handler
+        if not head["chunked"] and not head["length"]:
+            return None
+
+        handler = self._find_route(head["method"], head["target"].split("?")[0].split("#")[0])[0]
+        if handler not in self.streamed:
+            return None
+        max_size = self.streamed[handler]
+        return self.parser.max_body_size if max_size is None else max_size
+
+
+    def _wants_keep_alive(self, protocol: str, connection: str) -> bool:
+        # Helper method to know if the client wants to keep its connection open.
+        # HTTP/1.1 keeps it by default, HTTP/1.0 only when asked for it.
+        if protocol == "HTTP/1.1":
+            return "close" not in connection
+        return "keep-alive" in connection
@@ -0,0 +1,122 @@
+"""
+File to define the JSONBackend class.
+Encodes and decodes JSON with orjson or ujson when one of them is installed,
+with the json module of the standard library otherwise.
+"""
+
+from json     import dumps as std_dumps, loads as std_loads
+from os       import stat as os_stat
+from aiofiles import open as aio_open
+from .cache   import FileCache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class JSONBackend:
+    """
+    JSON of the requests ("request.json()") and of the responses ("res.json()").
+    "name" chooses the library, "orjson", "ujson" or "json", the fastest installed one by default.
+    Other functions can be given with "dumps" (returning str or bytes) and "loads".
+    Values the library can't encode (integers over 64 bits, keys that aren't strings...)
+    are encoded by the json module, so every backend accepts the same data.
+
+    The JSON files sent with "res.json(path)" are kept encoded in "files",
+    and read again when their mtime or their size changed.
+
+    Usage : router.json_backend = JSONBackend("ujson")
+    """
+
+    # The installed libraries, fastest first
+    BACKENDS = tuple(
+        name for name, module in (("orjson", orjson), ("ujson", ujson), ("json", True)) if module
+    )
+
+    def __init__(
+        self,
+        name: str = None,
+        dumps: callable = None,
+        loads: callable = None,
+        files: FileCache = None,
+    ):
+        name = self.BACKENDS[0] if name is None else name
+        if name not in self.BACKENDS:
+            raise ValueError(f"JSON backend not installed : {name}")
+
+        self.name = name
+        self.files = FileCache(max_size=16777216) if files is None else files
+        self._dumps = dumps or getattr(self, f"_dumps_{name}")
+        self._loads = loads or self._get_loads(name)
+
+    def __str__(self):
+        return f"JSONBackend with {self.name}, {len(self.files)} files cached"
+
+    def dumps(self, data) -> bytes:
+        """
+        Encode data to JSON, as UTF-8 bytes.
+
+        Args:
+        data: The data to encode (dict, list, str, int...).
+        """
+        try:
+            encoded = self._dumps(data)
+        except (TypeError, OverflowError):
+            encoded = self._dumps_json(data)
+        return encoded.encode("utf-8") if isinstance(encoded, str) else encoded
+
+    def loads(self, data: str | bytes):
+        """
+        Decode JSON data.
+        Raises a ValueError when it isn't valid JSON.
+
+        Args:
+        data (str | bytes): The JSON to decode.
+        """
+        return self._loads(data)
+
+    async def load_file(self, path: str) -> bytes:
+        """
+        Get the content of a JSON file, encoded again by "dumps".
+        The file is only read and decoded when it isn't in "files" or changed since.
+        Raises a ValueError when it isn't valid JSON, an OSError when it can't be read.
+
+        Args:
+        path (str): The path of the JSON file.
+        """
+        stat = os_stat(path)
+        data = self.files.get(path, stat)
+
+        if data is None:
+            async with aio_open(path, "rb") as file:
+                data = self.dumps(self.loads(await file.read()))
+            self.files.put(path, stat, data)
+        return data
+
+    # Helper methods, one per library
+
+    @staticmethod
+    def _get_loads(name: str) -> callable:
+        if name == "orjson":
+            return orjson.loads
+        if name == "ujson":
+            return ujson.loads
+        return std_loads
+
+    @staticmethod
+    def _dumps_orjson(data) -> bytes:
+        return orjson.dumps(data)
+
+    @staticmethod
+    def _dumps_ujson(data) -> str:
+        return ujson.dumps(data, ensure_ascii=False, escape_forward_slashes=False)
+
+    @staticmethod
+    def _dumps_json(data) -> str:
+        return std_dumps(data, ensure_ascii=False, separators=(",", ":"))
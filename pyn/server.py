@@ -2,7 +2,15 @@
 File where is defined the Server class
 """
 
-from asyncio import gather, run as run_async
+from asyncio import gather, run as run_async, set_event_loop_policy
+from inspect import signature
+from .logger  import Logger
+from .workers import Supervisor, BALANCED, on_signals
+
+try:
+    from uvloop import EventLoopPolicy as UVLoopPolicy
+except ImportError:
+    UVLoopPolicy = None
 
 
 class Server:
@@ -10,30 +18,84 @@ class Server:
     Easier way to run HTTP and WebSocket servers
     """
 
-    def __init__(self, *args) -> None:
+    def __init__(self, *args, workers: int = 1, uvloop: bool = False) -> None:
         self.to_run = args
+        self.workers = workers
+        self.uvloop = uvloop
 
     def __str__(self):
-        return f"Server running {self.to_run}"
+        return f"Server running {self.to_run} with {self.workers} workers"
 
     async def serve(self, *args, **kwargs):
         """Method to serve everything who was gave in arguments with the specified parameter"""
+        # One handler shuts every server down on SIGTERM and SIGINT
+        remove_handlers = on_signals(self._on_signal)
         try :
             tasks = []
             if len(self.to_run) > 1:
                 for i in self.to_run:
                     arg = args[self.to_run.index(i)]
-                    tasks.append(i.serve(**arg))
+                    tasks.append(i.serve(**arg, handle_signals=False))
 
                 await gather(*tasks)
             else:
-                await self.to_run[0].serve(**kwargs)
+                await self.to_run[0].serve(**kwargs, handle_signals=False)
         except KeyboardInterrupt:
             exit(0)
+        finally:
+            remove_handlers()
+
+    async def shutdown(self):
+        """Stop every server gracefully"""
+        await gather(*(i.shutdown() for i in self.to_run))
+
+    def _on_signal(self) -> None:
+        # Helper method called on SIGTERM and SIGINT
+        for i in self.to_run:
+            i._on_signal()
+
+    def run(self, *args, workers: int = None, uvloop: bool = None, **kwargs):
+        """
+        Darkside of the start
+
+        Args:
+        workers (int): Number of processes serving the ports, "workers" of the constructor by default.
+            Above 1, this process becomes their master (see pyn.workers.Supervisor).
+        uvloop (bool): Run on the uvloop event loop when it's installed, "uvloop" of the constructor by default.
+        """
+        workers = workers or self.workers
+        logger = getattr(self.to_run[0], "logger", None) or Logger()
+        if self.uvloop if uvloop is None else uvloop:
+            if UVLoopPolicy is None:
+                # No event loop runs yet, one is run just for the line
+                run_async(logger.warn("uvloop is not installed, running on the asyncio event loop"))
+            else:
+                set_event_loop_policy(UVLoopPolicy())
 
-    def run(self, *args, **kwargs):
-        """Darkside of the start"""
         try:
-            run_async(self.serve(*args, **kwargs))
+            if workers > 1:
+                args, kwargs = self._share_ports(args, kwargs)
+                Supervisor(lambda: self.serve(*args, **kwargs), workers, self.shutdown, logger=logger).run()
+            else:
+                run_async(self.serve(*args, **kwargs))
         except KeyboardInterrupt:
             exit(0)
+
+    def _share_ports(self, args: tuple, kwargs: dict) -> tuple[tuple, dict]:
+        # Helper method to let the workers share the ports of every server
+        if len(self.to_run) > 1:
+            return tuple(self._share_port(i, dict(arg)) for i, arg in zip(self.to_run, args)), kwargs
+        return args, self._share_port(self.to_run[0], dict(kwargs))
+
+    @staticmethod
+    def _share_port(target, options: dict) -> dict:
+        # Helper method to add SO_REUSEPORT, or a socket bound before the fork, to the options of a server
+        if BALANCED:
+            options["reuse_port"] = True
+            return options
+
+        defaults = signature(target.serve).parameters
+        options["sock"] = Supervisor.listen(
+            options.get("host", defaults["host"].default), options.get("port", defaults["port"].default)
+        )
+        return options
@@ -0,0 +1,221 @@
+"""
+File to define the RouteTree class.
+The router uses it to find the handler of a path without testing every route.
+"""
+
+from re import escape, compile
+
+
+class RouteTree:
+    """
+    Segment based route matcher (a radix tree on the "/" separated segments).
+    Static segments are found with a dict lookup, "<name>" segments are captured without regex.
+
+    Typed parameters :
+    <name> or <name:str> : one non empty segment
+    <name:int> : one segment of digits, given to the handler as an int
+    <name:path> : the rest of the path, slashes included (last segment only)
+
+    When several routes match a path, the priority is always the same, segment by segment:
+    static text > <int> > segment mixing text and parameters > <str> > <path>
+    """
+
+    # Priority of the parameter kinds, the lowest is tried first
+    PRIORITY = {"int": 0, "mixed": 1, "str": 2}
+
+    def __init__(self):
+        self.static = {}
+        self.root = _Node()
+        self.size = 0
+
+    def __str__(self):
+        return f"RouteTree with {self.size} routes"
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, path: str, handler: callable) -> None:
+        """
+        Register a handler for the given path.
+        Registering the same path twice replaces the old handler.
+
+        Args:
+        path (str): The URL path, with its parameters ("/users/<id:int>").
+        handler (coroutine function): The async function that handles the request.
+        """
+        if "<" not in path:
+            if path not in self.static:
+                self.size += 1
+            self.static[path] = handler
+            return
+
+        node = self.root
+        names = []
+        segments = path.split("/")
+
+        for index, segment in enumerate(segments):
+            kind, name, regex, integers = self._parse_segment(segment)
+
+            if kind == "static":
+                node = node.static.setdefault(segment, _Node())
+            elif kind == "path":
+                if index != len(segments) - 1:
+                    raise ValueError(f"<{name}:path> must be the last segment of {path}")
+                names.append(name)
+                if node.catch_all is None:
+                    node.catch_all = _Node()
+                node = node.catch_all
+            else:
+                names.extend(name)
+                key = (kind, regex.pattern if regex else None)
+                child = next((c for k, c in node.params if k == key), None)
+                if child is None:
+                    child = _Node(regex, integers)
+                    node.params.append((key, child))
+                    node.params.sort(key=lambda item: (self.PRIORITY[item[0][0]], item[0][1] or ""))
+                node = child
+
+        if node.handler is None:
+            self.size += 1
+        node.handler = handler
+        node.names = names
+        node.route = path
+
+    def match(self, path: str) -> tuple[callable, dict]:
+        """
+        Find the handler of a path.
+        Returns the handler and the parameters, or (None, {}) if no route matches.
+
+        Args:
+        path (str): The URL path of the request.
+        """
+        handler, params, _ = self.find(path)
+        return handler, params
+
+    def find(self, path: str) -> tuple[callable, dict, str]:
+        """
+        Same as "match", but also returns the registered path of the route
+        ("/users/<id:int>"), or None if no route matches.
+
+        Args:
+        path (str): The URL path of the request.
+        """
+        handler = self.static.get(path)
+        if handler is not None:
+            return handler, {}, path
+
+        values = []
+        node = self._match(self.root, path.split("/"), 0, values)
+        if node is None:
+            return None, {}, None
+
+        return node.handler, dict(zip(node.names, values)), node.route
+
+    def routes(self) -> list[tuple[str, callable]]:
+        """
+        Get every registered path with its handler.
+        """
+        routes = list(self.static.items())
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            if node.handler is not None:
+                routes.append((node.route, node.handler))
+            nodes.extend(node.static.values())
+            nodes.extend(child for _, child in node.params)
+            if node.catch_all is not None:
+                nodes.append(node.catch_all)
+        return routes
+
+    def _match(self, node, segments: list[str], index: int, values: list):
+        # Walk the tree depth first, in priority order, backtracking on dead ends.
+        if index == len(segments):
+            return node if node.handler is not None else None
+
+        segment = segments[index]
+        depth = len(values)
+
+        child = node.static.get(segment)
+        if child is not None:
+            found = self._match(child, segments, index + 1, values)
+            if found is not None:
+                return found
+
+        if segment:
+            for (kind, _), child in node.params:
+                if kind == "int":
+                    if not (segment.isascii() and segment.isdigit()):
+                        continue
+                    values.append(int(segment))
+                elif kind == "str":
+                    values.append(segment)
+                else:
+                    match = child.regex.fullmatch(segment)
+                    if match is None:
+                        continue
+                    values.extend(
+                        int(value) if integer else value
+                        for value, integer in zip(match.groups(), child.integers)
+                    )
+
+                found = self._match(child, segments, index + 1, values)
+                if found is not None:
+                    return found
+                del values[depth:]
+
+        rest = "/".join(segments[index:])
+        if node.catch_all is not None and node.catch_all.handler is not None and rest:
+            values.append(rest)
+            return node.catch_all
+
+        return None
+
+    @staticmethod
+    def _parse_segment(segment: str) -> tuple:
+        # Helper method to know what kind of segment it is.
+        # Returns the kind, the parameter name(s), and for mixed segments
+        # the regex with which groups are integers.
+        params = _PARAM.findall(segment)
+        if not params:
+            return "static", None, None, None
+
+        full = _PARAM.fullmatch(segment)
+        if full is not None:
+            name, converter = full.group(1), full.group(2) or "str"
+            if converter not in ("str", "int", "path"):
+                raise ValueError(f"Unknown converter <{name}:{converter}>")
+            return converter, name if converter == "path" else [name], None, None
+
+        # Text and parameters in the same segment ("file-<id>.txt") still need a regex
+        regex = ""
+        position = 0
+        for match in _PARAM.finditer(segment):
+            if match.group(2) not in (None, "str", "int"):
+                raise ValueError(f"<{match.group(1)}:{match.group(2)}> must be a whole segment")
+            regex += escape(segment[position:match.start()])
+            regex += r"(\d+)" if match.group(2) == "int" else r"([^/]+?)"
+            position = match.end()
+        regex += escape(segment[position:])
+
+        names = [name for name, _ in params]
+        integers = tuple(converter == "int" for _, converter in params)
+        return "mixed", names, compile(regex), integers
+
+
+_PARAM = compile(r"<(\w+)(?::(\w+))?>")
+
+
+class _Node:
+    # One segment of the tree
+
+    __slots__ = ("static", "params", "catch_all", "handler", "names", "route", "regex", "integers")
+
+    def __init__(self, regex=None, integers=None):
+        self.static = {}
+        self.params = []
+        self.catch_all = None
+        self.handler = None
+        self.names = []
+        self.route = None
+        self.regex = regex
+        self.integers = integers
@@ -2,18 +2,439 @@
 File where the WebSocket is defined.
 """
 
-from asyncio  import StreamReader, StreamWriter, start_server, wait_for
-from hashlib  import sha1
-from base64   import b64encode
-from .logger  import Logger
+from asyncio     import (
+    StreamReader, StreamWriter, CancelledError, Event, IncompleteReadError, TimeoutError,
+    get_running_loop, shield, sleep, start_server, wait_for
+)
+from collections import deque
+from contextvars import ContextVar
+from hashlib     import sha1
+from base64      import b64decode, b64encode
+from socket      import socket
+from time        import monotonic
+from .deflate    import DeflateSession
+from .logger     import Logger
+from .parser     import Parser, HTTPError
+from .request    import Request
+from .workers    import on_signals
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Payloads from this size are unmasked in bulk (NumPy or bytes.translate), smaller ones as integers
+UNMASK_SIZE = 1024
+
+# XOR of every byte with each possible byte of the mask, for bytes.translate
+XOR_TABLES = [bytes(value ^ key for value in range(256)) for key in range(256)]
+
+# Opcodes of the frames (RFC 6455, 5.2)
+CONTINUATION, TEXT, BINARY, CLOSE, PING, PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+# Close codes a client can send (RFC 6455, 7.4), 3000 to 4999 being free for the applications
+CLOSE_CODES = {1000, 1001, 1002, 1003, 1007, 1008, 1009, 1010, 1011, 1012, 1013, 1014}
+
+# Seconds a client of "serve" has to send its handshake
+HANDSHAKE_TIMEOUT = 10.0
+
+# Client whose handler is running, for "WebSocket.send"
+CURRENT_CLIENT = ContextVar("CURRENT_CLIENT", default=None)
+
+
+def unmask(payload: bytes, mask: bytes) -> bytes:
+    """
+    XOR a frame payload with its 4 bytes mask (RFC 6455, 5.3), to mask or unmask it.
+    Small payloads are XORed as one big integer with the mask repeated to their length.
+    Bigger ones are XORed 4 bytes at a time with NumPy when it's installed,
+    else with bytes.translate on every 4th byte, one table for each byte of the mask.
+
+    Args:
+    payload (bytes): The payload of the frame.
+    mask (bytes): The masking key of the frame.
+    """
+    length = len(payload)
+
+    if length < UNMASK_SIZE:
+        key = int.from_bytes((mask * (length // 4 + 1))[:length], "little")
+        return (int.from_bytes(payload, "little") ^ key).to_bytes(length, "little")
+
+    result = bytearray(length)
+    if numpy is not None:
+        words = length & ~3
+        output = numpy.frombuffer(result, dtype=numpy.uint8)
+        numpy.bitwise_xor(
+            numpy.frombuffer(payload, dtype=numpy.uint8, count=words).view(numpy.uint32),
+            numpy.frombuffer(mask, dtype=numpy.uint32),
+            out=output[:words].view(numpy.uint32),
+        )
+        for i in range(words, length):
+            result[i] = payload[i] ^ mask[i & 3]
+        return bytes(result)
+
+    for i in range(4):
+        result[i::4] = payload[i::4].translate(XOR_TABLES[mask[i]])
+    return bytes(result)
+
+
+def encode_frame(opcode: int, payload: bytes, fin: bool = True, compressed: bool = False) -> bytes:
+    """
+    Build a frame as sent by the server (never masked).
+
+    Args:
+    opcode (int): The opcode of the frame (TEXT, BINARY, CLOSE, PING, PONG...).
+    payload (bytes): The data of the frame.
+    fin (bool): Last frame of its message.
+    compressed (bool): The payload is compressed with permessage-deflate (RSV1 bit).
+    """
+    first = (0b10000000 if fin else 0) | (0b01000000 if compressed else 0) | opcode
+    length = len(payload)
+
+    if length < 126:
+        return bytes((first, length)) + payload
+    if length <= 0xFFFF:
+        return bytes((first, 126)) + length.to_bytes(2, "big") + payload
+    return bytes((first, 127)) + length.to_bytes(8, "big") + payload
+
+
+class WebSocketError(Exception):
+    """
+    Error raised when a client breaks the protocol.
+    Holds the close code its connection is closed with (1002 protocol error, 1009 message too big...).
+    """
+
+    def __init__(self, code: int = 1002, reason: str = "Protocol error"):
+        super().__init__(reason)
+        self.code = code
+        self.reason = reason
+
+
+class WebSocketConnection:
+    """
+    One client of a WebSocket server, given to the handlers of the events.
+    The text messages are received as str and the binary ones as bytes,
+    "state" is a dict where the handlers can keep data about the client (its name...).
+    Once closed, "close_code" and "close_reason" tell why (1006 when the connection was lost).
+    "deflate" is the permessage-deflate session negotiated with the client, None without compression.
+    "request" is its handshake: its path, the parameters of its route, its headers and cookies.
+
+    The frames are written to the socket until its buffer holds "write_limit" bytes,
+    then they wait in "queue", up to "max_queue" of them: above, the oldest one is dropped
+    (counted in "dropped") or the client is disconnected, following "slow_consumer".
+
+    Usage : await client.send("Hello"), await client.send(b"\\x00\\x01"), await client.close(1008, "Forbidden")
+    """
+
+    def __init__(
+        self,
+        websocket: "WebSocket",
+        reader: StreamReader,
+        writer: StreamWriter,
+        deflate: DeflateSession = None,
+        request: Request = None,
+    ):
+        self.websocket = websocket
+        self.reader = reader
+        self.writer = writer
+        self.deflate = deflate
+        self.request = request
+        self.state = {}
+        self.peername = writer.get_extra_info("peername")
+        self.closing = False
+        self.close_code = None
+        self.close_reason = ""
+        self.last_seen = monotonic()
+        self.rooms = set()
+        self.queue = deque()
+        self.dropped = 0
+        self._abort_timer = None
+        self._flusher = None
+
+        writer.transport.set_write_buffer_limits(high=websocket.write_limit)
+
+    def __str__(self):
+        return f"WebSocketConnection with {self.peername}"
+
+    async def send(self, message: str | bytes) -> None:
+        """
+        Send a message to the client, a text one for a str, a binary one for bytes.
+        Messages sent once the connection is closing are dropped.
+
+        Args:
+        message (str | bytes): The message to send.
+        """
+        if isinstance(message, str):
+            self.write(self._encode_message(TEXT, message.encode("utf-8")))
+        else:
+            self.write(self._encode_message(BINARY, bytes(message)))
+        await self.drain()
+
+    async def send_all(self, message: str | bytes) -> None:
+        """
+        Send a message to every client of the server (same as "websocket.send_all").
+
+        Args:
+        message (str | bytes): The message to send.
+        """
+        await self.websocket.send_all(message)
+
+    def subscribe(self, room: str) -> None:
+        """
+        Add the client to a room, to receive the messages published in it.
+
+        Args:
+        room (str): The name of the room.
+        """
+        self.websocket.subscribe(self, room)
+
+    def unsubscribe(self, room: str) -> None:
+        """
+        Remove the client from a room.
+
+        Args:
+        room (str): The name of the room.
+        """
+        self.websocket.unsubscribe(self, room)
+
+    async def ping(self, data: bytes = b"") -> None:
+        """
+        Send a ping, the client answers it with a pong.
+
+        Args:
+        data (bytes): Up to 125 bytes sent back in the pong.
+        """
+        self.write(encode_frame(PING, data[:125]))
+        await self.drain()
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        """
+        Start the closing handshake: the client answers the close frame and the connection ends.
+        It's cut if the client doesn't answer in "ping_timeout" seconds.
+
+        Args:
+        code (int): The close code (1000 normal, 1001 going away, 1008 policy violation, 3000-4999 for the application).
+        reason (str): Text sent with the code, up to 123 bytes.
+        """
+        self._send_close(code, reason)
+        await self.drain()
+
+    def write(self, frame: bytes) -> None:
+        """
+        Write an already encoded frame, without waiting for it to be sent.
+        It's queued while the socket buffer of the client is full.
+
+        Args:
+        frame (bytes): The frame, from "encode_frame".
+        """
+        if self.closing or self.writer.is_closing():
+            return
+        if self.queue or self.writer.transport.get_write_buffer_size() > self.websocket.write_limit:
+            self._enqueue(frame)
+        else:
+            self.writer.write(frame)
+
+    async def drain(self) -> None:
+        """
+        Wait until the frames written can be sent, when the connection is slow.
+        """
+        try:
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+
+    def abort(self) -> None:
+        """
+        Cut the connection, without closing handshake.
+        """
+        self.writer.transport.abort()
+
+    def _encode_message(self, opcode: int, data: bytes) -> bytes:
+        # Helper method to build the frame of a message, compressed when it's worth it
+        if self.deflate is None or len(data) < self.deflate.min_size:
+            return encode_frame(opcode, data)
+        return encode_frame(opcode, self.deflate.compress(data), compressed=True)
+
+    def _enqueue(self, frame: bytes) -> None:
+        # Helper method to keep a frame until the client reads, within "max_queue" frames
+        if len(self.queue) >= self.websocket.max_queue:
+            if self.websocket.slow_consumer == "close":
+                if self.close_code is None:
+                    self.close_code, self.close_reason = 1008, "Slow consumer"
+                self.queue.clear()
+                self.abort()
+                return
+            self.queue.popleft()
+            self.dropped += 1
+
+        self.queue.append(frame)
+        if self._flusher is None:
+            self._flusher = get_running_loop().create_task(self._flush())
+
+    async def _flush(self) -> None:
+        # Helper method to write the queued frames as the socket buffer empties
+        transport = self.writer.transport
+        try:
+            while self.queue:
+                await self.writer.drain()
+                while self.queue and transport.get_write_buffer_size() <= self.websocket.write_limit:
+                    self.writer.write(self.queue.popleft())
+        except ConnectionError:
+            self.queue.clear()
+        finally:
+            self._flusher = None
+
+    def _send_close(self, code: int, reason: str = "") -> None:
+        # Helper method to send the close frame, once, and to cut the connection if it's not answered
+        if self.closing:
+            return
+        payload = code.to_bytes(2, "big") + reason.encode("utf-8")[:123]
+        self.write(encode_frame(CLOSE, payload))
+        self.closing = True
+        if self.close_code is None:
+            self.close_code, self.close_reason = code, reason
+
+        timeout = self.websocket.ping_timeout
+        if timeout is not None and self._abort_timer is None and not self.writer.is_closing():
+            self._abort_timer = get_running_loop().call_later(timeout, self.abort)
+
+    async def _receive(self) -> str | bytes:
+        # Helper method to read the frames of the next message, answering the control frames.
+        # Raises ConnectionAbortedError on the close frame of the client, WebSocketError on a protocol error.
+        max_size = self.websocket.max_message_size
+        fragments = []
+        size = 0
+        kind = None
+        compressed = False
+
+        while True:
+            fin, opcode, payload, rsv1 = await self._read_frame(max_size - size)
+
+            if opcode == PING:
+                self.write(encode_frame(PONG, payload))
+                continue
+            if opcode == PONG:
+                continue
+            if opcode == CLOSE:
+                self._received_close(payload)
+                raise ConnectionAbortedError("Client sent a close frame.")
+
+            if opcode == CONTINUATION:
+                if kind is None:
+                    raise WebSocketError(1002, "Continuation frame without a message")
+            elif opcode in (TEXT, BINARY):
+                if kind is not None:
+                    raise WebSocketError(1002, "New message before the end of the previous one")
+                kind = opcode
+                compressed = rsv1
+            else:
+                raise WebSocketError(1002, f"Unknown opcode {opcode}")
+
+            fragments.append(payload)
+            size += len(payload)
+            if fin:
+                break
+
+        data = fragments[0] if len(fragments) == 1 else b"".join(fragments)
+        if compressed:
+            try:
+                data = self.deflate.decompress(data, max_size)
+            except OverflowError:
+                raise WebSocketError(1009, "Message too big") from None
+            except ValueError as e:
+                raise WebSocketError(1007, str(e)) from None
+
+        if kind == BINARY:
+            return data
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError:
+            raise WebSocketError(1007, "Invalid UTF-8 in a text message") from None
+
+    async def _read_frame(self, max_size: int) -> tuple[bool, int, bytes, bool]:
+        # Helper method to read one frame, with exact reads as the data can come in any pieces.
+        # Data frames above "max_size" bytes are refused before reading their payload.
+        # RSV1 marks the first frame of a compressed message, when permessage-deflate was negotiated.
+        first, second = await self.reader.readexactly(2)
+        opcode = first & 0b00001111
+        fin = bool(first & 0b10000000)
+        rsv1 = bool(first & 0b01000000)
+
+        if first & 0b00110000 or rsv1 and (self.deflate is None or opcode not in (TEXT, BINARY)):
+            raise WebSocketError(1002, "Reserved bits set without extension")
+        if not second & 0b10000000:
+            raise WebSocketError(1002, "Client frames must be masked")
+
+        length = second & 0b01111111
+        if opcode & 0b1000:
+            if not fin or length > 125:
+                raise WebSocketError(1002, "Control frames must be whole and up to 125 bytes")
+        else:
+            if length == 126:
+                length = int.from_bytes(await self.reader.readexactly(2), "big")
+            elif length == 127:
+                length = int.from_bytes(await self.reader.readexactly(8), "big")
+            if length > max_size:
+                raise WebSocketError(1009, "Message too big")
+
+        mask = await self.reader.readexactly(4)
+        payload = unmask(await self.reader.readexactly(length), mask) if length else b""
+        self.last_seen = monotonic()
+        return fin, opcode, payload, rsv1
+
+    def _received_close(self, payload: bytes) -> None:
+        # Helper method to read the close frame of the client, and to answer it with the same code
+        if len(payload) == 1:
+            raise WebSocketError(1002, "Invalid close frame")
+
+        code, reason = 1005, ""  # 1005: no code given
+        if payload:
+            code = int.from_bytes(payload[:2], "big")
+            if code not in CLOSE_CODES and not 3000 <= code <= 4999:
+                raise WebSocketError(1002, f"Invalid close code {code}")
+            try:
+                reason = payload[2:].decode("utf-8")
+            except UnicodeDecodeError:
+                raise WebSocketError(1007, "Invalid UTF-8 in a close frame") from None
+
+        if self.close_code is None:
+            self.close_code, self.close_reason = code, reason
+        self._send_close(1000 if code == 1005 else code)
 
 
 class WebSocket:
     """
     Hand made websocket, that can be used by the router and the user. Needs to be async.
+    Each client is a WebSocketConnection, given to the handlers.
+    It's served on its own port with "serve", or on the port of a router with "router.websocket".
+
+    Limits:
+    - "max_message_size" bytes for a message, fragments included (closed with 1009 above).
+    - The clients idle for "ping_interval" seconds are pinged, the ones not answering
+      in "ping_timeout" seconds are disconnected (None to disable it).
+    - "max_queue" messages waiting for a client once "write_limit" bytes are in its socket buffer.
+      Above, "slow_consumer" drops the oldest one ("drop") or disconnects the client ("close").
+
+    The messages sent to several clients ("send_all", "publish") are encoded once
+    and written to every client without waiting for any of them, so a slow client
+    only fills its own queue.
+
+    Messages are compressed with permessage-deflate when "compression" is set
+    (see pyn.deflate.PerMessageDeflate) and the client accepts it.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        max_message_size: int = 1048576,
+        ping_interval: float = 20.0,
+        ping_timeout: float = 20.0,
+        write_limit: int = 65536,
+        max_queue: int = 64,
+        slow_consumer: str = "drop",
+    ):
+        if slow_consumer not in ("drop", "close"):
+            raise ValueError(f"slow_consumer must be \"drop\" or \"close\", not {slow_consumer!r}")
+
         self.logger = Logger()
         self.MAGIC_STRING = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
 
@@ -21,118 +442,127 @@ class WebSocket:
         self._on_init = None
         self._on_close = None
 
-        self.writer = None
         self.host = None
         self.port = None
         self.server = None
+        self.reuse_port = False
+        self.sock = None
         self.debug = False
-
-        self.clients = []
+        self.shutdown_timeout = 10.0
+        self.draining = False
+        self.max_message_size = max_message_size
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.write_limit = write_limit
+        self.max_queue = max_queue
+        self.slow_consumer = slow_consumer
+        self.compression = None
+        self.parser = Parser()
+
+        self.clients = set()
+        self.rooms = {}
+        self._on_startup = []
+        self._on_shutdown = []
+        self._no_clients = Event()
+        self._stopping = None
+        self._pinger = None
 
     def __str__(self):
         return "WebSocket"
 
 
-    async def _websocket_handshake(self, reader:StreamReader, writer:StreamWriter):
-        request = await reader.read(1024)
+    async def upgrade(self, request: Request, reader: StreamReader, writer: StreamWriter) -> None:
+        """
+        Answer the handshake of a request already read, then serve its client until it leaves.
+        Used by the router for the routes of "router.websocket", and by "serve".
+        Raises an HTTPError (400, 426) when the request isn't a valid handshake, before writing anything.
+
+        Args:
+        request (Request): The handshake, its headers and the parameters of its route.
+        reader (asyncio.StreamReader): Stream reader of the connection, after the handshake.
+        writer (asyncio.StreamWriter): Stream writer of the connection.
+        """
+        response, deflate = self._handshake(request)
+        if self.draining:
+            raise HTTPError(503, "Service Unavailable")
+
+        # Envoyer la réponse
+        writer.write(response)
 
-        # Lire la requête HTTP et obtenir la clé WebSocket
-        headers = request.decode().split("\r\n")
-        websocket_key = ""
-        for header in headers:
-            if header.startswith("Sec-WebSocket-Key:"):
-                websocket_key = header.split(": ")[1].strip()
+        # Connexion WebSocket établie
+        if self.debug:
+            await self.logger.debug(
+                "WebSocket: handshake done for client from " +
+                str(writer.get_extra_info("peername"))
+            )
+        await self._serve_client(WebSocketConnection(self, reader, writer, deflate, request))
+
+    def _handshake(self, request: Request) -> tuple[bytes, DeflateSession | None]:
+        # Helper method to check a handshake and build its "101 Switching Protocols" answer,
+        # with the compression negotiated with the client (permessage-deflate)
+        if (
+            request.method != "GET"
+            or "websocket" not in request.header("Upgrade", "").lower()
+            or "upgrade" not in request.header("Connection", "").lower()
+        ):
+            raise HTTPError(400, "Not a WebSocket handshake")
+        if request.header("Sec-WebSocket-Version") != "13":
+            raise HTTPError(426, "Upgrade Required", headers={"Sec-WebSocket-Version": "13"})
+
+        websocket_key = request.header("Sec-WebSocket-Key", "")
+        try:
+            valid = len(b64decode(websocket_key, validate=True)) == 16
+        except ValueError:
+            valid = False
+        if not valid:
+            raise HTTPError(400, "Invalid Sec-WebSocket-Key")
 
         # Générer la clé acceptée
         accept_key = b64encode(
             sha1((websocket_key + self.MAGIC_STRING).encode()).digest()
         ).decode()
 
-        if "Upgrade: websocket" not in headers or "Connection: Upgrade" not in headers:
-            writer.write("HTTP/1.1 400 Bad Request\r\n\r\n".encode())
-            await writer.drain()
-            writer.close()
-            await writer.wait_closed()
-            return False
-
+        deflate = None
+        accepted = ""
+        if self.compression is not None:
+            negotiated = self.compression.negotiate(request.header("Sec-WebSocket-Extensions"))
+            if negotiated is not None:
+                accepted = f"Sec-WebSocket-Extensions: {negotiated[0]}\r\n"
+                deflate = negotiated[1]
 
         # Construire la réponse du handshake
         response = (
             "HTTP/1.1 101 Switching Protocols\r\n"
             "Upgrade: websocket\r\n"
             "Connection: Upgrade\r\n"
-            f"Sec-WebSocket-Accept: {accept_key}\r\n\r\n"
+            f"Sec-WebSocket-Accept: {accept_key}\r\n"
+            f"{accepted}\r\n"
         )
-
-        # Envoyer la réponse
-        writer.write(response.encode())
-        await writer.drain()
-
-        # Connexion WebSocket établie
-        if self.debug:
-            await self.logger.debug(
-                "WebSocket: handshake done for client from " + 
-                str(writer.get_extra_info("peername"))
-            )
-        return True
-
-    def _encode_frame(self, message:str) -> bytes:
-        # Encapsuler un message texte (opcode 0x1)
-        frame = bytearray()
-        frame.append(0b10000001)  # FIN bit et opcode (0x1 pour texte)
-        message_bytes = message.encode("utf-8")
-        length = len(message_bytes)
-
-        # Gérer la longueur du message
-        if length < 126:
-            frame.append(length)
-        elif length <= 0xFFFF:
-            frame.append(126)
-            frame.extend(length.to_bytes(2, "big"))
-        else:
-            frame.append(127)
-            frame.extend(length.to_bytes(8, "big"))
-
-        frame.extend(message_bytes)
-        return bytes(frame)
-
-    async def _decode_frame(self, reader:StreamReader) -> str:
-        # Lire les premiers octets de l'en-tête de la trame
-        first_byte, second_byte = await reader.read(2)
-        opcode = first_byte & 0b00001111
-        fin = first_byte & 0b10000000
-
-        masked = second_byte & 0b10000000
-        if not masked:
-            raise ValueError("Client frames must be masked.")
-
-        if opcode == 0x8:
-            await self._send_close_frame()
-            raise ConnectionAbortedError("Client sent a close frame.")
-
-        # Lire la longueur du payload
-        length = second_byte & 0b01111111
-        if length == 126:
-            length = int.from_bytes(await reader.read(2), "big")
-        elif length == 127:
-            length = int.from_bytes(await reader.read(8), "big")
-
-        # Lire le masque (toujours présent pour les messages du client)
-        mask = await reader.read(4)
-
-        # Lire les données et les démêler avec le masque
-        data = bytearray(await reader.read(length))
-        for i in range(length):
-            data[i] ^= mask[i % 4]
-
-        return data.decode("utf-8")
+        return response.encode("latin-1"), deflate
+
+    @staticmethod
+    def _error_response(error: HTTPError) -> bytes:
+        # Helper method to refuse a handshake on the server of "serve"
+        body = f"{error.status} {error.message}\n"
+        headers = "".join(f"{name}: {value}\r\n" for name, value in (error.headers or {}).items())
+        return (
+            f"HTTP/1.1 {error.status} {error.message}\r\n"
+            "Content-Type: text/plain\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n"
+            f"{headers}\r\n{body}"
+        ).encode("latin-1")
 
     def define(self, element: str) -> callable:
         """
         Decorator to add a route to the router.
+        The "init", "message" and "close" handlers are called with the WebSocketConnection
+        of the client ("message" with the message too, str or bytes).
 
         Args:
-        element (str): The element to handle (message, init, close).
+        element (str): The element to handle (message, init, close, startup, shutdown).
+            "startup" handlers run before the server accepts clients, "shutdown" ones
+            once the clients are gone on shutdown, there can be several of them.
         """
 
         def wrapper(handler: callable):
@@ -142,106 +572,306 @@ class WebSocket:
                 self._on_init = handler
             elif element == "close":
                 self._on_close = handler
+            elif element == "startup":
+                self._on_startup.append(handler)
+            elif element == "shutdown":
+                self._on_shutdown.append(handler)
 
             return handler
         return wrapper
 
-    async def _send_close_frame(self):
-        frame = bytearray([0b10001000, 0])  # FIN bit et opcode 0x8 pour fermeture
-        self.writer.write(frame)
-        await self.writer.drain()
-
     async def _handle_client(self, reader:StreamReader, writer:StreamWriter):
-        # Étape de handshake WebSocket
-        await self._websocket_handshake(reader, writer)
-
-        self.clients.append(writer)
-        self.writer = writer
-
-        if self._on_init:
-            await self._on_init(self)
+        # Étape de handshake WebSocket, lue comme une requête HTTP
+        try:
+            head = await wait_for(self.parser.read_head(reader), HANDSHAKE_TIMEOUT)
+            if head is not None:
+                path, _, query_string = head["target"].split("#", 1)[0].partition("?")
+                request = Request(
+                    head["method"], path, None, b"", None, query_string=query_string, raw_headers=head["headers"]
+                )
+                await self.upgrade(request, reader, writer)
+        except HTTPError as e:
+            writer.write(self._error_response(e))
+        except (TimeoutError, IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if not writer.is_closing():
+                writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _serve_client(self, client: WebSocketConnection) -> None:
+        # Helper method to read the messages of a client until it leaves, calling the handlers
+        self.clients.add(client)
+        CURRENT_CLIENT.set(client)
+        if self.ping_interval is not None and self._pinger is None:
+            self._pinger = get_running_loop().create_task(self._keep_alive())
 
         try:
-            while True:
-                try :
-                    # Lire un message WebSocket
-                    message = await wait_for(self._decode_frame(reader), timeout=60)
-                    if self.debug:
-                        await self.logger.debug(f"WebSocket: received {message}")
-
-                    # Émettre un message WebSocket
-                    if self._on_message:
-                        self.writer = writer
-                        await self._on_message(self, message)
-                except TimeoutError:
-                    await self.logger.warn("WebSocket: Client timeout")
-                except ConnectionAbortedError:
-                    await self.logger.warn("WebSocket: Connection aborted by client")
-                    break
-                except ConnectionResetError:
-                    await self.logger.warn("WebSocket: Connection reset by client")
-                    break
+            if self._on_init:
+                await self._on_init(client)
 
-        except ValueError:
-            await self.logger.error("WebSocket: Client must be masked")
+            while True:
+                # Lire un message WebSocket
+                message = await client._receive()
+                if self.debug:
+                    await self.logger.debug(f"WebSocket: received {message}")
+
+                # Émettre un message WebSocket
+                if self._on_message and not client.closing:
+                    await self._on_message(client, message)
+
+        except ConnectionAbortedError:
+            if self.debug:
+                await self.logger.debug(f"WebSocket: closed by client ({client.close_code})")
+        except WebSocketError as e:
+            await self.logger.warn(f"WebSocket: {e.reason}, closing ({e.code})")
+            client._send_close(e.code, e.reason)
+        except (IncompleteReadError, ConnectionError):
+            if self.debug:
+                await self.logger.debug("WebSocket: Connection lost")
+        except Exception as e:
+            await self.logger.error(e)
+            client._send_close(1011, "Internal error")
         finally:
-            if self._on_close:
-                await self._on_close(self)
-
-            self.clients.remove(writer)
-            writer.close()
-            self.writer = None
-            await writer.wait_closed()
+            if client.close_code is None:
+                client.close_code = 1006  # Closed without close frame
+            if client._abort_timer is not None:
+                client._abort_timer.cancel()
+
+            try:
+                if self._on_close:
+                    await self._on_close(client)
+            except Exception as e:
+                await self.logger.error(e)
+            finally:
+                for room in list(client.rooms):
+                    self.unsubscribe(client, room)
+                self.clients.discard(client)
+                if not self.clients:
+                    self._no_clients.set()
+
+                # The last frames of a slow client (its close frame...) go before the end
+                while client.queue and not client.writer.is_closing():
+                    client.writer.write(client.queue.popleft())
+                client.writer.close()
+                try:
+                    await client.writer.wait_closed()
+                except ConnectionError:
+                    pass
+
+    async def _keep_alive(self) -> None:
+        # Ping the idle clients, and cut the ones that didn't answer in time, while there are clients
+        frame = encode_frame(PING, b"")
+        try:
+            while self.clients:
+                await sleep(min(self.ping_interval, self.ping_timeout or self.ping_interval))
+                now = monotonic()
+                for client in list(self.clients):
+                    idle = now - client.last_seen
+                    if self.ping_timeout is not None and idle >= self.ping_interval + self.ping_timeout:
+                        client.abort()
+                    elif idle >= self.ping_interval:
+                        client.write(frame)
+        finally:
+            self._pinger = None
 
     async def _run(self):
-        self.server = await start_server(self._handle_client, self.host, self.port)
+        if self.sock is not None:
+            self.server = await start_server(self._handle_client, sock=self.sock)
+        else:
+            self.server = await start_server(
+                self._handle_client, self.host, self.port, reuse_port=self.reuse_port
+            )
 
         if self.debug:
             await self.logger.debug(f"WebSocket server started on {self.host}:{self.port}")
 
         async with self.server:
-            await self.server.serve_forever()
-
-    async def serve(self, port: int=8765, host: str="127.0.0.1", debug: bool=False) -> None:
+            try:
+                await self.server.serve_forever()
+            except CancelledError:
+                pass
+
+    async def serve(
+        self,
+        port: int=8765,
+        host: str="127.0.0.1",
+        debug: bool=False,
+        reuse_port: bool=False,
+        sock: socket=None,
+        shutdown_timeout: float=10.0,
+        handle_signals: bool=True
+    ) -> None:
         """
         Start the event loop to handle requests.
+
+        Args:
+        reuse_port (bool): Bind the port with SO_REUSEPORT, to share it with other processes.
+        sock (socket.socket): Already bound socket to serve instead of host and port.
+        shutdown_timeout (float): Seconds the clients have to answer the close frame on shutdown.
+        handle_signals (bool): Shut down gracefully on SIGTERM and SIGINT.
         """
         self.host  = host
         self.port  = port
         self.debug = debug
+        self.reuse_port = reuse_port
+        self.sock = sock
+        self.shutdown_timeout = shutdown_timeout
+        self.draining = False
+        self._stopping = None
 
+        remove_handlers = on_signals(self._on_signal) if handle_signals else None
         try:
+            for hook in self._on_startup:
+                await hook(self)
             await self._run()
-        except KeyboardInterrupt:
-            self._shutdown()
         except Exception as e:
             await self.logger.error(e)
+        finally:
+            await self.shutdown()
+            if remove_handlers is not None:
+                remove_handlers()
 
-    async def _shutdown(self):
-        # Shut the server down
+    async def shutdown(self, timeout: float = None) -> None:
+        """
+        Stop the server gracefully, called on SIGTERM and SIGINT.
+        New connections are refused and every client receives a close frame (1001 Going Away),
+        the ones still connected after "timeout" seconds are disconnected,
+        then the shutdown handlers are called and the logs flushed.
+        Calling it again waits for the same shutdown.
 
-        if self.server is None:
-            exit(0)
+        Args:
+        timeout (float): Seconds to wait for the clients, "shutdown_timeout" of serve by default.
+        """
+        if self._stopping is None:
+            self._stopping = get_running_loop().create_task(
+                self._drain(self.shutdown_timeout if timeout is None else timeout)
+            )
+        await shield(self._stopping)
+
+    async def _drain(self, timeout: float) -> None:
+        # Shut the server down, once
+        self.draining = True
+        if self.server is not None:
+            self.server.close()
+
+        for client in list(self.clients):
+            client._send_close(1001, "Going away")
+
+        if self.clients:
+            self._no_clients.clear()
+            try:
+                await wait_for(self._no_clients.wait(), timeout)
+            except TimeoutError:
+                for client in list(self.clients):
+                    client.abort()
+
+        if self._pinger is not None:
+            self._pinger.cancel()
+
+        for hook in self._on_shutdown:
+            try:
+                await hook(self)
+            except Exception as e:
+                await self.logger.error(e)
 
-        self.server._serving = False
-        self.server.close()
         if self.debug:
-            await self.logger.debug("WebSocket server stopped by user")
+            await self.logger.debug("WebSocket server stopped")
+        await self.logger.flush()
+
+    def _on_signal(self) -> None:
+        # Shut down on SIGTERM and SIGINT, or stop waiting for the clients the second time
+        if self.draining:
+            for client in list(self.clients):
+                client.abort()
+        get_running_loop().create_task(self.shutdown())
 
     # Client Method
 
-    async def send_all(self, message: str) -> None:
+    async def send_all(self, message: str | bytes) -> None:
         """
         Send a message to all clients
+
+        Args:
+        message (str | bytes): The message, text for a str, binary for bytes.
+        """
+        self._fan_out(self.clients, message)
+
+    async def publish(self, room: str, message: str | bytes) -> None:
         """
+        Send a message to the clients of a room.
 
-        for client in self.clients:
-            client.write(self._encode_frame(message))
-            await client.drain()
+        Args:
+        room (str): The name of the room.
+        message (str | bytes): The message, text for a str, binary for bytes.
+        """
+        clients = self.rooms.get(room)
+        if clients:
+            self._fan_out(clients, message)
 
-    async def send(self, message: str) -> None:
+    def subscribe(self, client: WebSocketConnection, room: str) -> None:
+        """
+        Add a client to a room, to receive the messages published in it.
+
+        Args:
+        client (WebSocketConnection): The client.
+        room (str): The name of the room.
         """
-        Send a message to the client
+        self.rooms.setdefault(room, set()).add(client)
+        client.rooms.add(room)
+
+    def unsubscribe(self, client: WebSocketConnection, room: str) -> None:
+        """
+        Remove a client from a room, the room is removed with its last client.
+
+        Args:
+        client (WebSocketConnection): The client.
+        room (str): The name of the room.
+        """
+        client.rooms.discard(room)
+        clients = self.rooms.get(room)
+        if clients is not None:
+            clients.discard(client)
+            if not clients:
+                del self.rooms[room]
+
+    @staticmethod
+    def _fan_out(clients: set, message: str | bytes) -> None:
+        # Helper method to encode a message once and write it to every client.
+        # The clients compressing without context takeover share one frame for each "key"
+        # of their session, the other compressing clients have theirs.
+        if isinstance(message, str):
+            opcode, data = TEXT, message.encode("utf-8")
+        else:
+            opcode, data = BINARY, bytes(message)
+
+        frames = {}
+        for client in clients:
+            deflate = client.deflate
+            if deflate is None or len(data) < deflate.min_size:
+                key = None
+            elif deflate.shared:
+                key = deflate.key
+            else:
+                client.write(encode_frame(opcode, deflate.compress(data), compressed=True))
+                continue
+
+            frame = frames.get(key)
+            if frame is None:
+                frame = frames[key] = client._encode_message(opcode, data)
+            client.write(frame)
+
+    async def send(self, message: str | bytes) -> None:
+        """
+        Send a message to the client whose handler is running (same as "client.send").
+
+        Args:
+        message (str | bytes): The message, text for a str, binary for bytes.
         """
-        self.writer.write(self._encode_frame(message))
-        await self.writer.drain()
+        client = CURRENT_CLIENT.get()
+        if client is None:
+            raise RuntimeError("WebSocket.send is only available in the handlers of a client")
+        await client.send(message)
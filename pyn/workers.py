@@ -0,0 +1,186 @@
+"""
+File to define the Supervisor class.
+Runs the servers in several worker processes, to use every core of the machine.
+Also defines "on_signals", used by the servers to stop gracefully on SIGTERM and SIGINT.
+"""
+
+from asyncio  import CancelledError, get_running_loop, run as run_async
+from os       import fork, kill, waitpid, _exit
+from signal   import signal, SIGTERM, SIGINT, SIGKILL, SIG_DFL
+from socket   import create_server, socket
+from sys      import platform
+from time     import monotonic, sleep
+from traceback import print_exc
+from .logger  import Logger
+
+
+# Only Linux spreads the connections between the SO_REUSEPORT sockets of a port,
+# elsewhere the workers share one socket bound by the master.
+BALANCED = platform.startswith("linux")
+
+
+def on_signals(callback: callable) -> callable:
+    """
+    Call "callback" on SIGTERM and SIGINT, in the running event loop.
+    Returns a function to remove the handlers.
+    Does nothing where the loop can't handle signals (Windows, not the main thread).
+
+    Args:
+    callback (callable): Function called without arguments.
+    """
+    loop = get_running_loop()
+    added = []
+    for sig in (SIGTERM, SIGINT):
+        try:
+            loop.add_signal_handler(sig, callback)
+            added.append(sig)
+        except (NotImplementedError, RuntimeError, ValueError):
+            pass
+
+    def remove():
+        for sig in added:
+            loop.remove_signal_handler(sig)
+    return remove
+
+
+class Supervisor:
+    """
+    Master process of the workers.
+    Forks "workers" processes, each one running the coroutine given by "serve".
+    The workers share the listening port with SO_REUSEPORT (or an inherited socket,
+    bound before the fork), so the kernel spreads the connections between them.
+
+    A crashed worker is restarted.
+    SIGTERM and SIGINT are forwarded to the workers, which stop with "shutdown"
+    (graceful drain) if given, and the master exits when all of them are done.
+    A second signal kills the workers.
+
+    "run" must be called before any event loop exists (see pyn.Server.run):
+    the workers start their own loop, a running one can't be forked.
+    POSIX only (needs os.fork).
+    """
+
+    def __init__(
+        self,
+        serve: callable,
+        workers: int = 2,
+        shutdown: callable = None,
+        restart_delay: float = 1.0,
+        logger: Logger = None
+    ):
+        self.serve = serve
+        self.workers = workers
+        self.shutdown = shutdown
+        self.restart_delay = restart_delay
+        self.logger = Logger() if logger is None else logger
+
+        self.pids = {}
+        self.stopping = False
+
+    def __str__(self):
+        return f"Supervisor of {len(self.pids)}/{self.workers} workers"
+
+    def run(self) -> None:
+        """
+        Start the workers and supervise them until they are stopped.
+        Blocks until every worker exited.
+        """
+        previous = {sig: signal(sig, self._on_signal) for sig in (SIGTERM, SIGINT)}
+
+        try:
+            for number in range(self.workers):
+                self._spawn(number)
+
+            while self.pids:
+                try:
+                    pid, status = waitpid(-1, 0)
+                except ChildProcessError:
+                    break
+                except InterruptedError:
+                    continue
+
+                number, started = self.pids.pop(pid, (None, 0))
+                if number is None or self.stopping:
+                    continue
+
+                # The master has no event loop, one is run just for the line
+                run_async(self.logger.warn(f"Worker {number} (pid {pid}) exited with status {status}, restarting it"))
+
+                # A worker crashing on start would be restarted in a loop
+                if monotonic() - started < self.restart_delay:
+                    sleep(self.restart_delay)
+                if not self.stopping:
+                    self._spawn(number)
+        finally:
+            for sig, handler in previous.items():
+                signal(sig, handler)
+
+    def stop(self, force: bool = False) -> None:
+        """
+        Ask every worker to stop, without restarting them.
+
+        Args:
+        force (bool): Kill the workers instead of letting them finish their requests.
+        """
+        self.stopping = True
+        for pid in list(self.pids):
+            try:
+                kill(pid, SIGKILL if force else SIGTERM)
+            except ProcessLookupError:
+                self.pids.pop(pid, None)
+
+    def _on_signal(self, signum, frame) -> None:
+        # First signal : graceful stop, second one : kill
+        self.stop(force=self.stopping)
+
+    def _spawn(self, number: int) -> None:
+        # Start one worker process
+        pid = fork()
+        if pid:
+            self.pids[pid] = (number, monotonic())
+            return
+
+        code = 0
+        try:
+            for sig in (SIGTERM, SIGINT):
+                signal(sig, SIG_DFL)
+
+            run_async(self._run_worker())
+        except BaseException:
+            print_exc()
+            code = 1
+        finally:
+            # Never go back to the code of the master, but still write the logs
+            Logger.close_all()
+            _exit(code)
+
+    async def _run_worker(self) -> None:
+        # Body of a worker : serve until SIGTERM / SIGINT
+        loop = get_running_loop()
+        task = loop.create_task(self.serve())
+
+        def stop():
+            if self.shutdown is not None:
+                loop.create_task(self.shutdown())
+            else:
+                task.cancel()
+
+        on_signals(stop)
+
+        try:
+            await task
+        except CancelledError:
+            pass
+
+    @staticmethod
+    def listen(host: str, port: int, backlog: int = 1024) -> socket:
+        """
+        Bind a listening socket in the master, to be inherited by the workers.
+        Used when the kernel doesn't balance SO_REUSEPORT sockets (see BALANCED).
+
+        Args:
+        host (str): The host to listen on.
+        port (int): The port to listen on.
+        backlog (int): Max number of connections waiting to be accepted.
+        """
+        return create_server((host, port), backlog=backlog)
@@ -0,0 +1,10 @@
+"""
+File to configure the tests: pyn is imported from this repository.
+
+Usage : python -m pytest tests
+"""
+
+from pathlib import Path
+from sys     import path as sys_path
+
+sys_path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,103 @@
+"""
+File to test permessage-deflate: the negotiation of its parameters and the compression of the messages.
+"""
+
+from zlib import DEFLATED, Z_SYNC_FLUSH, compressobj, decompressobj
+
+import pytest
+
+from pyn.deflate import TAIL, PerMessageDeflate
+
+
+def client_compress(data: bytes, window_bits: int = 15) -> bytes:
+    # Message compressed as a client does, the end of the sync flush removed
+    compressor = compressobj(6, DEFLATED, -window_bits)
+    return (compressor.compress(data) + compressor.flush(Z_SYNC_FLUSH)).removesuffix(TAIL)
+
+
+@pytest.mark.parametrize("offer, response", [
+    ("permessage-deflate", "permessage-deflate; server_no_context_takeover"),
+    (
+        "permessage-deflate; client_max_window_bits",
+        "permessage-deflate; server_no_context_takeover; client_max_window_bits=15",
+    ),
+    (
+        "permessage-deflate; server_max_window_bits=10; client_max_window_bits=9",
+        "permessage-deflate; server_max_window_bits=10; server_no_context_takeover; client_max_window_bits=9",
+    ),
+    (
+        "permessage-deflate; client_no_context_takeover",
+        "permessage-deflate; server_no_context_takeover; client_no_context_takeover",
+    ),
+    # The first offer is refused, the second one accepted
+    (
+        "permessage-deflate; server_max_window_bits=8, permessage-deflate",
+        "permessage-deflate; server_no_context_takeover",
+    ),
+    (
+        'x-webkit-deflate-frame, PERMESSAGE-DEFLATE; client_max_window_bits="12"',
+        "permessage-deflate; server_no_context_takeover; client_max_window_bits=12",
+    ),
+])
+def test_negotiate(offer: str, response: str):
+    accepted, _ = PerMessageDeflate().negotiate(offer)
+    assert accepted == response
+
+
+@pytest.mark.parametrize("offer", [
+    None,
+    "",
+    "x-webkit-deflate-frame",
+    "permessage-deflate; unknown=1",
+    "permessage-deflate; server_max_window_bits=16",
+    "permessage-deflate; server_max_window_bits=8",
+    "permessage-deflate; server_max_window_bits",
+    "permessage-deflate; client_max_window_bits=7",
+    "permessage-deflate; client_no_context_takeover; client_no_context_takeover",
+])
+def test_negotiate_refused(offer: str):
+    assert PerMessageDeflate().negotiate(offer) is None
+
+
+def test_server_settings():
+    extension = PerMessageDeflate(server_max_window_bits=12, server_no_context_takeover=False)
+    accepted, session = extension.negotiate("permessage-deflate; server_max_window_bits=14")
+    assert accepted == "permessage-deflate; server_max_window_bits=12"
+    assert not session.shared and session.server_max_window_bits == 12
+
+    with pytest.raises(ValueError):
+        PerMessageDeflate(server_max_window_bits=8)
+    with pytest.raises(ValueError):
+        PerMessageDeflate(client_max_window_bits=16)
+
+
+def test_shared_sessions():
+    # Without context takeover, every client with the same key gets the same bytes
+    extension = PerMessageDeflate()
+    _, first = extension.negotiate("permessage-deflate")
+    _, second = extension.negotiate("permessage-deflate; client_no_context_takeover")
+    message = b"hello " * 100
+    assert first.shared and first.key == second.key
+    assert first.compress(message) == second.compress(message) == first.compress(message)
+
+
+def test_context_takeover():
+    _, session = PerMessageDeflate(server_no_context_takeover=False).negotiate("permessage-deflate")
+    message = b"hello " * 100
+    first, again = session.compress(message), session.compress(message)
+    assert len(again) < len(first)
+
+    # The client keeps its decompressor from one message to the next
+    decompressor = decompressobj(-15)
+    assert decompressor.decompress(first + TAIL) == message
+    assert decompressor.decompress(again + TAIL) == message
+
+
+def test_decompress():
+    _, session = PerMessageDeflate().negotiate("permessage-deflate; client_max_window_bits=9")
+    assert session.decompress(client_compress(b"x" * 1000, 9), 1000) == b"x" * 1000
+
+    with pytest.raises(OverflowError):
+        session.decompress(client_compress(b"x" * 1001, 9), 1000)
+    with pytest.raises(ValueError):
+        session.decompress(b"\xff\xff\xff", 1000)
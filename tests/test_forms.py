@@ -0,0 +1,119 @@
+"""
+File to test the FormParser: urlencoded and multipart bodies read chunk by chunk, limits, files on disk.
+"""
+
+from asyncio            import get_running_loop, run as run_async
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pyn.forms  import FormParser
+from pyn.parser import HTTPError
+
+
+BOUNDARY = "----pyn"
+MULTIPART = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    # Executor counting the calls given to it
+
+    def __init__(self):
+        super().__init__(1)
+        self.calls = 0
+
+    def submit(self, *args, **kwargs):
+        self.calls += 1
+        return super().submit(*args, **kwargs)
+
+
+def multipart(*parts: tuple) -> bytes:
+    # Multipart body of (name, value) fields and (name, filename, content) files
+    body = b"preamble"
+    for part in parts:
+        body += f"\r\n--{BOUNDARY}\r\n".encode()
+        if len(part) == 2:
+            body += f'Content-Disposition: form-data; name="{part[0]}"\r\n\r\n'.encode() + part[1]
+        else:
+            body += (
+                f'Content-Disposition: form-data; name="{part[0]}"; filename="{part[1]}"\r\n'
+                f"Content-Type: text/plain\r\n\r\n"
+            ).encode() + part[2]
+    return body + f"\r\n--{BOUNDARY}--\r\nepilogue".encode()
+
+
+def parse(parser: FormParser, content_type: str, body: bytes, size: int = 65536, executor=None):
+    # Form of a body given in chunks of "size" bytes
+    async def chunks():
+        for start in range(0, len(body), size):
+            yield body[start:start + size]
+
+    async def main():
+        if executor is not None:
+            get_running_loop().set_default_executor(executor)
+        return await parser.parse(content_type, chunks())
+    return run_async(main())
+
+
+def test_urlencoded():
+    form = parse(FormParser(), "application/x-www-form-urlencoded", b"a=1&b=hello+world&a=%C3%A9&empty=", 3)
+    assert form.fields == {"a": ["1", "é"], "b": ["hello world"], "empty": [""]}
+    assert form.get("a") == "1" and form.get("missing", "x") == "x"
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 65536])
+def test_multipart(size: int):
+    # The boundary in the content, without the line break of a delimiter
+    content = b"line\r\n-" + BOUNDARY.encode() + b" --" + BOUNDARY.encode()
+    body = multipart(("title", "héllo".encode()), ("doc", "a.txt", content))
+    form = parse(FormParser(), MULTIPART, body, size)
+
+    assert form.get("title") == "héllo"
+    upload = form.file("doc")
+    assert (upload.filename, upload.content_type) == ("a.txt", "text/plain")
+    assert upload.read() == content
+    form.close()
+
+
+def test_multipart_rollover():
+    content = bytes(range(256)) * 4096
+    executor = CountingExecutor()
+    form = parse(FormParser(spool_size=4096), MULTIPART, multipart(("big", "big.bin", content)), 65536, executor)
+
+    upload = form.file("big")
+    assert upload.size == len(content)
+    assert upload.read() == content
+    # The writes past "spool_size" are done in a thread
+    assert executor.calls >= len(content) // 65536
+    form.close()
+    executor.shutdown()
+
+
+def test_options():
+    assert FormParser.parse_options('form-data; name="a\\"b"; filename*=UTF-8\'\'%C3%A9.txt') == (
+        "form-data", {"name": 'a"b', "filename": "é.txt"}
+    )
+
+
+@pytest.mark.parametrize("parser, body, status", [
+    (FormParser(max_part_size=10), multipart(("f", "f.txt", b"x" * 11)), 413),
+    (FormParser(max_field_size=10), multipart(("f", b"x" * 11)), 413),
+    (FormParser(max_parts=1), multipart(("a", b"1"), ("b", b"2")), 413),
+    (FormParser(max_size=100), multipart(("a", b"x" * 200)), 413),
+    (FormParser(), multipart(("a", b"1"))[:-20], 400),
+    (FormParser(), f"--{BOUNDARY}\r\nContent-Type: text/plain\r\n\r\nx\r\n--{BOUNDARY}--".encode(), 400),
+])
+def test_multipart_errors(parser: FormParser, body: bytes, status: int):
+    with pytest.raises(HTTPError) as error:
+        parse(parser, MULTIPART, body)
+    assert error.value.status == status
+
+
+def test_not_a_form():
+    with pytest.raises(HTTPError) as error:
+        parse(FormParser(), "application/json", b"{}")
+    assert error.value.status == 415
+
+    with pytest.raises(HTTPError) as error:
+        parse(FormParser(), "multipart/form-data", b"")
+    assert error.value.status == 400
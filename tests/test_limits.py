@@ -0,0 +1,81 @@
+"""
+File to test the token buckets and the Limiter of the router.
+"""
+
+from asyncio import run as run_async
+
+import pytest
+
+from pyn.limits import Limiter, TokenBuckets
+from pyn.parser import HTTPError
+
+
+def test_burst_then_refused():
+    buckets = TokenBuckets(rate=2, burst=3)
+    assert [buckets.take("a", 0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.take("a", 0.0) == pytest.approx(0.5)
+
+    # The other keys have their own bucket
+    assert buckets.take("b", 0.0) == 0.0
+
+
+def test_refill():
+    buckets = TokenBuckets(rate=2, burst=2)
+    buckets.take("a", 0.0)
+    buckets.take("a", 0.0)
+    assert buckets.take("a", 0.25) == pytest.approx(0.25)
+    assert buckets.take("a", 0.5) == 0.0
+
+    # Never more than "burst" tokens, however long the key waited
+    assert [buckets.take("a", 100.0) for _ in range(3)] == [0.0, 0.0, pytest.approx(0.5)]
+
+
+def test_full_buckets_expire():
+    buckets = TokenBuckets(rate=1, burst=2)
+    buckets.take("a", 0.0)
+    buckets.take("b", 1.0)
+    assert len(buckets) == 2
+
+    # "a" is full again after 2 seconds, it's removed when a new key comes
+    buckets.take("c", 2.5)
+    assert list(buckets.buckets) == ["b", "c"]
+
+
+def test_max_keys():
+    buckets = TokenBuckets(rate=1, burst=10, max_keys=2)
+    buckets.take("a", 0.0)
+    buckets.take("b", 0.0)
+    buckets.take("a", 0.0)
+    buckets.take("c", 0.0)
+    assert list(buckets.buckets) == ["a", "c"]
+
+
+def test_limiter_rates():
+    limiter = Limiter(rate=1, burst=1, routes={"/login": (1, 2)})
+    limiter.check("1.1.1.1", "/")
+    with pytest.raises(HTTPError) as error:
+        limiter.check("1.1.1.1", "/")
+    assert error.value.status == 429 and error.value.retry_after > 0
+
+    limiter.check("2.2.2.2", "/login")
+    limiter.check("3.3.3.3", "/login")
+    with pytest.raises(HTTPError):
+        limiter.check("4.4.4.4", "/login")
+    assert limiter.stats()["rejected"] == {"client": 1, "route": 1, "in_flight": 0}
+
+
+def test_limiter_in_flight():
+    limiter = Limiter(max_in_flight=1, queue_timeout=0.01)
+
+    async def main():
+        await limiter.acquire()
+        with pytest.raises(HTTPError) as error:
+            await limiter.acquire()
+        assert error.value.status == 503
+        limiter.release()
+        await limiter.acquire()
+        limiter.release()
+
+    run_async(main())
+    assert limiter.in_flight == 0
+    assert limiter.rejected["in_flight"] == 1
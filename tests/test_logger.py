@@ -0,0 +1,64 @@
+"""
+File to test the Logger class: background writes, flush and the queue policies.
+"""
+
+from asyncio   import run as run_async
+from threading import Event, Thread
+
+from pyn import Logger
+
+
+def paused(logger: Logger) -> None:
+    # Keep the lines in the queue: the writer thread is never started
+    logger._writer.thread = Thread(target=None)
+
+
+def test_flush_writes_everything(tmp_path):
+    path = tmp_path / "test.log"
+    logger = Logger(str(path), console=False)
+
+    async def main():
+        for i in range(100):
+            await logger.info(f"line {i}")
+        await logger.flush()
+        await logger.close()
+
+    run_async(main())
+    lines = path.read_text().splitlines()
+    assert len(lines) == 100
+    assert lines[-1].endswith("line 99")
+
+
+def test_drop(tmp_path):
+    logger = Logger(str(tmp_path / "test.log"), console=False, queue_size=2)
+    paused(logger)
+
+    async def main():
+        for i in range(5):
+            await logger.info(f"line {i}")
+
+    run_async(main())
+    queue = logger._writer.queue
+    assert [queue.get_nowait()[0].rstrip().endswith(f"line {i}") for i in range(2)] == [True, True]
+    assert logger.dropped == 3
+
+
+def test_drop_oldest_keeps_control_items(tmp_path):
+    logger = Logger(str(tmp_path / "test.log"), console=False, queue_size=3, policy="drop_oldest")
+    paused(logger)
+
+    # A flush and a close are waiting in the full queue, in front of the line
+    done = Event()
+    queue = logger._writer.queue
+    queue.put(done)
+    queue.put(None)
+
+    async def main():
+        await logger.info("old")
+        await logger.info("new")
+
+    run_async(main())
+    items = [queue.get_nowait() for _ in range(queue.qsize())]
+    assert done in items and None in items
+    assert [item[0].rstrip()[-3:] for item in items if isinstance(item, tuple)] == ["new"]
+    assert logger.dropped == 1
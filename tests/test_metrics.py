@@ -0,0 +1,81 @@
+"""
+File to test the latency histograms and their Prometheus rendering.
+"""
+
+from random import Random
+
+import pytest
+
+from pyn.metrics import Histogram, Metrics
+
+
+def test_small_values_are_exact():
+    histogram = Histogram()
+    for value in range(256):
+        histogram.record(value)
+    assert histogram.percentile(50) == 127
+    assert histogram.percentile(100) == 255
+    assert (histogram.min, histogram.max, len(histogram)) == (0, 255, 256)
+
+
+@pytest.mark.parametrize("value", [256, 1000, 65535, 123456789, 2 ** 40 + 1])
+def test_bucket_precision(value: int):
+    # The upper value of the bucket is within 2 ** (1 - precision) of the value
+    histogram = Histogram(precision=8)
+    histogram.record(value)
+    index = next(iter(histogram.counts))
+    assert value <= histogram.upper(index) <= value * (1 + 2 ** -7)
+
+
+def test_percentiles():
+    values = list(range(1, 100001))
+    Random(0).shuffle(values)
+    histogram = Histogram()
+    for value in values:
+        histogram.record(value)
+
+    for percent in (50, 90, 99, 99.9):
+        expected = 100000 * percent / 100
+        assert abs(histogram.percentile(percent) - expected) <= expected * 2 ** -7
+    assert histogram.percentile(100) == 100000
+    assert histogram.mean() == 50000.5
+
+
+def test_empty():
+    histogram = Histogram()
+    assert histogram.percentile(99) == 0
+    assert histogram.mean() == 0.0
+
+
+def test_merge():
+    first, second = Histogram(), Histogram()
+    for value in range(100):
+        first.record(value)
+        second.record(value + 1000)
+    first.merge(second)
+    assert (first.count, first.min, first.max) == (200, 0, 1099)
+    assert first.percentile(50) <= 99 < 1000 <= first.percentile(51)
+
+
+def test_cumulative():
+    histogram = Histogram()
+    for value in (10, 400, 600, 5000):
+        histogram.record(value)
+    assert histogram.cumulative((500, 1000, 10000)) == [2, 3, 4]
+
+
+def test_metrics_render():
+    metrics = Metrics()
+    metrics.observe("/users/<id:int>", "GET", 200, 2_000_000)
+    metrics.observe("/users/<id:int>", "GET", 200, 40_000_000)
+    metrics.observe("/", "POST", 500, 1_000)
+
+    assert metrics.histogram(route="/users/<id:int>").count == 2
+    assert metrics.histogram(status=500).count == 1
+
+    text = metrics.render()
+    labels = 'route="/users/<id:int>",method="GET",status="200"'
+    assert f'pyn_request_duration_seconds_bucket{{{labels},le="0.0025"}} 1' in text
+    assert f'pyn_request_duration_seconds_bucket{{{labels},le="0.05"}} 2' in text
+    assert f"pyn_request_duration_seconds_count{{{labels}}} 2" in text
+    assert f"pyn_request_duration_seconds_sum{{{labels}}} 0.042" in text
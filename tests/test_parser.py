@@ -0,0 +1,159 @@
+"""
+File to test the HTTP request parser, from a buffer ("feed" methods) and from a stream.
+"""
+
+from asyncio import StreamReader, run as run_async
+
+import pytest
+
+from pyn.parser import BodyDecoder, HTTPError, Parser
+
+
+def stream(data: bytes, limit: int = 65536) -> StreamReader:
+    # StreamReader holding data, then the end of the connection
+    reader = StreamReader(limit=limit)
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+def read(parser: Parser, data: bytes) -> tuple[dict, bytes]:
+    # Head and body of the first request of data, read from a stream
+    async def main():
+        reader = stream(data)
+        head = await parser.read_head(reader)
+        return head, await parser.read_body(reader, head)
+    return run_async(main())
+
+
+def test_feed_head():
+    buffer = bytearray(b"\r\nGET /a?b=1 HTTP/1.1\r\nHost: x\r\nConnection: Keep-Alive\r\n\r\nnext")
+    head, end = Parser().feed_head(buffer)
+
+    assert (head["method"], head["target"], head["protocol"]) == ("GET", "/a?b=1", "HTTP/1.1")
+    assert "keep-alive" in head["connection"]
+    assert head["length"] == 0 and not head["chunked"]
+    assert buffer[end:] == b"next"
+
+
+def test_feed_head_incomplete():
+    assert Parser().feed_head(bytearray(b"GET / HTTP/1.1\r\nHost: x\r\n")) is None
+
+
+def test_feed_body_content_length():
+    parser = Parser()
+    buffer = bytearray(b"POST / HTTP/1.1\r\nContent-Length: 5\r\n\r\nhel")
+    head, start = parser.feed_head(buffer)
+
+    assert parser.feed_body(buffer, head, start) is None
+    buffer += b"loGET"
+    body, end = parser.feed_body(buffer, head, start)
+    assert body == b"hello"
+    assert buffer[end:] == b"GET"
+
+
+def test_feed_body_chunked():
+    parser = Parser()
+    request = b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n3;ext=1\r\nabc\r\n2\r\nde\r\n0\r\nX-Trailer: 1\r\n\r\n"
+    head, start = parser.feed_head(bytearray(request))
+    assert head["chunked"]
+
+    # Every cut of the body is incomplete until its last byte
+    for cut in range(start, len(request)):
+        assert parser.feed_body(bytearray(request[:cut]), head, start) is None
+    assert parser.feed_body(bytearray(request), head, start) == (b"abcde", len(request))
+
+
+def test_read_from_stream():
+    head, body = read(Parser(), b"POST / HTTP/1.1\r\nContent-Length: 3\r\n\r\nabc")
+    assert head["method"] == "POST"
+    assert body == b"abc"
+
+    head, body = read(Parser(), b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n3\r\nabc\r\n2\r\nde\r\n0\r\n\r\n")
+    assert body == b"abcde"
+
+
+def test_read_head_closed():
+    async def main():
+        return await Parser().read_head(stream(b""))
+    assert run_async(main()) is None
+
+
+@pytest.mark.parametrize("request_head", [
+    b"GARBAGE\r\n\r\n",
+    b"GET / SPDY/3\r\n\r\n",
+    b"GET / HTTP/1.1\r\nNo colon\r\n\r\n",
+    b"GET / HTTP/1.1\r\nHost : x\r\n\r\n",
+    b"POST / HTTP/1.1\r\nContent-Length: -1\r\n\r\n",
+    b"POST / HTTP/1.1\r\nContent-Length: 1\r\nContent-Length: 2\r\n\r\n",
+    b"POST / HTTP/1.1\r\nContent-Length: 1\r\nTransfer-Encoding: chunked\r\n\r\n",
+    b"POST / HTTP/1.1\r\nTransfer-Encoding: gzip, chunked\r\n\r\n",
+    b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\nTransfer-Encoding: chunked\r\n\r\n",
+])
+def test_bad_request(request_head: bytes):
+    with pytest.raises(HTTPError) as error:
+        Parser().feed_head(bytearray(request_head))
+    assert error.value.status == 400
+
+
+def test_unsupported_transfer_encoding():
+    with pytest.raises(HTTPError) as error:
+        Parser().feed_head(bytearray(b"POST / HTTP/1.1\r\nTransfer-Encoding: gzip\r\n\r\n"))
+    assert error.value.status == 501
+
+
+@pytest.mark.parametrize("chunk", [b"zz\r\nabc\r\n0\r\n\r\n", b"3\r\nabcXX0\r\n\r\n"])
+def test_invalid_chunk(chunk: bytes):
+    parser = Parser()
+    buffer = bytearray(b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n" + chunk)
+    head, start = parser.feed_head(buffer)
+    with pytest.raises(HTTPError) as error:
+        parser.feed_body(buffer, head, start)
+    assert error.value.status == 400
+
+
+def test_header_too_large():
+    parser = Parser(max_header_size=64)
+    with pytest.raises(HTTPError) as error:
+        parser.feed_head(bytearray(b"GET /" + b"a" * 100))
+    assert error.value.status == 431
+
+    with pytest.raises(HTTPError) as error:
+        read(parser, b"GET /" + b"a" * 100 + b" HTTP/1.1\r\n\r\n")
+    assert error.value.status == 431
+
+
+def test_body_too_large():
+    parser = Parser(max_body_size=4)
+    buffer = bytearray(b"POST / HTTP/1.1\r\nContent-Length: 5\r\n\r\n")
+    head, start = parser.feed_head(buffer)
+    with pytest.raises(HTTPError) as error:
+        parser.feed_body(buffer, head, start)
+    assert error.value.status == 413
+
+    with pytest.raises(HTTPError) as error:
+        read(parser, b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n3\r\nabc\r\n3\r\ndef\r\n0\r\n\r\n")
+    assert error.value.status == 413
+
+
+def test_body_decoder():
+    head = {"chunked": True, "length": 0}
+    decoder = BodyDecoder(head, 100)
+    buffer = bytearray()
+    chunks = []
+
+    # The bytes arrive one by one
+    for byte in b"3\r\nabc\r\n2\r\nde\r\n0\r\n\r\nNEXT":
+        buffer.append(byte)
+        chunks += decoder.feed(buffer)
+        if decoder.done:
+            break
+
+    assert b"".join(chunks) == b"abcde"
+    assert decoder.total == 5
+
+
+def test_body_decoder_too_large():
+    with pytest.raises(HTTPError) as error:
+        BodyDecoder({"chunked": False, "length": 10}, 5)
+    assert error.value.status == 413
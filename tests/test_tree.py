@@ -0,0 +1,73 @@
+"""
+File to test the RouteTree class: typed parameters, priorities and catch-all routes.
+"""
+
+import pytest
+
+from pyn.tree import RouteTree
+
+
+def tree(*paths: str) -> RouteTree:
+    # RouteTree where the handler of each path is the path itself
+    routes = RouteTree()
+    for path in paths:
+        routes.insert(path, path)
+    return routes
+
+
+def test_static():
+    routes = tree("/", "/users", "/users/me")
+    assert routes.find("/users/me") == ("/users/me", {}, "/users/me")
+    assert routes.find("/nothing") == (None, {}, None)
+    assert len(routes) == 3
+
+
+def test_typed_parameters():
+    routes = tree("/users/<id:int>", "/files/<name:path>", "/tags/<tag>")
+    assert routes.find("/users/42") == ("/users/<id:int>", {"id": 42}, "/users/<id:int>")
+    assert routes.match("/users/abc") == (None, {})
+    assert routes.match("/files/a/b/c.txt") == ("/files/<name:path>", {"name": "a/b/c.txt"})
+    assert routes.match("/tags/python") == ("/tags/<tag>", {"tag": "python"})
+    assert routes.match("/tags/") == (None, {})
+
+
+def test_mixed_segment():
+    routes = tree("/files/file-<id:int>.<ext>")
+    assert routes.match("/files/file-7.txt") == ("/files/file-<id:int>.<ext>", {"id": 7, "ext": "txt"})
+    assert routes.match("/files/file-x.txt") == (None, {})
+
+
+def test_priority():
+    # static > <int> > mixed > <str> > <path>, whatever the order they are registered in
+    routes = tree("/a/<rest:path>", "/a/<name>", "/a/v<version:int>", "/a/<id:int>", "/a/new")
+    assert routes.match("/a/new")[0] == "/a/new"
+    assert routes.match("/a/12")[0] == "/a/<id:int>"
+    assert routes.match("/a/v2")[0] == "/a/v<version:int>"
+    assert routes.match("/a/other")[0] == "/a/<name>"
+    assert routes.match("/a/b/c")[0] == "/a/<rest:path>"
+
+
+def test_backtracking():
+    # "/a/1/edit" doesn't exist under <int>, the <str> branch has it
+    routes = tree("/a/<id:int>", "/a/<name>/edit")
+    assert routes.match("/a/1/edit") == ("/a/<name>/edit", {"name": "1"})
+
+
+def test_catch_all_needs_rest():
+    routes = tree("/static/<file:path>")
+    assert routes.match("/static/") == (None, {})
+    assert routes.match("/static/css/site.css") == ("/static/<file:path>", {"file": "css/site.css"})
+
+
+def test_replace_and_routes():
+    routes = tree("/users/<id:int>", "/about")
+    routes.insert("/users/<id:int>", "new")
+    assert len(routes) == 2
+    assert routes.match("/users/1")[0] == "new"
+    assert sorted(routes.routes()) == [("/about", "/about"), ("/users/<id:int>", "new")]
+
+
+@pytest.mark.parametrize("path", ["/<rest:path>/more", "/<x:float>", "/file-<rest:path>"])
+def test_invalid_routes(path: str):
+    with pytest.raises(ValueError):
+        RouteTree().insert(path, None)
@@ -0,0 +1,158 @@
+"""
+File to test the WebSocket frames: unmasking, encoding, and the messages read from the frames of a client.
+"""
+
+from asyncio import StreamReader, run as run_async
+from os      import urandom
+
+import pytest
+
+from pyn           import websocket
+from pyn.websocket import (
+    BINARY, CLOSE, CONTINUATION, PING, PONG, TEXT,
+    WebSocket, WebSocketConnection, WebSocketError, encode_frame, unmask
+)
+
+
+class Transport:
+    # The part of a transport used by WebSocketConnection, keeping what's written
+
+    def __init__(self):
+        self.written = bytearray()
+        self.closing = False
+
+    def set_write_buffer_limits(self, high: int) -> None:
+        pass
+
+    def get_write_buffer_size(self) -> int:
+        return 0
+
+    def abort(self) -> None:
+        self.closing = True
+
+
+class Writer:
+    # The part of a StreamWriter used by WebSocketConnection
+
+    def __init__(self):
+        self.transport = Transport()
+
+    def write(self, data: bytes) -> None:
+        self.transport.written += data
+
+    def get_extra_info(self, name: str, default=None):
+        return default
+
+    def is_closing(self) -> bool:
+        return self.transport.closing
+
+    async def drain(self) -> None:
+        pass
+
+
+def reference(payload: bytes, mask: bytes) -> bytes:
+    # Unmasking byte by byte, as in RFC 6455
+    return bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+
+
+def frame(opcode: int, payload: bytes, fin: bool = True, masked: bool = True, rsv: int = 0) -> bytes:
+    # Frame as sent by a client
+    first = (0x80 if fin else 0) | rsv | opcode
+    mask = urandom(4)
+    length = len(payload)
+    if length < 126:
+        head = bytes((first, length | (0x80 if masked else 0)))
+    elif length <= 0xFFFF:
+        head = bytes((first, 126 | (0x80 if masked else 0))) + length.to_bytes(2, "big")
+    else:
+        head = bytes((first, 127 | (0x80 if masked else 0))) + length.to_bytes(8, "big")
+    if not masked:
+        return head + payload
+    return head + mask + unmask(payload, mask)
+
+
+def receive(data: bytes, max_message_size: int = 1048576) -> tuple[list, WebSocketConnection]:
+    # Messages read from data until the end or an error, and the connection they were read on
+    async def main():
+        reader = StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        client = WebSocketConnection(
+            WebSocket(max_message_size=max_message_size, ping_timeout=None), reader, Writer()
+        )
+        messages = []
+        try:
+            while True:
+                messages.append(await client._receive())
+        except Exception as e:
+            messages.append(e)
+        return messages, client
+    return run_async(main())
+
+
+@pytest.mark.parametrize("length", [0, 1, 3, 4, 125, 1023, 1024, 1027, 65536, 100003])
+@pytest.mark.parametrize("with_numpy", [True, False])
+def test_unmask(length: int, with_numpy: bool, monkeypatch):
+    if not with_numpy:
+        monkeypatch.setattr(websocket, "numpy", None)
+    elif websocket.numpy is None:
+        pytest.skip("NumPy is not installed")
+
+    payload, mask = urandom(length), urandom(4)
+    masked = unmask(payload, mask)
+    assert masked == reference(payload, mask)
+    assert unmask(masked, mask) == payload
+
+
+@pytest.mark.parametrize("length, header", [(125, 2), (126, 4), (65535, 4), (65536, 10)])
+def test_encode_frame(length: int, header: int):
+    encoded = encode_frame(BINARY, b"x" * length, compressed=True)
+    assert len(encoded) == header + length
+    assert encoded[0] == 0x80 | 0x40 | BINARY
+    assert encode_frame(TEXT, b"", fin=False)[0] == TEXT
+
+
+def test_messages():
+    messages, _ = receive(
+        frame(TEXT, "héllo".encode()) + frame(BINARY, b"\x00\x01") + frame(TEXT, b"x" * 70000)
+    )
+    assert messages[:3] == ["héllo", b"\x00\x01", "x" * 70000]
+    assert isinstance(messages[3], EOFError)
+
+
+def test_fragmented_message_with_ping():
+    # A ping between the fragments of a message is answered at once
+    data = (
+        frame(TEXT, b"he", fin=False)
+        + frame(PING, b"p")
+        + frame(CONTINUATION, b"ll", fin=False)
+        + frame(CONTINUATION, b"o")
+    )
+    messages, client = receive(data)
+    assert messages[0] == "hello"
+    assert bytes(client.writer.transport.written) == encode_frame(PONG, b"p")
+
+
+def test_close():
+    messages, client = receive(frame(CLOSE, (1001).to_bytes(2, "big") + b"bye"))
+    assert isinstance(messages[0], ConnectionAbortedError)
+    assert (client.close_code, client.close_reason) == (1001, "bye")
+    assert bytes(client.writer.transport.written) == encode_frame(CLOSE, (1001).to_bytes(2, "big"))
+
+
+@pytest.mark.parametrize("data, code", [
+    (frame(CONTINUATION, b"x"), 1002),
+    (frame(TEXT, b"x", masked=False), 1002),
+    (frame(TEXT, b"x", rsv=0x40), 1002),
+    (frame(TEXT, b"a", fin=False) + frame(TEXT, b"b"), 1002),
+    (frame(PING, b"x", fin=False), 1002),
+    (frame(0x3, b"x"), 1002),
+    (frame(CLOSE, (999).to_bytes(2, "big")), 1002),
+    (frame(TEXT, b"\xff"), 1007),
+    (frame(TEXT, b"x" * 101), 1009),
+    (frame(TEXT, b"x" * 60, fin=False) + frame(CONTINUATION, b"x" * 60), 1009),
+])
+def test_protocol_errors(data: bytes, code: int):
+    messages, _ = receive(data, max_message_size=100)
+    assert isinstance(messages[0], WebSocketError)
+    assert messages[0].code == code